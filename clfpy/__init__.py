@@ -1,4 +1,8 @@
 from .soap_client import SoapClient
+from .wsdl_cache import WsdlCache, get_default_wsdl_cache, set_default_wsdl_cache
+from .download_cache import DownloadCache
+from .transport import SessionTransport, make_session, get_default_session, set_default_session
+from .fast_soap import FastSoapEngine
 from .gss_client import GssClient
 from .auth_client import AuthClient
 from .auth_client import AuthUsersClient
@@ -7,3 +11,7 @@ from .hpc_client import HpcImagesClient, ImageNotFoundException, ImageNameIllega
 from .wfm_client import WfmClient
 from .services_client import ServicesClient, MethodNotAllowedException, ServiceNotFoundException, BadRequestException
 from .tools import ExtraParameters
+from .registry import get_client, clear_clients
+from .ttl_cache import TTLCache
+from .instrumentation import Instrumentation, get_instrumentation
+from .progress import Progress, TerminalProgress
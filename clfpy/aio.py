@@ -0,0 +1,287 @@
+"""asyncio support for the SOAP clients (Python 3.5+)
+
+SOAP requests are built and parsed by suds as usual, but sent over a small
+keep-alive HTTP/1.1 connection pool running on the event loop, so in-flight
+calls cost neither a thread nor block the loop while waiting for replies.
+"""
+import os
+import ssl
+import time
+import asyncio
+import weakref
+from urllib.parse import urlsplit
+
+import requests
+from suds import WebFault, MethodNotFound
+
+from .transport import (DEFAULT_POOL_SIZE, DEFAULT_TIMEOUT,
+                        DEFAULT_MAX_WORKERS)
+
+_pools = weakref.WeakKeyDictionary()
+
+
+class AsyncHttpPool(object):
+    """Keep-alive HTTP/1.1 connection pool for one event loop.
+
+    At most `max_connections` requests are in flight at any time; further
+    requests wait for a free slot, which provides back-pressure. Cancelling
+    a request closes its connection instead of returning it to the pool.
+    `timeout` and `verify` have the meaning of the requests options.
+    """
+
+    def __init__(self, max_connections=DEFAULT_POOL_SIZE,
+                 timeout=DEFAULT_TIMEOUT, verify=True):
+        # (connect, read) timeouts in seconds, like for requests
+        if not isinstance(timeout, tuple):
+            timeout = (timeout, timeout)
+        self.timeout = timeout
+        self.verify = verify
+        self._slots = asyncio.Semaphore(max_connections)
+        self._idle = {}
+        self._ssl_context = None
+
+    async def request(self, method, url, headers=None, body=b''):
+        """Sends a request and returns (status, reason, headers, body)."""
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname,
+               parts.port or (443 if parts.scheme == 'https' else 80))
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        head = ["{} {} HTTP/1.1".format(method, path),
+                "Host: {}".format(parts.netloc),
+                "Content-Length: {}".format(len(body))]
+        head.extend("{}: {}".format(k, v) for k, v in (headers or {}).items())
+        message = ("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + body
+
+        async with self._slots:
+            connection, reused = await self._acquire(key)
+            try:
+                try:
+                    response = await self._exchange(connection, message)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    if not reused:
+                        raise
+                    # The server closed the idle connection, try a fresh one
+                    connection[1].close()
+                    connection, _ = await self._acquire(key, reuse=False)
+                    response = await self._exchange(connection, message)
+            except BaseException:
+                # Includes cancellation: the connection state is unknown
+                connection[1].close()
+                raise
+
+            status, reason, response_headers, response_body = response
+            if response_headers.get('connection', '').lower() == 'close':
+                connection[1].close()
+            else:
+                self._idle.setdefault(key, []).append(connection)
+            return response
+
+    async def close(self):
+        """Closes all idle connections."""
+        for connections in self._idle.values():
+            for _, writer in connections:
+                writer.close()
+        self._idle.clear()
+
+    async def _acquire(self, key, reuse=True):
+        idle = self._idle.get(key, [])
+        while reuse and idle:
+            reader, writer = idle.pop()
+            if not reader.at_eof():
+                return (reader, writer), True
+            writer.close()
+
+        scheme, host, port = key
+        ssl_context = None
+        if scheme == 'https':
+            if self._ssl_context is None:
+                self._ssl_context = _ssl_context(self.verify)
+            ssl_context = self._ssl_context
+        connection = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=ssl_context),
+            self.timeout[0])
+        return connection, False
+
+    async def _exchange(self, connection, message):
+        reader, writer = connection
+        writer.write(message)
+        await writer.drain()
+        return await asyncio.wait_for(self._read_response(reader),
+                                      self.timeout[1])
+
+    async def _read_response(self, reader):
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed by server")
+        status_parts = status_line.decode('latin-1').rstrip('\r\n').split(
+            ' ', 2)
+        status = int(status_parts[1])
+        reason = status_parts[2] if len(status_parts) > 2 else ''
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').rstrip('\r\n')
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            body = b''.join(chunks)
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        else:
+            body = await reader.read()
+            headers['connection'] = 'close'
+        return status, reason, headers, body
+
+
+def _ssl_context(verify):
+    """Returns an SSL context for the requests `verify` option."""
+    if verify is False:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        return context
+    if isinstance(verify, str):
+        if os.path.isdir(verify):
+            return ssl.create_default_context(capath=verify)
+        return ssl.create_default_context(cafile=verify)
+    return ssl.create_default_context()
+
+
+def get_async_pool(max_connections=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT,
+                   verify=True):
+    """Returns the connection pool of the running event loop with the given
+    settings (see AsyncHttpPool)."""
+    loop = asyncio.get_event_loop()
+    pools = _pools.get(loop)
+    if pools is None:
+        pools = _pools[loop] = {}
+    key = (max_connections, timeout, verify)
+    if key not in pools:
+        pools[key] = AsyncHttpPool(max_connections, timeout, verify)
+    return pools[key]
+
+
+async def close_async_pool():
+    """Closes the idle connections of the running event loop's pools."""
+    pools = _pools.pop(asyncio.get_event_loop(), None)
+    for pool in (pools or {}).values():
+        await pool.close()
+
+
+class AsyncSoapMixin(object):
+    """Adds asyncio counterparts of the SoapClient call methods.
+
+    Async calls use the timeout of the client and the pool size and
+    certificate verification of its session, like the sync calls.
+    """
+
+    def _async_pool_settings(self, url):
+        settings = {'timeout': self._timeout}
+        session = self._http_session()
+        if isinstance(session, requests.Session):
+            settings['verify'] = session.verify
+            adapter = session.get_adapter(url)
+            settings['max_connections'] = getattr(
+                adapter, '_pool_maxsize', DEFAULT_POOL_SIZE)
+        return settings
+
+    async def method_call_async(self, methodname, method_args,
+                                postprocess=None):
+        """Calls an arbitrary SOAP method without blocking the event loop.
+
+        Args:
+            methodname (str): name of the method to call
+            method_args (list): argument list to pass to the method
+            postprocess (callable): optional function applied to the result
+
+        Returns:
+            SOAP response or SOAP fault object, just like method_call()
+        """
+        memo_key = self._memo_key(methodname, method_args)
+        if memo_key is not None:
+            found, response = self.memo.get(memo_key)
+            if found:
+                return postprocess(response) if postprocess else response
+
+        client = self._nosend_client
+        if client is None:
+            # Loading the WSDL blocks, so do it once in a worker thread
+            loop = asyncio.get_event_loop()
+            client = await loop.run_in_executor(None, self._get_nosend_client)
+
+        try:
+            method = getattr(client.service, methodname)
+        except MethodNotFound as error:
+            return error
+
+        context = method(*method_args)
+        action = method.method.soap.action
+        if isinstance(action, bytes):
+            action = action.decode('utf-8')
+        headers = {'Content-Type': 'text/xml; charset=utf-8',
+                   'SOAPAction': action}
+        start = time.time()
+        try:
+            pool = get_async_pool(**self._async_pool_settings(
+                method.method.location))
+            status, reason, _, body = await pool.request(
+                'POST', method.method.location, headers, context.envelope)
+        except Exception as error:
+            if self.instrumentation is not None:
+                self._record_call(methodname, start, error=error,
+                                  sizes=(len(context.envelope), None))
+            raise
+
+        try:
+            response = context.process_reply(body, status, reason)
+        except WebFault as error:
+            response = error
+        if self.instrumentation is not None:
+            self._record_call(methodname, start, response=response,
+                              sizes=(len(context.envelope), len(body)))
+
+        if memo_key is not None and not isinstance(response, Exception):
+            self.memo.put(memo_key, response)
+        if postprocess is not None:
+            return postprocess(response)
+        return response
+
+    async def method_call_many_async(self, calls,
+                                     max_concurrency=DEFAULT_MAX_WORKERS):
+        """Calls many SOAP methods concurrently on the event loop.
+
+        Args:
+            calls (iterable): (methodname, method_args) tuples
+            max_concurrency (int): maximum number of calls in flight
+
+        Returns:
+            List of results in the order of `calls`; calls failing on the
+            transport level yield the exception instead of aborting the
+            others. Cancelling the returned coroutine cancels all calls.
+        """
+        slots = asyncio.Semaphore(max_concurrency)
+
+        async def call(methodname, method_args):
+            async with slots:
+                try:
+                    return await self.method_call_async(methodname,
+                                                        method_args)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as error:
+                    return error
+
+        return await asyncio.gather(*[call(methodname, method_args)
+                                      for methodname, method_args in calls])
@@ -1,16 +1,42 @@
 """Lightweight SOAP client to communicate with the authentication manager"""
 from clfpy import SoapClient
 
+# Read-only methods depending only on their arguments; getSessionToken and
+# validateSessionToken must always hit the server
+MEMOIZABLE_METHODS = ('getTokenInfo', 'getUsername', 'getProject',
+                      'getRoles', 'getEmail', 'getEndpoint')
+
 
 class AuthClient(SoapClient):
     """Lightweight AuthManager SOAP client
 
     Create by passing a WSDL URL:
         auth = AuthClient(<wsdl>)
+
+    Pass `memoize=True` to keep the results of the read-only token queries
+    (get_username, get_project, get_roles, get_email, get_endpoint,
+    get_token_info) for `memo_ttl` seconds. Hit/miss counters are available
+    through memo_stats(), stale entries can be dropped with invalidate_memo().
     """
 
-    def __init__(self, wsdl_url):
-        super(AuthClient, self).__init__(wsdl_url)
+    def __init__(self, wsdl_url, memoize=False, memo_ttl=60, memo_size=1024,
+                 **kwargs):
+        super(AuthClient, self).__init__(wsdl_url, **kwargs)
+        if memoize:
+            self.enable_memo(MEMOIZABLE_METHODS, memo_ttl, memo_size)
+
+    def invalidate_memo(self, session_token=None):
+        """Drops memoized results for one session token, or all of them."""
+        if self.memo is None:
+            return
+        if session_token is None:
+            self.memo.clear()
+        else:
+            self.memo.invalidate_if(lambda key: key[1][:1] == (session_token,))
+
+    def memo_stats(self):
+        """Returns the memoization counters, or None if memoization is off."""
+        return self.memo.stats() if self.memo is not None else None
 
     def get_session_token(self, username, project, password):
         return self.method_call('getSessionToken', [username, password,
@@ -46,6 +72,41 @@ class AuthClient(SoapClient):
     def count_workflows(self):
         return self.method_call('countWorkflows', [])
 
+    def get_session_token_async(self, username, project, password):
+        return self.method_call_async('getSessionToken', [username, password,
+                                                          project])
+
+    def get_token_info_async(self, session_token):
+        return self.method_call_async('getTokenInfo', [session_token])
+
+    def get_token_info_complete_async(self, session_token):
+        return self.method_call_async('getTokenInfoComplete', [session_token])
+
+    def validate_session_token_async(self, session_token):
+        return self.method_call_async('validateSessionToken', [session_token])
+
+    def get_username_async(self, session_token):
+        return self.method_call_async('getUsername', [session_token])
+
+    def get_project_async(self, session_token):
+        return self.method_call_async('getProject', [session_token])
+
+    def get_roles_async(self, session_token):
+        return self.method_call_async('getRoles', [session_token])
+
+    def get_email_async(self, session_token):
+        return self.method_call_async('getEmail', [session_token])
+
+    def get_endpoint_async(self, session_token, component):
+        return self.method_call_async('getEndpoint', [session_token,
+                                                      component])
+
+    def get_openstack_token_async(self, session_token):
+        return self.method_call_async('getOpenStackToken', [session_token])
+
+    def count_workflows_async(self):
+        return self.method_call_async('countWorkflows', [])
+
 
 class AuthUsersClient(SoapClient):
     """Lightweight AuthManager/Users SOAP client
@@ -54,8 +115,8 @@ class AuthUsersClient(SoapClient):
         auth_users = AuthUsersClient(<wsdl>)
     """
 
-    def __init__(self, wsdl_url):
-        super(AuthUsersClient, self).__init__(wsdl_url)
+    def __init__(self, wsdl_url, **kwargs):
+        super(AuthUsersClient, self).__init__(wsdl_url, **kwargs)
 
     def list_users(self, token):
         return self.method_call('listUsers', [token])
@@ -107,8 +168,8 @@ class AuthProjectsClient(SoapClient):
         auth_projects = AuthProjectsClient(<wsdl>)
     """
 
-    def __init__(self, wsdl_url):
-        super(AuthProjectsClient, self).__init__(wsdl_url)
+    def __init__(self, wsdl_url, **kwargs):
+        super(AuthProjectsClient, self).__init__(wsdl_url, **kwargs)
 
     def list_projects(self, token):
         return self.method_call('listProjects', [token])
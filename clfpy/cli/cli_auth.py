@@ -21,10 +21,19 @@ class AuthCLI(cmd.Cmd, object):
         self.user = user
         self.project = project
 
+    @property
+    def auth_client(self):
+        return cf.get_client(cf.AuthClient, AUTH_endpoint)
+
+    @property
+    def user_client(self):
+        return cf.get_client(cf.AuthUsersClient, USER_endpoint)
+
+    @property
+    def proj_client(self):
+        return cf.get_client(cf.AuthProjectsClient, PROJ_endpoint)
+
     def preloop(self):
-        self.auth_client = cf.AuthClient(AUTH_endpoint)
-        self.user_client = cf.AuthUsersClient(USER_endpoint)
-        self.proj_client = cf.AuthProjectsClient(PROJ_endpoint)
         self.update_prompt()
 
         self.intro = ("This is the CloudFlow authManager client. "
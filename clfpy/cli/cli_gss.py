@@ -4,8 +4,9 @@ import readline
 import os
 
 import clfpy as cf
+from clfpy.transfer import DEFAULT_MAX_WORKERS
 from .cli_images import ImagesCLI
-from .tools import query_yes_no
+from .tools import query_yes_no, pop_flag, pop_int_option
 
 GSS_endpoint = "https://api.hetcomp.org/gss-0.1/FileUtilities?wsdl"
 
@@ -13,6 +14,21 @@ GSS_roots = [
         "it4i_barbora://"
 ]
 
+_gss_client = None
+
+
+def get_gss_client():
+    """Returns the GSS client of the CLI, created on first use.
+
+    Commands query the same URIs several times, so the client caches
+    resource information. It is owned by the CLI rather than taken from
+    clfpy.get_client(), whose shared clients keep their own settings.
+    """
+    global _gss_client
+    if _gss_client is None:
+        _gss_client = cf.GssClient(GSS_endpoint, cache=True)
+    return _gss_client
+
 
 class GssCLI(cmd.Cmd, object):
 
@@ -23,7 +39,8 @@ class GssCLI(cmd.Cmd, object):
         self.project = project
 
     def preloop(self):
-        self.gss = cf.GssClient(GSS_endpoint)
+        self.gss = get_gss_client()
+        self.gss.warm_up(background=True)
         self.root = GSS_roots[0]
         self.folder = '.'
         self.update_prompt()
@@ -115,10 +132,13 @@ class GssCLI(cmd.Cmd, object):
 
         resinfo = self.gss.get_resource_information(URI, self.session_token)
         if resinfo.type == "FOLDER":
-            contents = self.gss.list_files_minimal(URI, self.session_token)
-            folders = [x['visualName'] for x in contents
-                       if x['type'] == 'FOLDER']
-            files = [x['visualName'] for x in contents if x['type'] == 'FILE']
+            folders = []
+            files = []
+            for x in self.gss.iter_files_minimal(URI, self.session_token):
+                if x['type'] == 'FOLDER':
+                    folders.append(x['visualName'])
+                elif x['type'] == 'FILE':
+                    files.append(x['visualName'])
             for fol in sorted(folders):
                 print(F'  {fol:<30} FOLDER')
             for fil in sorted(files):
@@ -195,8 +215,19 @@ class GssCLI(cmd.Cmd, object):
             self.gss.delete(URI, self.session_token)
 
     def do_ul(self, args):
-        """Upload a file or folder. Usage: ul LOCAL_PATH [REMOTE_FILENAME]"""
+        """Upload a file or folder.
+        Usage: ul [--resume] [--workers N] LOCAL_PATH [REMOTE_FILENAME]
+        With --resume, an interrupted file upload (also started with
+        --resume) is continued. Folders are uploaded by N parallel workers.
+        """
         arglist = args.split()
+        resume = pop_flag(arglist, '--resume')
+        try:
+            workers = pop_int_option(arglist, '--workers',
+                                     DEFAULT_MAX_WORKERS)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
         if len(arglist) == 1:
             local_path = arglist[0]
             remote_filename = os.path.basename(local_path)
@@ -213,6 +244,14 @@ class GssCLI(cmd.Cmd, object):
             if URI_type == "FOLDER":
                 print(f"Error: Folder {URI} exists")
                 return
+            elif URI_type == "FILE" and resume:
+                try:
+                    self.gss.upload(URI, self.session_token, local_path,
+                                    resume=True)
+                    print(f"Resumed upload to {URI}")
+                except AttributeError:
+                    print(f"Error: File {URI} exists and there is no "
+                          "interrupted upload of this file to resume")
             elif URI_type == "FILE":
                 overwrite = query_yes_no(f"Warning: File {URI} exists, "
                                          "do you want to overwrite?", "yes")
@@ -222,10 +261,11 @@ class GssCLI(cmd.Cmd, object):
                     print("Upload cancelled")
             else:
                 print(f"Uploading new file to {URI}")
-                self.gss.upload(URI, self.session_token, local_path)
+                self.gss.upload(URI, self.session_token, local_path,
+                                resume=resume)
 
         elif os.path.isdir(local_path):
-            remote_filename = os.path.basename(local_path)
+            remote_filename = os.path.basename(os.path.normpath(local_path))
             URI, path = self.make_path_URI(remote_filename)
             URI_type = self.get_type(URI)
             if URI_type == "FOLDER":
@@ -241,13 +281,25 @@ class GssCLI(cmd.Cmd, object):
                 print(f"Uploading folder {local_path} to {URI} "
                       "(REMOTE_FILENAME is ignored here)")
                 self.gss.upload_folder(parent_URI, self.session_token,
-                                       local_path)
+                                       local_path, max_workers=workers,
+                                       progress=True)
         else:
             print(F'Local file or folder {local_path} not found.')
 
     def do_dl(self, args):
-        """Download a file or folder. Usage: dl REMOTE_NAME [LOCAL_PATH]"""
+        """Download a file or folder.
+        Usage: dl [--resume] [--workers N] REMOTE_NAME [LOCAL_PATH]
+        With --resume, an interrupted download (also started with --resume)
+        is continued. Folders are downloaded by N parallel workers.
+        """
         arglist = args.split()
+        resume = pop_flag(arglist, '--resume')
+        try:
+            workers = pop_int_option(arglist, '--workers',
+                                     DEFAULT_MAX_WORKERS)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
         if len(arglist) == 1:
             remote_filename = arglist[0]
             local_path = os.path.basename(remote_filename)
@@ -268,15 +320,83 @@ class GssCLI(cmd.Cmd, object):
 
         if URI_type == "FILE":
             print(f"Downloading {URI} to {local_path}")
-            self.gss.download_to_file(URI, self.session_token, local_path)
+            self.gss.download_to_file(URI, self.session_token, local_path,
+                                      resume=resume)
         elif URI_type == "FOLDER":
             print("Warning: Folder download is not a core GSS feature. "
                   "Use at your own risk")
             print(f"Downloading folder {URI} (LOCAL_PATH is ignored here)")
-            self.gss.download_folder(URI, self.session_token)
+            self.gss.download_folder(URI, self.session_token,
+                                     max_workers=workers, resume=resume,
+                                     progress=True)
         else:
             print(f"Error: URI {URI} not found.")
 
+    def do_sync(self, args):
+        """Synchronise a local folder and a remote folder.
+        Usage: sync [--delete] [--checksum] [--workers N] up|down LOCAL_FOLDER
+                    [REMOTE_FOLDER]
+        'up' updates REMOTE_FOLDER from LOCAL_FOLDER, 'down' the other way
+        round; only new and changed files are transferred by N parallel
+        workers. REMOTE_FOLDER defaults to the name of LOCAL_FOLDER. With
+        --delete, files missing in the source are deleted from the target.
+        With --checksum, a local hash manifest detects files that were only
+        touched since the last sync.
+        """
+        arglist = args.split()
+        delete = pop_flag(arglist, '--delete')
+        checksum = pop_flag(arglist, '--checksum')
+        try:
+            workers = pop_int_option(arglist, '--workers',
+                                     DEFAULT_MAX_WORKERS)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+        if len(arglist) not in (2, 3) or arglist[0] not in ('up', 'down'):
+            print("Error: Usage: sync [--delete] [--checksum] [--workers N] "
+                  "up|down LOCAL_FOLDER [REMOTE_FOLDER]")
+            return
+        direction, local_path = arglist[:2]
+        if len(arglist) == 3:
+            remote_folder = arglist[2]
+        else:
+            remote_folder = os.path.basename(os.path.normpath(local_path))
+
+        try:
+            URI, path = self.make_path_URI(remote_folder)
+        except ValueError:
+            print("Error: Illegal path")
+            return
+
+        URI_type = self.get_type(URI)
+        if URI_type == "FILE":
+            print(f"Error: File {URI} exists")
+            return
+        if direction == 'up' and not os.path.isdir(local_path):
+            print(f"Error: Local folder {local_path} not found.")
+            return
+        if direction == 'down' and URI_type != "FOLDER":
+            print(f"Error: Folder {URI} not found.")
+            return
+        if direction == 'down' and os.path.isfile(local_path):
+            print(f"Error: Local file {local_path} exists")
+            return
+
+        if delete:
+            target = URI if direction == 'up' else local_path
+            if not query_yes_no(f"Warning: Files and folders missing in the "
+                                f"source will be deleted from {target}. "
+                                "Continue?", "no"):
+                print("Sync cancelled")
+                return
+        if direction == 'up':
+            print(f"Synchronising {URI} from {local_path}")
+        else:
+            print(f"Synchronising {local_path} from {URI}")
+        self.gss.sync(local_path, URI, self.session_token,
+                      direction=direction, delete=delete, checksum=checksum,
+                      max_workers=workers, progress=True)
+
     def do_img_ls(self, arg):
         """List Singularity images registered on the current cluster. Usage: img_ls"""
         img = ImagesCLI(self.session_token, self.user, self.project, self.root)
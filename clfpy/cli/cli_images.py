@@ -19,7 +19,10 @@ class ImagesCLI(cmd.Cmd, object):
         self.user = user
         self.project = project
         self.root = root
-        self.img = cf.HpcImagesClient(IMG_endpoints[self.root])
+
+    @property
+    def img(self):
+        return cf.get_client(cf.HpcImagesClient, IMG_endpoints[self.root])
 
     def preloop(self):
         self.image_list = []
@@ -73,7 +76,6 @@ class ImagesCLI(cmd.Cmd, object):
             return
         if cluster in IMG_endpoints:
             self.root = cluster
-            self.img = cf.HpcImagesClient(IMG_endpoints[self.root])
             self.update_prompt()
         else:
             print(f"Error: Unknown cluster '{cluster}'")
@@ -79,3 +79,30 @@ def query_yes_no(question, default="yes"):
         else:
             sys.stdout.write("Please respond with 'yes' or 'no' "
                              "(or 'y' or 'n').\n")
+
+
+def pop_flag(arglist, flag):
+    """Removes a flag like --resume from an argument list.
+
+    Returns True if the flag was present.
+    """
+    if flag in arglist:
+        arglist.remove(flag)
+        return True
+    return False
+
+
+def pop_int_option(arglist, option, default):
+    """Removes an option like --workers N from an argument list.
+
+    Returns its value, or the default if the option is missing. Raises
+    ValueError if the value is missing or not an integer.
+    """
+    if option not in arglist:
+        return default
+    index = arglist.index(option)
+    if index + 1 >= len(arglist):
+        raise ValueError(f"Option {option} needs a value")
+    value = int(arglist[index + 1])
+    del arglist[index:index + 2]
+    return value
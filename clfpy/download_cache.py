@@ -0,0 +1,273 @@
+"""Persistent on-disk read-through cache for GSS downloads"""
+import os
+import time
+import errno
+import shutil
+import hashlib
+import threading
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+from .transfer import _replace, _remove, _cache_location
+
+DEFAULT_MAX_SIZE = 10 * 1000 ** 3
+# Temporary files of downloads older than this were abandoned
+TMP_MAX_AGE = 24 * 3600
+
+
+def _default_location():
+    """Returns the default cache folder, honouring CLFPY_DOWNLOAD_CACHE_DIR."""
+    return _cache_location('downloads', 'CLFPY_DOWNLOAD_CACHE_DIR')
+
+
+class _FileLock(object):
+    """Advisory lock on a file, shared between processes.
+
+    Uses flock() where available; on Windows, all locks are exclusive.
+    Without either, only the atomic renames protect the cache.
+    """
+
+    def __init__(self, filename, shared=False):
+        self.filename = filename
+        self.shared = shared
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.filename, 'a+b')
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(),
+                        fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+        return False
+
+
+class DownloadCache(object):
+    """Read-through cache of downloaded GSS files shared by all processes
+    of a user on a node.
+
+    Entries are addressed by a hash of the GSS ID and the size and
+    modification time of the remote file, so a changed remote file simply
+    gets a new entry. A miss downloads into a temporary file inside the
+    cache, which is then published with an atomic rename; a lock per entry
+    makes concurrent requests for the same file wait for a single download.
+    Hits are handed out as hard links (read-only, since they share the
+    cached data) or, with `link=False` or across file systems, as copies.
+
+    The cache holds at most `max_size` bytes: after every new entry, the
+    least recently used entries are evicted under an exclusive lock, while
+    hits hold a shared one.
+
+    Create with an optional cache folder and size and pass it to the GSS
+    client:
+        cache = DownloadCache('/scratch/gss_cache', max_size=50 * 10 ** 9)
+        gss = GssClient(<wsdl>, download_cache=cache)
+    """
+
+    def __init__(self, location=None, max_size=DEFAULT_MAX_SIZE, link=True):
+        self.location = location or _default_location()
+        self.max_size = max_size
+        self.link = link
+        self._objects = os.path.join(self.location, 'objects')
+        self._tmp = os.path.join(self.location, 'tmp')
+        for folder in (self._objects, self._tmp):
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+        self._lock_file = os.path.join(self.location, 'cache.lock')
+        self._counter_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._bytes_saved = 0
+
+    def key(self, gss_ID, size, mtime):
+        """Returns the address of a remote file version."""
+        return hashlib.sha256(u'{}\0{}\0{}'.format(
+            gss_ID, size, mtime).encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self._objects, key[:2], key)
+
+    def fetch(self, gss_ID, size, mtime, out_filename, download):
+        """Provides a remote file version at out_filename.
+
+        On a miss, `download(filename)` is called to download the file to a
+        temporary filename first. Returns True for a hit, False for a miss.
+        """
+        key = self.key(gss_ID, size, mtime)
+        path = self.path(key)
+        if self._copy_out(path, size, out_filename):
+            self._count(hit=True, n_bytes=size)
+            return True
+
+        folder = os.path.dirname(path)
+        if not os.path.isdir(folder):
+            try:
+                os.makedirs(folder)
+            except OSError as error:
+                if error.errno != errno.EEXIST:
+                    raise
+        with _FileLock(path + '.lock'):
+            # Another process may have downloaded it meanwhile
+            if self._copy_out(path, size, out_filename):
+                self._count(hit=True, n_bytes=size)
+                return True
+            self._count(hit=False)
+            tmp_name = os.path.join(self._tmp, '{}.{}.{}'.format(
+                key, os.getpid(), threading.current_thread().ident))
+            try:
+                download(tmp_name)
+                if os.path.getsize(tmp_name) != size:
+                    raise IOError("Downloaded {} bytes of {}, expected "
+                                  "{}".format(os.path.getsize(tmp_name),
+                                              gss_ID, size))
+                os.chmod(tmp_name, 0o444)
+                with _FileLock(self._lock_file, shared=True):
+                    _replace(tmp_name, path)
+                    self._copy_out_locked(path, size, out_filename)
+            finally:
+                if os.path.exists(tmp_name):
+                    os.chmod(tmp_name, 0o644)
+                    os.remove(tmp_name)
+        self.evict()
+        return False
+
+    def _copy_out(self, path, size, out_filename):
+        """Copies an entry to out_filename, returns False if it is missing."""
+        if not os.path.exists(path):
+            return False
+        with _FileLock(self._lock_file, shared=True):
+            return self._copy_out_locked(path, size, out_filename)
+
+    def _copy_out_locked(self, path, size, out_filename):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if stat.st_size != size:
+            # Damaged entry
+            _remove(path)
+            return False
+        # The access time orders the entries for eviction
+        try:
+            os.utime(path, (time.time(), stat.st_mtime))
+        except OSError:
+            # Entry of another user
+            pass
+        out_folder = os.path.dirname(os.path.abspath(out_filename))
+        tmp_name = os.path.join(out_folder, '.{}.{}.{}.clfpy-cache'.format(
+            os.path.basename(out_filename), os.getpid(),
+            threading.current_thread().ident))
+        _remove(tmp_name)
+        linked = False
+        if self.link and hasattr(os, 'link'):
+            try:
+                os.link(path, tmp_name)
+                linked = True
+            except OSError:
+                # E.g. another file system
+                pass
+        if not linked:
+            shutil.copyfile(path, tmp_name)
+        try:
+            _replace(tmp_name, out_filename)
+        except OSError:
+            _remove(tmp_name)
+            raise
+        return True
+
+    def evict(self, max_size=None):
+        """Removes the least recently used entries until the cache holds
+        at most `max_size` bytes (by default the configured maximum)."""
+        max_size = self.max_size if max_size is None else max_size
+        with _FileLock(self._lock_file):
+            entries = []
+            total = 0
+            for path in self._entries():
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_atime, stat.st_size, path))
+                total += stat.st_size
+            entries.sort()
+            now = time.time()
+            for name in os.listdir(self._tmp):
+                tmp_name = os.path.join(self._tmp, name)
+                try:
+                    if now - os.path.getmtime(tmp_name) > TMP_MAX_AGE:
+                        _remove(tmp_name)
+                except OSError:
+                    pass
+            for _, size, path in entries:
+                if total <= max_size:
+                    break
+                if _remove(path):
+                    _remove(path + '.lock')
+                    total -= size
+                    with self._counter_lock:
+                        self._evictions += 1
+
+    def clear(self):
+        """Removes all entries."""
+        self.evict(0)
+
+    def usage(self):
+        """Returns the number of entries and their total size in bytes."""
+        n_entries = 0
+        total = 0
+        for path in self._entries():
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                continue
+            n_entries += 1
+        return n_entries, total
+
+    def stats(self):
+        """Returns the counters of this cache object and the usage of the
+        cache folder."""
+        n_entries, total = self.usage()
+        with self._counter_lock:
+            lookups = self._hits + self._misses
+            return {'hits': self._hits, 'misses': self._misses,
+                    'hit_rate': float(self._hits) / lookups if lookups
+                    else 0.0,
+                    'bytes_saved': self._bytes_saved,
+                    'evictions': self._evictions, 'size': n_entries,
+                    'bytes': total}
+
+    def _entries(self):
+        for folder in os.listdir(self._objects):
+            folder = os.path.join(self._objects, folder)
+            if not os.path.isdir(folder):
+                continue
+            for name in os.listdir(folder):
+                if not name.endswith('.lock'):
+                    yield os.path.join(folder, name)
+
+    def _count(self, hit, n_bytes=0):
+        with self._counter_lock:
+            if hit:
+                self._hits += 1
+                self._bytes_saved += n_bytes
+            else:
+                self._misses += 1
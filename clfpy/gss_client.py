@@ -2,10 +2,57 @@
 """Lightweight SOAP client to communicate with GSS"""
 import os
 import sys
+import shutil
 import time
+import threading
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+try:
+    from urllib.parse import quote, urlparse
+except ImportError:
+    from urllib import quote
+    from urlparse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 
 from clfpy import SoapClient
+from clfpy.soap_client import DEFAULT_MAX_WORKERS
+from clfpy.transport import make_session
+from clfpy.fast_soap import FastSoapEngine, Record
+from clfpy.progress import Progress, TerminalProgress, track
+from clfpy.ttl_cache import TTLCache
+from clfpy.download_cache import DownloadCache
+from clfpy.streams import (ResponseReader, SizedSource, GssFile, iter_source,
+                           RANGE_BLOCK_SIZE, DEFAULT_CACHE_BLOCKS,
+                           DEFAULT_READ_AHEAD, REJECTED_STATUS_CODES)
+from clfpy.transfer import (download, remote_size, remote_stat, is_outdated,
+                            run_concurrently, UploadState, SyncManifest,
+                            TransferSummary, ThroughputStats, PART_SUFFIX,
+                            STATE_SUFFIX, DEFAULT_BLOCK_SIZE,
+                            DEFAULT_CONNECTIONS, DEFAULT_RETRIES, RETRY_DELAY,
+                            TRANSIENT_ERRORS)
+
+# Directions of GssClient.sync()
+SYNC_UP = 'up'
+SYNC_DOWN = 'down'
+
+# Read-only methods whose results are kept by the resource cache
+CACHED_METHODS = ('getResourceInformation', 'listFiles', 'listFilesMinimal',
+                  'containsFile')
+
+# Connections kept per storage host for direct transfers
+DIRECT_POOL_SIZE = 32
+
+# Folder transfers can resume uploads of files from this size on; smaller
+# files are simply uploaded again
+RESUME_MIN_SIZE = 16 * 1000 * 1000
+
+
+class _Rejected(Exception):
+    """A reused request description was rejected by the storage endpoint"""
 
 
 class GssClient(SoapClient):
@@ -13,16 +60,329 @@ class GssClient(SoapClient):
 
     Create by passing a WSDL URL:
         gss = GssClient(<wsdl>)
+
+    With `fast_path=True`, getResourceInformation, listFiles and
+    listFilesMinimal bypass suds object building and return lightweight
+    clfpy.fast_soap.Record objects instead (see clfpy.FastSoapEngine).
+
+    Pass `cache=True` (or call enable_cache() later) to keep resource
+    information, listings and containsFile results for `cache_ttl` seconds.
+    create_folder, delete_folder, upload, update and delete drop the cached
+    results of the affected GSS ID and its parent folder; changes made by
+    other clients become visible once the entries expire. Hit/miss counters
+    are available through cache_stats().
+
+    Pass `reuse_descriptions=True` (or call enable_description_reuse()
+    later) to reuse the signed request descriptions of transfers for up to
+    `description_ttl` seconds, see enable_description_reuse().
+
+    With `direct=True`, downloads and updates go straight to the storage
+    endpoint returned by getDirectInteractionEndpoint, resolved once per
+    storage root, through one pooled session per storage host. Transfers
+    fall back to the URLs of the request descriptions if that fails.
+    `direct_headers` is an optional function returning the HTTP headers for
+    the direct endpoint given the session token. The achieved throughput of
+    both paths is available through throughput_stats().
+
+    `progress` is the default for the `progress` argument of transfers:
+    True renders a terminal progress bar (see clfpy.progress.TerminalProgress)
+    when a transfer asks for one, False turns progress reporting off for all
+    transfers, and a clfpy.progress.Progress instance receives the reports
+    of all transfers asking for progress.
+
+    Pass a clfpy.DownloadCache as `download_cache` (or True for one in the
+    default location) to serve repeated downloads of unchanged files from a
+    local cache shared by all processes on the node, see download_to_file().
     """
 
-    def __init__(self, wsdl_url):
-        super(GssClient, self).__init__(wsdl_url)
+    def __init__(self, wsdl_url, fast_path=False, cache=False, cache_ttl=10,
+                 cache_size=4096, reuse_descriptions=False,
+                 description_ttl=300, direct=False, direct_headers=None,
+                 progress=True, download_cache=None, **kwargs):
+        super(GssClient, self).__init__(wsdl_url, **kwargs)
+        self.fast_engine = FastSoapEngine(self) if fast_path else None
+        # Streaming listings always need an engine
+        self._streaming_engine = self.fast_engine or FastSoapEngine(self)
+        if cache:
+            self.enable_cache(cache_ttl, cache_size)
+        self.descriptions = None
+        self._refreshed_descriptions = 0
+        self._refreshed_lock = threading.Lock()
+        if reuse_descriptions:
+            self.enable_description_reuse(description_ttl)
+        self.direct = direct
+        self.direct_headers = direct_headers
+        self._direct_endpoints = {}
+        self._direct_sessions = {}
+        self._direct_lock = threading.Lock()
+        self.throughput = ThroughputStats()
+        self.progress = progress
+        if download_cache is True:
+            download_cache = DownloadCache()
+        self.download_cache = download_cache
+
+    def enable_cache(self, ttl=10, maxsize=4096):
+        """Caches resource information, listings and containsFile results.
+
+        The read and write descriptions contained in cached resource
+        information are reused as well, so `ttl` should stay well below
+        their validity.
+        """
+        self.enable_memo(CACHED_METHODS, ttl, maxsize)
+
+    def invalidate_cache(self, gss_ID=None, recursive=False):
+        """Drops cached results for a GSS ID and its parent, or all of them.
+
+        With `recursive=True`, cached results for everything below gss_ID
+        are dropped as well.
+        """
+        if self.memo is None:
+            return
+        if gss_ID is None:
+            self.memo.clear()
+            return
+        gss_ID = gss_ID.rstrip('/')
+        affected = (gss_ID, gss_ID.rsplit('/', 1)[0].rstrip('/'))
+        below = gss_ID + '/'
+
+        def predicate(key):
+            cached_ID = key[1][0].rstrip('/')
+            return cached_ID in affected or \
+                (recursive and cached_ID.startswith(below))
+        self.memo.invalidate_if(predicate)
+
+    def cache_stats(self):
+        """Returns the cache counters, or None if the cache is off."""
+        return self.memo.stats() if self.memo is not None else None
+
+    def enable_description_reuse(self, ttl=300, maxsize=4096):
+        """Reuses the request descriptions of transfers.
+
+        download_to_file(), open_read(), upload() and update() (and thus the
+        folder transfers and sync()) keep the resource information of every
+        GSS ID for up to `ttl` seconds and take the read, create and update
+        descriptions from there instead of calling getResourceInformation
+        again. Listings from iter_files() and walk(minimal=False) are kept
+        as well. Descriptions rejected by the storage endpoint with HTTP 401
+        or 403, e.g. because their signature expired, are refreshed and the
+        transfer repeated once. Creating or deleting a GSS ID through this
+        client drops its entries. Counters are available through
+        description_stats().
+        """
+        self.descriptions = TTLCache(maxsize, ttl)
+
+    def description_stats(self):
+        """Returns the description reuse counters, or None if it is off.
+
+        `saved_round_trips` counts the getResourceInformation calls saved,
+        i.e. reused descriptions which were not rejected.
+        """
+        if self.descriptions is None:
+            return None
+        stats = self.descriptions.stats()
+        return {'reused': stats['hits'], 'fetched': stats['misses'],
+                'refreshed': self._refreshed_descriptions,
+                'saved_round_trips':
+                    stats['hits'] - self._refreshed_descriptions,
+                'size': stats['size']}
+
+    def _forget_descriptions(self, gss_ID, recursive=False):
+        if self.descriptions is None:
+            return
+        gss_ID = gss_ID.rstrip('/')
+        below = gss_ID + '/'
+        self.descriptions.invalidate_if(
+            lambda key: key[0].rstrip('/') == gss_ID or
+            (recursive and key[0].startswith(below)))
+
+    def _remember_descriptions(self, entries, session_token):
+        for entry in entries:
+            self.descriptions.put((entry['uniqueName'], session_token), entry)
+            yield entry
+
+    def _with_descriptions(self, gss_ID, session_token, operation):
+        """Calls operation(res_info, reused) for gss_ID.
+
+        The operation raises _Rejected if a reused description was
+        rejected; it is then called again with fresh resource information.
+        """
+        if self.descriptions is None:
+            return operation(
+                self.get_resource_information(gss_ID, session_token), False)
+        key = (gss_ID, session_token)
+        found, res_info = self.descriptions.get(key)
+        if found:
+            try:
+                return operation(res_info, True)
+            except _Rejected:
+                with self._refreshed_lock:
+                    self._refreshed_descriptions += 1
+                self.descriptions.invalidate(key)
+                self.invalidate_cache(gss_ID)
+        res_info = self.get_resource_information(gss_ID, session_token)
+        if not isinstance(res_info, Exception):
+            self.descriptions.put(key, res_info)
+        return operation(res_info, False)
+
+    def _reporter(self, progress, prefix):
+        """Resolves the `progress` argument of a transfer.
+
+        Returns the reporter (None if reporting is off) and whether it was
+        created for this transfer and has to be closed by it.
+        """
+        if progress is True:
+            progress = self.progress
+        if progress is True:
+            return TerminalProgress(prefix), True
+        if isinstance(progress, Progress):
+            return progress, False
+        return None, False
+
+    def throughput_stats(self):
+        """Returns the transfer counters per storage root and path.
+
+        See clfpy.transfer.ThroughputStats.stats(); `self.throughput.summary()`
+        formats them as a table.
+        """
+        return self.throughput.stats()
+
+    def download_cache_stats(self):
+        """Returns the download cache counters, or None if it is off.
+
+        See clfpy.DownloadCache.stats().
+        """
+        if self.download_cache is None:
+            return None
+        return self.download_cache.stats()
+
+    def _direct_target(self, gss_ID, session_token):
+        """Returns the direct URL and session for gss_ID, or None.
+
+        The endpoint is resolved once per storage root; roots without a
+        usable endpoint are remembered as well.
+        """
+        root = _storage_root(gss_ID)
+        with self._direct_lock:
+            if root not in self._direct_endpoints:
+                endpoint = self.get_direct_interaction_endpoint(
+                    root, session_token)
+                if isinstance(endpoint, Exception) or not endpoint or \
+                        not str(endpoint).startswith(('http://', 'https://')):
+                    endpoint = None
+                self._direct_endpoints[root] = endpoint
+            endpoint = self._direct_endpoints[root]
+            if endpoint is None:
+                return None
+            host = urlparse(endpoint).netloc
+            if host not in self._direct_sessions:
+                self._direct_sessions[host] = make_session(DIRECT_POOL_SIZE)
+            session = self._direct_sessions[host]
+        url = "{}/{}".format(endpoint.rstrip('/'),
+                             quote(gss_ID[len(root):].strip('/')))
+        headers = dict(self.direct_headers(session_token)) \
+            if self.direct_headers else {}
+        return url, headers, session
+
+    def _direct_failed(self, gss_ID, error):
+        """Records a failed direct transfer.
+
+        Endpoints refusing access or not answering at all are not tried
+        again for this storage root; other errors (e.g. a missing file) only
+        affect this transfer.
+        """
+        response = getattr(error, 'response', None)
+        if response is None or response.status_code in REJECTED_STATUS_CODES:
+            with self._direct_lock:
+                self._direct_endpoints[_storage_root(gss_ID)] = None
+
+    def _timed_transfer(self, gss_ID, path, n_bytes, func, *args, **kwargs):
+        """Calls a transfer function and records its throughput.
+
+        Records `n_bytes`, or the return value of func if it is None.
+        """
+        start = time.time()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.throughput.record(_storage_root(gss_ID), path, 0,
+                                   time.time() - start, failed=True)
+            raise
+        self.throughput.record(_storage_root(gss_ID), path,
+                               result if n_bytes is None else n_bytes,
+                               time.time() - start)
+        return result
+
+    def _direct_download(self, gss_ID, session_token, out_filename,
+                         reporter=None, block_size=None,
+                         connections=DEFAULT_CONNECTIONS, resume=False):
+        """Downloads from the direct endpoint, returns None on failure."""
+        target = self._direct_target(gss_ID, session_token)
+        if target is None:
+            return None
+        url, headers, session = target
+        try:
+            with track(reporter, os.path.basename(out_filename)) as tracker:
+                return self._timed_transfer(
+                    gss_ID, 'direct', None, download, session, 'GET', url,
+                    headers, out_filename, connections, block_size, tracker,
+                    self._timeout, resume)
+        except requests.RequestException as error:
+            self._direct_failed(gss_ID, error)
+            return None
+
+    def _direct_update(self, gss_ID, session_token, in_filename,
+                       reporter=None):
+        """Replaces a file through the direct endpoint.
+
+        Returns False if the direct endpoint is not available or failed.
+        """
+        target = self._direct_target(gss_ID, session_token)
+        if target is None:
+            return False
+        url, headers, session = target
+        req_desc = Record(httpMethod='PUT', url=url,
+                          headers=[Record(key=k, value=v)
+                                   for k, v in headers.items()])
+        try:
+            response = self._timed_transfer(
+                gss_ID, 'direct', os.path.getsize(in_filename),
+                self._send_file, req_desc, in_filename, reporter,
+                session=session)
+            response.raise_for_status()
+        except requests.RequestException as error:
+            self._direct_failed(gss_ID, error)
+            return False
+        return True
+
+    def _invalidating(self, gss_ID, recursive=False):
+        """Returns a postprocess function invalidating the cache for gss_ID."""
+        def postprocess(result):
+            self.invalidate_cache(gss_ID, recursive)
+            return result
+        return postprocess
+
+    def _method_call(self, methodname, method_args):
+        # Uses the fast path if enabled
+        if self.fast_engine is not None and \
+                self.fast_engine.supports(methodname):
+            return self.fast_engine.call(methodname, method_args)
+        return super(GssClient, self)._method_call(methodname, method_args)
 
     def get_resource_information(self, gss_ID, session_token):
         """Queries the resource information for a GSS ID."""
         return self.method_call('getResourceInformation',
                                 [gss_ID, session_token])
 
+    def get_resource_information_many(self, gss_IDs, session_token,
+                                      max_workers=DEFAULT_MAX_WORKERS):
+        """Queries the resource information for many GSS IDs concurrently.
+
+        Returns a list of results in the order of gss_IDs.
+        """
+        return self.method_call_many(
+            [('getResourceInformation', [gss_ID, session_token])
+             for gss_ID in gss_IDs], max_workers)
+
     def list_files(self, gss_ID, session_token):
         """Lists contents of a folder defined by gss_ID."""
         return self.method_call('listFiles',
@@ -36,80 +396,350 @@ class GssClient(SoapClient):
         return self.method_call('listFilesMinimal',
                                 [gss_ID, session_token])
 
+    def iter_files(self, gss_ID, session_token):
+        """Yields the contents of a folder while the listing arrives.
+
+        Like list_files(), but the reply is parsed incrementally and entries
+        are lightweight Records, so memory stays bounded for huge folders.
+        SOAP faults are raised as suds.WebFault.
+        """
+        entries = self._streaming_engine.iter_call('listFiles',
+                                                   [gss_ID, session_token])
+        if self.descriptions is None:
+            return entries
+        return self._remember_descriptions(entries, session_token)
+
+    def iter_files_minimal(self, gss_ID, session_token):
+        """Yields the minimal contents of a folder while the listing arrives.
+
+        Streaming counterpart of list_files_minimal(), see iter_files().
+        """
+        return self._streaming_engine.iter_call('listFilesMinimal',
+                                                [gss_ID, session_token])
+
     def create_folder(self, gss_ID, session_token):
         """Creates a folder specified by gss_ID."""
-        return self.method_call('createFolder',
-                                [gss_ID, session_token])
+        try:
+            return self.method_call('createFolder',
+                                    [gss_ID, session_token])
+        finally:
+            self.invalidate_cache(gss_ID)
+            self._forget_descriptions(gss_ID)
 
     def delete_folder(self, gss_ID, session_token):
         """Deletes the folder specified by gss_ID."""
-        return self.method_call('deleteFolder',
-                                [gss_ID, session_token])
+        try:
+            return self.method_call('deleteFolder',
+                                    [gss_ID, session_token])
+        finally:
+            self.invalidate_cache(gss_ID, recursive=True)
+            self._forget_descriptions(gss_ID, recursive=True)
 
     def contains_file(self, gss_ID, session_token):
         """Returns true if the given GSS ID exists."""
         return self.method_call('containsFile',
                                 [gss_ID, session_token])
 
+    def contains_file_many(self, gss_IDs, session_token,
+                           max_workers=DEFAULT_MAX_WORKERS):
+        """Checks concurrently whether the given GSS IDs exist.
+
+        Returns a list of results in the order of gss_IDs.
+        """
+        return self.method_call_many(
+            [('containsFile', [gss_ID, session_token]) for gss_ID in gss_IDs],
+            max_workers)
+
     def get_direct_interaction_endpoint(self, gss_ID, session_token):
         """Returns the storage-solution end point the gss ID points to."""
         return self.method_call('getDirectInteractionEndpoint',
                                 [gss_ID, session_token])
 
+    def get_resource_information_async(self, gss_ID, session_token):
+        """asyncio variant of get_resource_information()."""
+        return self.method_call_async('getResourceInformation',
+                                      [gss_ID, session_token])
+
+    def list_files_async(self, gss_ID, session_token):
+        """asyncio variant of list_files()."""
+        return self.method_call_async('listFiles', [gss_ID, session_token])
+
+    def list_files_minimal_async(self, gss_ID, session_token):
+        """asyncio variant of list_files_minimal()."""
+        return self.method_call_async('listFilesMinimal',
+                                      [gss_ID, session_token])
+
+    def create_folder_async(self, gss_ID, session_token):
+        """asyncio variant of create_folder()."""
+        return self.method_call_async('createFolder', [gss_ID, session_token],
+                                      self._invalidating(gss_ID))
+
+    def delete_folder_async(self, gss_ID, session_token):
+        """asyncio variant of delete_folder()."""
+        return self.method_call_async('deleteFolder', [gss_ID, session_token],
+                                      self._invalidating(gss_ID, True))
+
+    def contains_file_async(self, gss_ID, session_token):
+        """asyncio variant of contains_file()."""
+        return self.method_call_async('containsFile', [gss_ID, session_token])
+
+    def get_direct_interaction_endpoint_async(self, gss_ID, session_token):
+        """asyncio variant of get_direct_interaction_endpoint()."""
+        return self.method_call_async('getDirectInteractionEndpoint',
+                                      [gss_ID, session_token])
+
+    def get_resource_information_many_async(
+            self, gss_IDs, session_token,
+            max_concurrency=DEFAULT_MAX_WORKERS):
+        """asyncio variant of get_resource_information_many()."""
+        return self.method_call_many_async(
+            [('getResourceInformation', [gss_ID, session_token])
+             for gss_ID in gss_IDs], max_concurrency)
+
     def download_to_file(self, gss_ID, session_token, out_filename,
-                         progress=True):
-        """Downloads from a GSS ID to a file."""
-        res_info = self.get_resource_information(gss_ID, session_token)
-        read_desc = res_info.readDescription
+                         progress=True, block_size=None,
+                         connections=DEFAULT_CONNECTIONS, resume=False):
+        """Downloads from a GSS ID to a file.
+
+        If the storage endpoint supports HTTP Range requests, large files are
+        split into byte ranges downloaded over up to `connections`
+        concurrent connections; otherwise the file is downloaded as a single
+        stream (see clfpy.transfer.download). Data is copied in blocks of
+        `block_size` bytes, by default derived from the file size.
+
+        The file is downloaded to a temporary file next to `out_filename`
+        and renamed when complete. With `resume=True`, an interrupted
+        download leaves the temporary file and a small state file behind,
+        and the next download with `resume=True` continues where it stopped.
 
+        With `direct=True` set on the client, the file is downloaded from
+        the direct endpoint if possible.
+
+        With a download cache set on the client, the size and modification
+        time of the file are requested first, and unchanged files which were
+        downloaded before (by any process using the cache) are linked or
+        copied from the cache instead; otherwise the file is downloaded into
+        the cache. Resumed downloads bypass the cache.
+
+        `progress` is True for a terminal progress bar, False for none, or a
+        clfpy.progress.Progress instance receiving the progress reports.
+
+        Returns the number of bytes downloaded.
+        """
+        reporter, owned = self._reporter(progress, "DL:")
+        try:
+            if self.download_cache is not None and not resume:
+                n_bytes = self._cached_download(gss_ID, session_token,
+                                                out_filename, reporter,
+                                                block_size, connections)
+                if n_bytes is not None:
+                    return n_bytes
+            return self._download(gss_ID, session_token, out_filename,
+                                  reporter, block_size, connections, resume)
+        finally:
+            if owned:
+                reporter.close()
+
+    def _cached_download(self, gss_ID, session_token, out_filename,
+                         reporter=None, block_size=None,
+                         connections=DEFAULT_CONNECTIONS):
+        """Downloads through the download cache.
+
+        Returns None if the remote file version cannot be determined.
+        """
+        def operation(res_info, reused):
+            read_desc = res_info.readDescription
+            if not read_desc.supported:
+                raise AttributeError('Read operation not allowed')
+            return remote_stat(self._http_session(), read_desc.httpMethod,
+                               read_desc.url,
+                               {h.key: h.value for h in read_desc.headers},
+                               self._timeout)
+
+        size, mtime = self._with_descriptions(gss_ID, session_token,
+                                              operation)
+        if size is None or mtime is None:
+            return None
+        self.download_cache.fetch(
+            gss_ID, size, mtime, out_filename,
+            lambda filename: self._download(gss_ID, session_token, filename,
+                                            reporter, block_size,
+                                            connections))
+        return size
+
+    def _download(self, gss_ID, session_token, out_filename, reporter=None,
+                  block_size=None, connections=DEFAULT_CONNECTIONS,
+                  resume=False):
+        """Downloads a file, from the direct endpoint if enabled."""
+        if self.direct:
+            n_bytes = self._direct_download(gss_ID, session_token,
+                                            out_filename, reporter,
+                                            block_size, connections, resume)
+            if n_bytes is not None:
+                return n_bytes
+
+        def operation(res_info, reused):
+            try:
+                return self._timed_transfer(
+                    gss_ID, 'described', None, self._download_desc,
+                    res_info.readDescription, out_filename, reporter,
+                    block_size, connections, resume)
+            except requests.HTTPError as error:
+                _check_rejected(error.response, reused)
+                raise
+
+        return self._with_descriptions(gss_ID, session_token, operation)
+
+    def _download_desc(self, read_desc, out_filename, reporter=None,
+                       block_size=None, connections=DEFAULT_CONNECTIONS,
+                       resume=False):
+        """Downloads the file described by a read description."""
         if not read_desc.supported:
             raise AttributeError('Read operation not allowed')
 
         headers = {h.key: h.value for h in read_desc.headers}
 
-        method = get_reqmethod(read_desc.httpMethod)
-        response = method(read_desc.url, headers=headers, stream=True)
-        response_len = int(response.headers["Content-Length"])
-        saved_len = 0
-        start_time = time.time()
-        with open(out_filename, 'wb') as out_file:
-            for chunk in response.iter_content(chunk_size=256):
-                out_file.write(chunk)
-                saved_len += len(chunk)
-                time_elapsed = time.time() - start_time
-                speed = saved_len/1000/time_elapsed
-                if progress:
-                    print_progress(saved_len, response_len, prefix="DL:",
-                                   suffix="{:.1f} kB/s".format(speed))
-
-    def upload(self, gss_ID, session_token, in_filename, progress=True):
-        """Uploads from a file to a new, nonexisting GSS ID."""
-        res_info = self.get_resource_information(gss_ID, session_token)
-        create_desc = res_info.createDescription
+        with track(reporter, os.path.basename(out_filename)) as tracker:
+            return download(self._http_session(), read_desc.httpMethod,
+                            read_desc.url, headers, out_filename, connections,
+                            block_size, tracker, self._timeout, resume)
 
-        if not create_desc.supported:
-            raise AttributeError('Create operation not allowed')
+    def upload(self, gss_ID, session_token, in_filename, progress=True,
+               resume=False, check=False):
+        """Uploads from a file to a new, nonexisting GSS ID.
 
-        return self._create_or_update(gss_ID, session_token, in_filename,
-                                      res_info, create_desc, progress)
+        With `resume=True`, an upload of the same file to the same GSS ID
+        that was interrupted earlier (also started with `resume=True`) is
+        continued with a Content-Range request if the storage endpoint
+        supports it, or otherwise repeated through the update operation.
 
-    def update(self, gss_ID, session_token, in_filename, progress=True):
-        """Updates an existing GSS ID from a file."""
-        res_info = self.get_resource_information(gss_ID, session_token)
-        update_desc = res_info.updateDescription
+        With `check=True`, HTTP errors of the storage endpoint are raised as
+        requests.HTTPError. See download_to_file() for `progress`.
+        """
+        reporter, owned = self._reporter(progress, "UL:")
+
+        def operation(res_info, reused):
+            create_desc = res_info.createDescription
+
+            if resume and not create_desc.supported and \
+                    not res_info.queryForName:
+                state = UploadState(gss_ID, in_filename)
+                if state.matches():
+                    return self._resume_upload(
+                        gss_ID, session_token, in_filename, res_info, state,
+                        reporter, check, reused)
+
+            if not create_desc.supported:
+                raise AttributeError('Create operation not allowed')
+
+            return self._create_or_update(gss_ID, session_token, in_filename,
+                                          res_info, create_desc, reporter,
+                                          resume, check, reused)
+
+        try:
+            return self._with_descriptions(gss_ID, session_token, operation)
+        finally:
+            self.invalidate_cache(gss_ID)
+            self._forget_descriptions(gss_ID)
+            if owned:
+                reporter.close()
+
+    def update(self, gss_ID, session_token, in_filename, progress=True,
+               check=False):
+        """Updates an existing GSS ID from a file.
+
+        With `check=True`, HTTP errors of the storage endpoint are raised as
+        requests.HTTPError. With `direct=True` set on the client, the file
+        is sent to the direct endpoint if possible. See download_to_file()
+        for `progress`.
+        """
+        reporter, owned = self._reporter(progress, "UL:")
+
+        def operation(res_info, reused):
+            update_desc = res_info.updateDescription
+
+            if not update_desc.supported:
+                raise AttributeError('Update operation not allowed')
 
+            return self._timed_transfer(
+                gss_ID, 'described', os.path.getsize(in_filename),
+                self._create_or_update, gss_ID, session_token, in_filename,
+                res_info, update_desc, reporter, check=check, reused=reused)
+
+        try:
+            if self.direct and self._direct_update(gss_ID, session_token,
+                                                   in_filename, reporter):
+                return gss_ID
+            return self._with_descriptions(gss_ID, session_token, operation)
+        finally:
+            self.invalidate_cache(gss_ID)
+            if owned:
+                reporter.close()
+
+    def _create_or_update(self, gss_ID, session_token, in_filename, res_info,
+                          req_desc, reporter=None, resume=False, check=False,
+                          reused=False):
+        """Utility function for general upload"""
+        state = None
+        if resume and not res_info.queryForName:
+            state = UploadState(gss_ID, in_filename)
+            state.start()
+
+        response = self._send_file(req_desc, in_filename, reporter)
+        _check_rejected(response, reused)
+
+        if state is not None and response.ok:
+            state.remove()
+        if check:
+            response.raise_for_status()
+        if res_info.queryForName:
+            return response.headers["filename"]
+        else:
+            return gss_ID
+
+    def _resume_upload(self, gss_ID, session_token, in_filename, res_info,
+                       state, reporter=None, check=False, reused=False):
+        """Continues an interrupted upload to an existing GSS ID."""
+        file_size = os.stat(in_filename).st_size
+        read_desc = res_info.readDescription
+        uploaded = None
+        if read_desc.supported:
+            uploaded = remote_size(self._http_session(), read_desc.httpMethod,
+                                   read_desc.url,
+                                   {h.key: h.value for h in read_desc.headers},
+                                   self._timeout)
+        if uploaded == file_size:
+            state.remove()
+            return gss_ID
+
+        update_desc = res_info.updateDescription
         if not update_desc.supported:
             raise AttributeError('Update operation not allowed')
 
+        if uploaded:
+            response = self._send_file(update_desc, in_filename, reporter,
+                                       offset=uploaded)
+            if response.ok and remote_size(
+                    self._http_session(), read_desc.httpMethod, read_desc.url,
+                    {h.key: h.value for h in read_desc.headers},
+                    self._timeout) == file_size:
+                state.remove()
+                return gss_ID
+
+        # Content-Range not supported, upload the whole file again
         return self._create_or_update(gss_ID, session_token, in_filename,
-                                      res_info, update_desc, progress)
+                                      res_info, update_desc, reporter,
+                                      resume=True, check=check, reused=reused)
 
-    def _create_or_update(self, gss_ID, session_token, in_filename, res_info,
-                          req_desc, progress=True):
-        """Utility function for general upload"""
+    def _send_file(self, req_desc, in_filename, reporter=None, offset=0,
+                   session=None):
+        """Sends a file (from `offset` on) as described by req_desc."""
         headers = {h.key: h.value for h in req_desc.headers}
         file_size = os.stat(in_filename).st_size
-        headers["Content-Length"] = "%d" % file_size
+        headers["Content-Length"] = "%d" % (file_size - offset)
+        if offset:
+            headers["Content-Range"] = "bytes {}-{}/{}".format(
+                offset, file_size - 1, file_size)
 
         # WORKAROUND!
         # The requests library cannot handle file descriptors of empty files.
@@ -118,22 +748,165 @@ class GssClient(SoapClient):
         # Should be fixed in requests 3.x.x, details here:
         # https://github.com/requests/requests/issues/4215
 
-        method = get_reqmethod(req_desc.httpMethod)
-        if file_size == 0:
-            response = method(req_desc.url, headers=headers, data='')
-        else:
-            with open(in_filename, "rb") as in_file:
-                if progress:
-                    data_in = ReadProgress(in_file, file_size,
-                                           print_progress)
-                else:
-                    data_in = in_file
-                response = method(req_desc.url, headers=headers, data=data_in)
+        session = session or self._http_session()
+        with track(reporter, os.path.basename(in_filename),
+                   file_size - offset) as tracker:
+            if file_size == 0:
+                response = session.request(req_desc.httpMethod, req_desc.url,
+                                           headers=headers, data='',
+                                           timeout=self._timeout)
+            else:
+                with open(in_filename, "rb") as in_file:
+                    in_file.seek(offset)
+                    if tracker is not None:
+                        data_in = ReadProgress(in_file, file_size - offset,
+                                               tracker)
+                    else:
+                        data_in = in_file
+                    response = session.request(
+                        req_desc.httpMethod, req_desc.url, headers=headers,
+                        data=data_in, timeout=self._timeout)
+            if tracker is not None and not response.ok:
+                tracker.finish(requests.HTTPError(response.reason,
+                                                  response=response))
+        return response
 
-        if res_info.queryForName:
-            return response.headers["filename"]
-        else:
+    def open_read(self, gss_ID, session_token, block_size=DEFAULT_BLOCK_SIZE):
+        """Opens a GSS file for streaming reads.
+
+        Returns a clfpy.streams.ResponseReader, a read-only file-like object
+        which fetches the file from the storage as it is consumed, so
+        arbitrarily large files are read in constant memory. Its
+        iter_chunks() yields the file in blocks of `block_size` bytes.
+        Close it, or use it in a with statement, to release the connection:
+
+            with gss.open_read(gss_ID, token) as stream:
+                for chunk in stream.iter_chunks():
+                    consume(chunk)
+
+        With `direct=True` set on the client, the file is read from the
+        direct endpoint if possible. Raises requests.HTTPError if the
+        storage refuses the request.
+        """
+        if self.direct:
+            reader = self._direct_open(gss_ID, session_token, block_size)
+            if reader is not None:
+                return reader
+
+        def operation(res_info, reused):
+            read_desc = res_info.readDescription
+            if not read_desc.supported:
+                raise AttributeError('Read operation not allowed')
+            response = self._http_session().request(
+                read_desc.httpMethod, read_desc.url,
+                headers={h.key: h.value for h in read_desc.headers},
+                stream=True, timeout=self._timeout)
+            return _open_response(response, reused, block_size)
+
+        return self._with_descriptions(gss_ID, session_token, operation)
+
+    def _direct_open(self, gss_ID, session_token, block_size):
+        """Opens a file on the direct endpoint, returns None on failure."""
+        target = self._direct_target(gss_ID, session_token)
+        if target is None:
+            return None
+        url, headers, session = target
+        try:
+            response = session.get(url, headers=headers, stream=True,
+                                   timeout=self._timeout)
+            return _open_response(response, False, block_size)
+        except requests.RequestException as error:
+            self._direct_failed(gss_ID, error)
+            return None
+
+    def open(self, gss_ID, session_token, block_size=RANGE_BLOCK_SIZE,
+             cache_blocks=DEFAULT_CACHE_BLOCKS, read_ahead=DEFAULT_READ_AHEAD):
+        """Opens a GSS file for random access.
+
+        Returns a clfpy.streams.GssFile, a seekable read-only file-like
+        object which fetches only the parts of the file that are read, with
+        HTTP Range requests through a cache of `cache_blocks` blocks of
+        `block_size` bytes; sequential reads fetch `read_ahead` blocks in
+        advance. Use it to read headers or tails of large files, or pass it
+        to libraries accepting file objects:
+
+            with gss.open(gss_ID, token) as gss_file:
+                gss_file.seek(-4096, io.SEEK_END)
+                tail = gss_file.read()
+
+        The read description is reused like in download_to_file() and
+        fetched again when the storage rejects it, e.g. because a file is
+        read for longer than its signature is valid.
+        """
+        def describe(refresh=False):
+            if refresh:
+                self.invalidate_cache(gss_ID)
+                self._forget_descriptions(gss_ID)
+            res_info = self._with_descriptions(gss_ID, session_token,
+                                               lambda res_info, _: res_info)
+            read_desc = res_info.readDescription
+            if not read_desc.supported:
+                raise AttributeError('Read operation not allowed')
+            return (read_desc.httpMethod, read_desc.url,
+                    {h.key: h.value for h in read_desc.headers})
+
+        method, url, headers = describe()
+        return GssFile(self._http_session(), method, url, headers,
+                       block_size=block_size, cache_blocks=cache_blocks,
+                       read_ahead=read_ahead, timeout=self._timeout,
+                       refresh=lambda: describe(refresh=True), name=gss_ID)
+
+    def upload_stream(self, gss_ID, session_token, source, size=None,
+                      update=False, block_size=DEFAULT_BLOCK_SIZE,
+                      progress=False):
+        """Uploads from a binary file object or an iterable of bytes.
+
+        Creates a new, nonexisting GSS ID, or replaces an existing one with
+        `update=True`. The data is taken from `source` as it is sent, in
+        constant memory, so it can come straight from a compressor, a
+        network stream or a generator; file objects are read in blocks of
+        `block_size` bytes. If `size` is given, `source` has to provide
+        exactly `size` bytes; otherwise the data is sent with chunked
+        transfer encoding.
+
+        The data can only be sent once: it is neither retried nor sent to
+        the direct endpoint, and the request description is not reused
+        (see `reuse_descriptions`). HTTP errors of the storage are raised
+        as requests.HTTPError. See download_to_file() for `progress`.
+
+        Returns the GSS ID of the uploaded file.
+        """
+        reporter, owned = self._reporter(progress, "UL:")
+        try:
+            res_info = self.get_resource_information(gss_ID, session_token)
+            if update:
+                req_desc = res_info.updateDescription
+                if not req_desc.supported:
+                    raise AttributeError('Update operation not allowed')
+            else:
+                req_desc = res_info.createDescription
+                if not req_desc.supported:
+                    raise AttributeError('Create operation not allowed')
+            headers = {h.key: h.value for h in req_desc.headers}
+
+            with track(reporter, gss_ID.rsplit("/", 1)[-1],
+                       size) as tracker:
+                data = iter_source(source, block_size, tracker)
+                if size is not None:
+                    headers["Content-Length"] = "%d" % size
+                    data = SizedSource(data, size)
+                response = self._http_session().request(
+                    req_desc.httpMethod, req_desc.url, headers=headers,
+                    data=data, timeout=self._timeout)
+                response.raise_for_status()
+            if res_info.queryForName:
+                return response.headers["filename"]
             return gss_ID
+        finally:
+            self.invalidate_cache(gss_ID)
+            self._forget_descriptions(gss_ID)
+            if owned:
+                reporter.close()
 
     def delete(self, gss_ID, session_token):
         """Deletes a file or folder specified by gss_ID."""
@@ -146,83 +919,555 @@ class GssClient(SoapClient):
         headers = {h.key: h.value for h in delete_desc.headers}
 
         method = get_reqmethod(delete_desc.httpMethod)
-        response = method(delete_desc.url, headers=headers)
+        try:
+            response = method(delete_desc.url, headers=headers)
+        finally:
+            self.invalidate_cache(gss_ID, recursive=True)
+            self._forget_descriptions(gss_ID, recursive=True)
 
         return response.text
 
-    def _scan_gss_folder(self, gss_path, session_token):
-        """ Scans a GSS folder returning lists of its files and sub-folders"""
-        subfolders = []
-        files = []
-        content = self.list_files_minimal(gss_path, session_token)
-        for c in content:
-            if 'FOLDER' in c['type']:
-                subfolders.append(c['uniqueName'])
-            if 'FILE' in c['type']:
-                files.append(c['uniqueName'])
-        return subfolders, files
-
-    def _scan_gss_tree(self, gss_tree, session_token):
-        """ Scans recursively a GSS tree returning lists of all its files and sub-folders"""
-        gss_dirlist= [gss_tree]
-        gss_filelist = []
-        scanned_folders = 0
-        while scanned_folders is not len(gss_dirlist):
-            for i in range(scanned_folders, len(gss_dirlist)):
-                print("Scanning {}...".format(gss_dirlist[i]))
-                subfolders, contained_files = self._scan_gss_folder(gss_dirlist[i], session_token)
-                gss_dirlist.extend(subfolders)
-                gss_filelist.extend(contained_files)
-                scanned_folders += 1
-        return gss_dirlist, gss_filelist
-
-    def download_folder(self, gss_tree,session_token, in_foldername="."):
-        """ Downloads from a GSS tree to a folder """
-        gss_dirlist, gss_filelist = self._scan_gss_tree(gss_tree, session_token)
-        gss_base=""
-        for l in gss_tree.split(sep="/")[:-1]:
-            gss_base += l
-            gss_base += "/"
-        local_base = os.path.abspath(in_foldername) + "/"
-        dirlist =  [d.replace(gss_base,local_base) for d in gss_dirlist]
-        filedict = { f : f.replace(gss_base,local_base) for f in gss_filelist}
-        print("Creating local folders...")
+    def walk(self, gss_tree, session_token, max_workers=DEFAULT_MAX_WORKERS,
+             minimal=True, onerror=None):
+        """Walks a GSS tree, listing up to `max_workers` folders at a time.
+
+        Analogous to os.walk(), yields a (folder, subfolders, files) tuple
+        for every folder as soon as it has been listed, where `subfolders`
+        and `files` are lists of listing entries (see iter_files_minimal(),
+        or iter_files() with `minimal=False`). A folder is always yielded
+        before its sub-folders; otherwise, the order depends on the
+        response times. Only folders waiting to be listed are kept in
+        memory, so consumers can start working on huge trees right away.
+
+        Errors listing a folder are raised, unless `onerror` is given: it is
+        then called with the exception and the walk continues.
+        """
+        list_folder = self.iter_files_minimal if minimal else self.iter_files
+
+        def scan(folder):
+            subfolders = []
+            files = []
+            for entry in list_folder(folder, session_token):
+                if 'FOLDER' in entry['type']:
+                    subfolders.append(entry)
+                elif 'FILE' in entry['type']:
+                    files.append(entry)
+            return subfolders, files
+
+        # Depth-first order keeps the list of waiting folders short
+        waiting = [gss_tree]
+        finished = queue.Queue()
+        n_running = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while waiting or n_running:
+                while waiting and n_running < max_workers:
+                    folder = waiting.pop()
+                    future = executor.submit(scan, folder)
+                    future.add_done_callback(
+                        lambda f, folder=folder: finished.put((f, folder)))
+                    n_running += 1
+                future, folder = finished.get()
+                n_running -= 1
+                error = future.exception()
+                if error is not None:
+                    if onerror is None:
+                        raise error
+                    onerror(error)
+                    continue
+                subfolders, files = future.result()
+                waiting.extend(e['uniqueName'] for e in reversed(subfolders))
+                yield folder, subfolders, files
+
+    def download_folder(self, gss_tree, session_token, in_foldername=".",
+                        max_workers=DEFAULT_MAX_WORKERS,
+                        retries=DEFAULT_RETRIES, resume=False, verbose=True,
+                        progress=False):
+        """Downloads from a GSS tree to a folder.
+
+        The tree is downloaded to a new folder of the same name inside
+        `in_foldername`. Files are downloaded by a pool of `max_workers`
+        threads sharing the client's connection pool (see
+        clfpy.make_session to size it for more workers), straight from the
+        request descriptions of the folder listings, while the tree is still
+        being scanned (see walk()). Failed files are
+        retried up to `retries` times with a fresh request description.
+
+        With `resume=True`, the local folder may exist already: existing
+        files are skipped and interrupted downloads continued (see
+        download_to_file()).
+
+        With `progress=True`, one progress bar covers all files instead of
+        printing a line per file; a clfpy.progress.Progress instance
+        receives the progress reports instead.
+
+        Returns a clfpy.transfer.TransferSummary; files that failed for good
+        are listed in its `failed` attribute.
+        """
+        local_root = os.path.join(os.path.abspath(in_foldername),
+                                  gss_tree.rstrip("/").split("/")[-1])
+        if os.path.exists(local_root) and not resume:
+            print("Local file or folder already exists")
+            return None
+        gss_prefix = gss_tree.rstrip("/") + "/"
+
+        def local_path(gss_ID):
+            rel_path = gss_ID[len(gss_prefix):].strip("/")
+            return os.path.join(local_root, *rel_path.split("/"))
+
+        def files():
+            for folder, _, entries in self.walk(gss_tree, session_token,
+                                                max_workers, minimal=False):
+                folder_path = local_root if folder == gss_tree \
+                    else local_path(folder)
+                if not os.path.isdir(folder_path):
+                    os.makedirs(folder_path)
+                for entry in entries:
+                    local_file = local_path(entry['uniqueName'])
+                    if resume and os.path.exists(local_file):
+                        summary.skip()
+                        continue
+                    if reporter is not None:
+                        reporter.expect()
+                    yield entry, local_file
+
+        def download(item):
+            entry, local_file = item
+            return self._download_with_retries(
+                entry['uniqueName'], session_token, entry['readDescription'],
+                local_file, retries, resume, reporter)
+
+        summary = TransferSummary()
+        reporter, owned = self._reporter(progress, "DL:")
+        list_files = verbose and reporter is None
+        try:
+            for (entry, local_file), n_bytes, error in run_concurrently(
+                    download, files(), max_workers):
+                if error is not None:
+                    summary.fail(entry['uniqueName'], error)
+                    if list_files:
+                        print("Failed: {} ({})".format(local_file, error))
+                else:
+                    summary.add(n_bytes)
+                    if list_files:
+                        print(local_file)
+        finally:
+            if owned:
+                reporter.close()
+        summary.finish()
+        if verbose:
+            print("Downloaded {}".format(summary))
+        return summary
+
+    def _download_with_retries(self, gss_ID, session_token, read_desc,
+                               out_filename, retries=DEFAULT_RETRIES,
+                               resume=False, reporter=None):
+        """Downloads a file, retrying on transport errors (see
+        clfpy.transfer.TRANSIENT_ERRORS); local errors are raised at once."""
+        if self.direct:
+            n_bytes = self._direct_download(gss_ID, session_token,
+                                            out_filename, reporter,
+                                            connections=1, resume=resume)
+            if n_bytes is not None:
+                return n_bytes
+        for attempt in range(retries + 1):
+            try:
+                if read_desc is None:
+                    read_desc = self.get_resource_information(
+                        gss_ID, session_token).readDescription
+                return self._timed_transfer(
+                    gss_ID, 'described', None, self._download_desc,
+                    read_desc, out_filename, reporter, connections=1,
+                    resume=resume)
+            except TRANSIENT_ERRORS:
+                if attempt == retries:
+                    raise
+                # The request description may have expired
+                read_desc = None
+                self.invalidate_cache(gss_ID)
+                time.sleep(RETRY_DELAY * 2 ** attempt)
+
+    def upload_folder(self, gss_tree, session_token, in_foldername,
+                      max_workers=DEFAULT_MAX_WORKERS,
+                      retries=DEFAULT_RETRIES, verbose=True, progress=False):
+        """Uploads from a local folder to a new, nonexisting GSS ID.
+
+        The folder is uploaded as a new folder of the same name inside
+        `gss_tree`. Remote folders are created level by level: as soon as a
+        folder exists, its sub-folders are created concurrently and its
+        files are uploaded by a pool of `max_workers` threads, while the
+        rest of the tree is still being created. Failed uploads are retried
+        up to `retries` times; partial uploads of files of at least
+        RESUME_MIN_SIZE bytes are continued where possible. See
+        download_folder() for `progress`.
+
+        Returns a clfpy.transfer.TransferSummary; files and folders that
+        failed for good are listed in its `failed` attribute.
+        """
+        local_root = os.path.abspath(in_foldername)
+        gss_root = gss_tree.rstrip("/") + "/" + os.path.basename(local_root)
+        summary = TransferSummary()
+
+        # Finished tasks are reported through a queue, which stays cheap no
+        # matter how many uploads are pending
+        finished = queue.Queue()
+
+        def submit(pool, func, is_folder, local_path, gss_ID, *args):
+            future = pool.submit(func, gss_ID, session_token, *args)
+            future.add_done_callback(
+                lambda f: finished.put((f, is_folder, local_path, gss_ID)))
+
+        reporter, owned = self._reporter(progress, "UL:")
+        list_files = verbose and reporter is None
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as folder_pool, \
+                    ThreadPoolExecutor(max_workers=max_workers) as file_pool:
+                submit(folder_pool, self._create_folder_checked, True,
+                       local_root, gss_root)
+                n_pending = 1
+                while n_pending:
+                    future, is_folder, local_path, gss_ID = finished.get()
+                    n_pending -= 1
+                    error = future.exception()
+                    if error is not None:
+                        summary.fail(gss_ID, error)
+                        if list_files:
+                            print("Failed: {} ({})".format(gss_ID, error))
+                    elif not is_folder:
+                        summary.add(os.path.getsize(local_path))
+                        if list_files:
+                            print(future.result())
+                    else:
+                        n_pending += self._submit_children(
+                            submit, folder_pool, file_pool, local_path,
+                            gss_ID, retries, reporter)
+        finally:
+            if owned:
+                reporter.close()
+        summary.finish()
+        if verbose:
+            print("Uploaded {}".format(summary))
+        return summary
+
+    def _submit_children(self, submit, folder_pool, file_pool, local_path,
+                         gss_ID, retries, reporter):
+        """Submits the sub-folders and files of a created folder.
+
+        Returns the number of submitted tasks.
+        """
+        n_submitted = 0
+        for name in sorted(os.listdir(local_path)):
+            child = os.path.join(local_path, name)
+            child_ID = gss_ID + "/" + name
+            if os.path.isdir(child) and not os.path.islink(child):
+                submit(folder_pool, self._create_folder_checked, True, child,
+                       child_ID)
+                n_submitted += 1
+            elif os.path.isfile(child):
+                if reporter is not None:
+                    reporter.expect(1, os.path.getsize(child))
+                submit(file_pool, self._upload_with_retries, False, child,
+                       child_ID, child, retries, reporter)
+                n_submitted += 1
+        return n_submitted
+
+    def _create_folder_checked(self, gss_ID, session_token):
+        """Creates a folder, raising SOAP faults instead of returning them.
+
+        A folder that exists already is fine.
+        """
+        result = self.create_folder(gss_ID, session_token)
+        if result and not isinstance(result, Exception):
+            return result
+        # Storages refuse existing folders with a fault or a false result
+        exists = self.contains_file(gss_ID, session_token)
+        if exists and not isinstance(exists, Exception):
+            return False
+        if isinstance(result, Exception):
+            raise result
+        raise IOError("Could not create folder {}".format(gss_ID))
+
+    def _upload_with_retries(self, gss_ID, session_token, in_filename,
+                             retries=DEFAULT_RETRIES, reporter=None):
+        """Uploads a file, retrying on transport and HTTP errors.
+
+        Only large files are uploaded with `resume=True`, which records
+        every upload in a state file. A failed attempt may still have
+        created the file, e.g. if only the reply was lost; small files are
+        then sent again through the update operation.
+        """
+        resume = os.path.getsize(in_filename) >= RESUME_MIN_SIZE
+        for attempt in range(retries + 1):
+            try:
+                if attempt and not resume and \
+                        self.contains_file(gss_ID, session_token) is True:
+                    return self.update(gss_ID, session_token, in_filename,
+                                       progress=reporter, check=True)
+                return self.upload(gss_ID, session_token, in_filename,
+                                   progress=reporter, resume=resume,
+                                   check=True)
+            except TRANSIENT_ERRORS:
+                if attempt == retries:
+                    raise
+                time.sleep(RETRY_DELAY * 2 ** attempt)
+
+    def sync(self, local_folder, gss_folder, session_token,
+             direction=SYNC_UP, delete=False, checksum=False,
+             max_workers=DEFAULT_MAX_WORKERS, retries=DEFAULT_RETRIES,
+             verbose=True, progress=False):
+        """Synchronises the contents of a local folder and a GSS folder.
+
+        With `direction=SYNC_UP` ('up'), gss_folder is updated from
+        local_folder, with SYNC_DOWN ('down') the other way round; the target
+        folder is created if necessary. Only files which are missing in the
+        target, differ in size or are newer in the source are transferred,
+        by a pool of `max_workers` threads. GSS listings carry neither sizes
+        nor modification times, so they are read with a one byte Range
+        request per file present on both sides (see
+        clfpy.transfer.remote_stat()).
+
+        With `delete=True`, files and folders missing in the source are
+        deleted from the target. With `checksum=True`, a local hash
+        manifest (see clfpy.transfer.SyncManifest) recognises files that
+        were only touched since the last sync, e.g. by a fresh checkout.
+        See download_folder() for `progress`.
+
+        Returns a clfpy.transfer.TransferSummary; files that failed for good
+        are listed in its `failed` attribute.
+        """
+        if direction not in (SYNC_UP, SYNC_DOWN):
+            raise ValueError("Invalid sync direction: {}".format(direction))
+        local_root = os.path.abspath(local_folder)
+        gss_root = gss_folder.rstrip("/")
+        manifest = SyncManifest(local_root, gss_root) if checksum else None
+        summary = TransferSummary()
+
+        if direction == SYNC_UP:
+            if not os.path.isdir(local_root):
+                raise IOError("Local folder {} not found".format(local_root))
+            exists = self.contains_file(gss_root, session_token)
+            if isinstance(exists, Exception):
+                raise exists
+            if not exists:
+                self._create_folder_checked(gss_root, session_token)
+        elif not os.path.isdir(local_root):
+            os.makedirs(local_root)
+
+        local_folders, local_files = _local_tree(local_root)
+        remote_folders, remote_files = self._remote_tree(
+            gss_root, session_token, max_workers)
+
+        def local_path(rel_path):
+            return os.path.join(local_root, *rel_path.split("/"))
+
+        def gss_path(rel_path):
+            return gss_root + "/" + rel_path
+
+        if direction == SYNC_UP:
+            source_files, target_files = local_files, remote_files
+            missing_folders = local_folders - remote_folders
+            extra_folders = remote_folders - local_folders
+            # Parents are created before their sub-folders
+            for depth in sorted(set(f.count("/") for f in missing_folders)):
+                for rel_path, _, error in run_concurrently(
+                        lambda f: self._create_folder_checked(gss_path(f),
+                                                              session_token),
+                        sorted(f for f in missing_folders
+                               if f.count("/") == depth),
+                        max_workers):
+                    if error is not None:
+                        summary.fail(gss_path(rel_path), error)
+        else:
+            source_files, target_files = remote_files, local_files
+            extra_folders = local_folders - remote_folders
+            for rel_path in sorted(remote_folders - local_folders):
+                os.makedirs(local_path(rel_path))
+
+        def transfer(rel_path):
+            filename = local_path(rel_path)
+            gss_ID = gss_path(rel_path)
+            entry = remote_files.get(rel_path)
+            remote = None
+            if rel_path in target_files:
+                stat = os.stat(filename)
+                read_desc = entry['readDescription']
+                remote = remote_stat(
+                    self._http_session(), read_desc.httpMethod,
+                    read_desc.url, {h.key: h.value for h in read_desc.headers},
+                    self._timeout)
+                if manifest is not None and manifest.unchanged(
+                        rel_path, filename, stat.st_size, stat.st_mtime,
+                        remote):
+                    return None
+                local = (stat.st_size, stat.st_mtime)
+                source, target = (local, remote) if direction == SYNC_UP \
+                    else (remote, local)
+                if not is_outdated(source[0], source[1], target[0],
+                                   target[1]):
+                    if manifest is not None:
+                        manifest.record(rel_path, filename, remote)
+                    return None
+
+            if direction == SYNC_UP:
+                self._update_with_retries(gss_ID, session_token, filename,
+                                          entry is not None, retries,
+                                          reporter)
+                # The remote copy is recorded by the next sync
+                remote = None
+                n_bytes = os.path.getsize(filename)
+            else:
+                n_bytes = self._download_with_retries(
+                    gss_ID, session_token, entry['readDescription'], filename,
+                    retries, reporter=reporter)
+            if manifest is not None:
+                manifest.record(rel_path, filename, remote)
+            return n_bytes
+
+        reporter, owned = self._reporter(
+            progress, "UL:" if direction == SYNC_UP else "DL:")
+        list_files = verbose and reporter is None
         try:
-            for d in dirlist:
-                print("Creating folder {}".format(d))
-                os.mkdir(d)
-            print("Downloading files...")
-            for gss_file, local_file in filedict.items():
-                print(local_file)
-                self.download_to_file(gss_file, session_token, local_file)
-        except FileExistsError:
-                print("Local file or folder already exists")
-        return
-
-    def upload_folder(self, gss_tree, session_token, in_foldername):
-        """ Uploads from a local folder to a new, nonexisting GSS ID. """
-        dirlist = [os.path.join(root,dir) for root,dirs,__ in os.walk(os.path.abspath(in_foldername))
-                for dir in dirs]
-        filelist = [os.path.join(root,file) for root,__,files in os.walk(os.path.abspath(in_foldername))
-                for file in files]
-        dirlist.append(os.path.abspath(in_foldername))
-        local_base = ""
-        for l in os.path.abspath(in_foldername).split(sep="/")[:-1]:
-            local_base += l
-            local_base += "/"
-        gss_base = gss_tree
-        if gss_base[-1] is not "/":
-            gss_base += "/"
-        gss_dirlist =  [d.replace(local_base,gss_base) for d in dirlist]
-        gss_filedict = { f : f.replace(local_base,gss_base) for f in filelist}
-        gss_dirlist.sort()
-        print("Creating remote folders...")
-        for gss_dir in gss_dirlist:
-            self.create_folder(gss_dir, session_token)
-        print("Uploading files...")
-        for local_file, gss_file in gss_filedict.items():
-            print(self.upload(gss_file, session_token, local_file))
-        return
+            try:
+                for rel_path, n_bytes, error in run_concurrently(
+                        transfer, sorted(source_files), max_workers):
+                    if error is not None:
+                        summary.fail(rel_path, error)
+                        if list_files:
+                            print("Failed: {} ({})".format(rel_path, error))
+                    elif n_bytes is None:
+                        summary.skip()
+                    else:
+                        summary.add(n_bytes)
+                        if list_files:
+                            print(rel_path)
+            finally:
+                if owned:
+                    reporter.close()
+
+            if delete:
+                self._delete_extraneous(
+                    direction, session_token, summary, manifest,
+                    extra_folders, set(target_files) - set(source_files),
+                    local_path, gss_path, max_workers, verbose)
+        finally:
+            if manifest is not None:
+                manifest.save()
+        summary.finish()
+        if verbose:
+            print("Synchronised {}".format(summary))
+        return summary
+
+    def _remote_tree(self, gss_root, session_token, max_workers):
+        """Returns the relative folders and files (with their listing
+        entries) below a GSS folder."""
+        prefix = gss_root + "/"
+        folders = set()
+        files = {}
+        for _, subfolders, entries in self.walk(gss_root, session_token,
+                                                max_workers, minimal=False):
+            folders.update(e['uniqueName'][len(prefix):].strip("/")
+                           for e in subfolders)
+            files.update((e['uniqueName'][len(prefix):], e) for e in entries)
+        return folders, files
+
+    def _update_with_retries(self, gss_ID, session_token, in_filename,
+                             exists, retries=DEFAULT_RETRIES, reporter=None):
+        """Uploads a new or updates an existing file, retrying on transport
+        and HTTP errors."""
+        if not exists:
+            return self._upload_with_retries(gss_ID, session_token,
+                                             in_filename, retries, reporter)
+        for attempt in range(retries + 1):
+            try:
+                return self.update(gss_ID, session_token, in_filename,
+                                   progress=reporter, check=True)
+            except TRANSIENT_ERRORS:
+                if attempt == retries:
+                    raise
+                time.sleep(RETRY_DELAY * 2 ** attempt)
+
+    def _delete_extraneous(self, direction, session_token, summary, manifest,
+                           folders, files, local_path, gss_path, max_workers,
+                           verbose):
+        """Deletes the target files and folders missing in the source.
+
+        Only the top-most extraneous folders are deleted, together with
+        their contents.
+        """
+        folders = set(folders)
+        top_folders = [f for f in folders
+                       if f.rpartition("/")[0] not in folders]
+        files = [f for f in files if f.rpartition("/")[0] not in folders]
+
+        def remove(item):
+            rel_path, is_folder = item
+            if direction == SYNC_UP and is_folder:
+                self.delete_folder(gss_path(rel_path), session_token)
+            elif direction == SYNC_UP:
+                self.delete(gss_path(rel_path), session_token)
+            elif is_folder:
+                shutil.rmtree(local_path(rel_path))
+            else:
+                os.remove(local_path(rel_path))
+
+        items = [(f, False) for f in sorted(files)] + \
+            [(f, True) for f in sorted(top_folders)]
+        for (rel_path, is_folder), _, error in run_concurrently(
+                remove, items, max_workers):
+            if error is not None:
+                summary.fail(rel_path, error)
+                if verbose:
+                    print("Failed to delete: {} ({})".format(rel_path, error))
+                continue
+            summary.remove()
+            if manifest is not None:
+                prefix = rel_path + "/"
+                for name in list(manifest.entries):
+                    if name == rel_path or is_folder and \
+                            name.startswith(prefix):
+                        manifest.discard(name)
+            if verbose:
+                print("Deleted {}".format(rel_path))
+
+
+def _local_tree(local_root):
+    """Returns the relative folders and files below a local folder.
+
+    Partial downloads and their state files are ignored.
+    """
+    folders = set()
+    files = set()
+    for root, dirs, names in os.walk(local_root):
+        rel_root = os.path.relpath(root, local_root).replace(os.sep, "/")
+        prefix = "" if rel_root == "." else rel_root + "/"
+        folders.update(prefix + name for name in dirs)
+        files.update(prefix + name for name in names
+                     if not name.endswith((PART_SUFFIX, STATE_SUFFIX)) and
+                     os.path.isfile(os.path.join(root, name)))
+    return folders, files
+
+
+def _storage_root(gss_ID):
+    """Returns the storage root of a GSS ID, e.g. 'it4i_barbora://'."""
+    scheme, separator, _ = gss_ID.partition('://')
+    return scheme + separator
+
+
+def _check_rejected(response, reused):
+    """Raises _Rejected if a reused description was rejected."""
+    if reused and response is not None and \
+            response.status_code in REJECTED_STATUS_CODES:
+        raise _Rejected()
+
+
+def _open_response(response, reused, block_size):
+    """Returns a ResponseReader for a streamed response, raises
+    requests.HTTPError (or _Rejected) if it is not ok."""
+    if not response.ok:
+        response.close()
+        _check_rejected(response, reused)
+        response.raise_for_status()
+    return ResponseReader(response, block_size)
+
 
 def get_reqmethod(http_method):
     return getattr(requests, http_method.lower())
@@ -257,14 +1502,17 @@ def print_progress(iteration, total, prefix='', suffix=''):
 
 
 class ReadProgress(object):
-    """File-like object with a progress bar for read operations"""
+    """File-like object reporting the progress of read operations
+
+    Calls callback(bytes read so far, total bytes) after every read, e.g.
+    print_progress or a clfpy.progress.Tracker.
+    """
 
     def __init__(self, flo, flo_size, callback):
         self._len = flo_size
         self._read_len = 0
         self._io = flo
         self._callback = callback
-        self._start_time = time.time()
 
     def __len__(self):
         return self._len
@@ -273,8 +1521,5 @@ class ReadProgress(object):
         chunk = self._io.read(*args)
         if len(chunk) > 0:
             self._read_len += len(chunk)
-            time_elapsed = time.time() - self._start_time
-            speed = self._read_len/1000/time_elapsed
-            print_progress(self._read_len, self._len, prefix="UL:",
-                           suffix="{:.1f} kB/s".format(speed))
+            self._callback(self._read_len, self._len)
         return chunk
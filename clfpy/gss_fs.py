@@ -0,0 +1,660 @@
+"""fsspec file system for GSS (Python 3, requires fsspec)
+
+Makes GSS usable wherever fsspec URLs are accepted, e.g. by pandas, dask
+and xarray:
+
+    df = pandas.read_csv('it4i_barbora://home/results/table.csv',
+                         storage_options={'session_token': token})
+
+The `it4i_barbora` protocol is registered through the `fsspec.specs` entry
+point when clfpy is installed; otherwise register it with
+`fsspec.register_implementation('it4i_barbora', GssFileSystem)`.
+"""
+import io
+import os
+import queue
+import datetime
+import threading
+
+from fsspec.callbacks import DEFAULT_CALLBACK
+from fsspec.spec import AbstractFileSystem
+from fsspec.utils import isfilelike, stringify_path
+
+from .gss_client import GssClient
+from .progress import Progress
+from .registry import get_client
+from .soap_client import DEFAULT_MAX_WORKERS
+from .streams import RANGE_BLOCK_SIZE
+from .transfer import DEFAULT_BLOCK_SIZE, run_concurrently, remote_stat
+
+GSS_WSDL_URL = "https://api.hetcomp.org/gss-0.1/FileUtilities?wsdl"
+# Blocks queued between the writer of a file and its upload
+UPLOAD_QUEUE_BLOCKS = 4
+
+
+class _CallbackProgress(Progress):
+    """Reports the progress of one file transfer to an fsspec callback."""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def start(self, name, size=None):
+        if size is not None:
+            self.callback.set_size(size)
+
+    def advance(self, name, n_bytes):
+        self.callback.relative_update(n_bytes)
+
+
+def _progress(callback):
+    """Returns the `progress` argument of a GssClient transfer for an fsspec
+    callback."""
+    if callback is None or callback is DEFAULT_CALLBACK:
+        return False
+    return _CallbackProgress(callback)
+
+
+class GssFileSystem(AbstractFileSystem):
+    """fsspec file system on top of a clfpy.GssClient.
+
+    Paths are GSS IDs such as 'it4i_barbora://home/results/mesh.vtk'; paths
+    without a protocol are taken relative to the root of the default
+    storage. Listings go to the fsspec listings cache (see the
+    `use_listings_cache` and `listings_expiry_time` options) and are
+    invalidated by changes made through the file system. GSS listings carry
+    no sizes, so info() requests the size and modification time of a file
+    from the storage when they are first needed.
+
+    Files opened for reading are clfpy.streams.GssFile objects, which read
+    only the requested parts with HTTP Range requests; files opened for
+    writing are uploaded while they are written. cat(), cat_ranges(), get()
+    and put() of many files transfer up to `max_workers` files at a time.
+
+    Without `gss`, the shared client of `wsdl_url` is used (see
+    clfpy.get_client()).
+    """
+
+    protocol = ('it4i_barbora',)
+    root_marker = ''
+
+    def __init__(self, session_token=None, wsdl_url=GSS_WSDL_URL, gss=None,
+                 max_workers=DEFAULT_MAX_WORKERS, block_size=RANGE_BLOCK_SIZE,
+                 **storage_options):
+        super().__init__(**storage_options)
+        if session_token is None:
+            raise ValueError("A session token is required")
+        self.session_token = session_token
+        self.gss = gss if gss is not None else get_client(GssClient,
+                                                          wsdl_url)
+        self.max_workers = max_workers
+        self.block_size = block_size
+        # Collects the transfers of get() and put() for running them
+        # concurrently
+        self._batch = threading.local()
+
+    @classmethod
+    def _strip_protocol(cls, path):
+        """Returns the normalised GSS ID: with protocol, without trailing /"""
+        if isinstance(path, list):
+            return [cls._strip_protocol(p) for p in path]
+        path = stringify_path(path)
+        if '://' not in path:
+            path = cls.protocol[0] + '://' + path.lstrip('/')
+        scheme, _, rest = path.partition('://')
+        return scheme + '://' + rest.rstrip('/')
+
+    def unstrip_protocol(self, name):
+        return self._strip_protocol(name)
+
+    @classmethod
+    def _parent(cls, path):
+        path = cls._strip_protocol(path)
+        scheme, _, rest = path.partition('://')
+        return scheme + '://' + rest.rpartition('/')[0]
+
+    def _entry(self, entry):
+        is_folder = 'FOLDER' in entry['type']
+        return {'name': self._strip_protocol(entry['uniqueName']),
+                'size': 0 if is_folder else None,
+                'type': 'directory' if is_folder else 'file'}
+
+    def ls(self, path, detail=True, refresh=False, **kwargs):
+        path = self._strip_protocol(path)
+        entries = None if refresh else self._ls_from_cache(path)
+        if entries is None:
+            entries = [self._entry(e) for e in self.gss.iter_files_minimal(
+                path, self.session_token)]
+            if entries:
+                self.dircache[path] = entries
+            else:
+                # Empty folders, files and missing paths list alike
+                if self.isdir(path):
+                    self.dircache[path] = entries
+                else:
+                    entries = [self.info(path)]
+        if detail:
+            return [dict(e) for e in entries]
+        return [e['name'] for e in entries]
+
+    def info(self, path, **kwargs):
+        """Returns name, type, size and, for files, mtime of a path."""
+        path = self._strip_protocol(path)
+        entry, res_info = self._lookup(path)
+        if entry['type'] == 'file' and 'mtime' not in entry:
+            # Completes the entry, also in the listings cache
+            entry.update(self._stat(path, res_info))
+        return dict(entry)
+
+    def _lookup(self, path):
+        """Returns the listing entry of a path, from the listings cache if
+        possible, and the resource information if it was requested."""
+        if path in self.dircache or path == self._parent(path):
+            return {'name': path, 'size': 0, 'type': 'directory'}, None
+        cached = self._ls_from_cache(path)
+        if cached:
+            return cached[0], None
+        res_info = self._resource_information(path)
+        if 'FOLDER' in res_info.type:
+            return {'name': path, 'size': 0, 'type': 'directory'}, res_info
+        if 'FILE' not in res_info.type:
+            raise FileNotFoundError(path)
+        return {'name': path, 'size': None, 'type': 'file'}, res_info
+
+    def _type(self, path):
+        """Returns the type of a path without requesting its size, or None
+        if it does not exist."""
+        try:
+            return self._lookup(self._strip_protocol(path))[0]['type']
+        except FileNotFoundError:
+            return None
+
+    def exists(self, path, **kwargs):
+        return self._type(path) is not None
+
+    def isdir(self, path):
+        return self._type(path) == 'directory'
+
+    def isfile(self, path):
+        return self._type(path) == 'file'
+
+    def _resource_information(self, path):
+        res_info = self.gss.get_resource_information(path, self.session_token)
+        if isinstance(res_info, Exception):
+            raise res_info
+        return res_info
+
+    def _stat(self, path, res_info=None):
+        if res_info is None:
+            res_info = self._resource_information(path)
+        read_desc = res_info.readDescription
+        if not read_desc.supported:
+            raise FileNotFoundError(path)
+        size, mtime = remote_stat(
+            self.gss._http_session(), read_desc.httpMethod, read_desc.url,
+            {h.key: h.value for h in read_desc.headers}, self.gss._timeout)
+        return {'size': size, 'mtime': mtime}
+
+    def modified(self, path):
+        mtime = self.info(path).get('mtime')
+        if mtime is None:
+            raise NotImplementedError("Modification time unknown")
+        return datetime.datetime.fromtimestamp(mtime, datetime.timezone.utc)
+
+    def find(self, path, maxdepth=None, withdirs=False, detail=False,
+             **kwargs):
+        """Lists all files below a path, listing folders concurrently with
+        GssClient.walk()."""
+        if maxdepth is not None:
+            return super().find(path, maxdepth=maxdepth, withdirs=withdirs,
+                                detail=detail, **kwargs)
+        path = self._strip_protocol(path)
+        found = {}
+        try:
+            info = self.info(path)
+        except FileNotFoundError:
+            info = None
+        if info is not None and info['type'] == 'file':
+            found[path] = info
+        elif info is not None:
+            if withdirs:
+                found[path] = info
+            for folder, subfolders, files in self.gss.walk(
+                    path, self.session_token, self.max_workers):
+                entries = [self._entry(e) for e in subfolders + files]
+                self.dircache[self._strip_protocol(folder)] = entries
+                for entry in entries:
+                    if withdirs or entry['type'] == 'file':
+                        found[entry['name']] = entry
+        names = sorted(found)
+        if detail:
+            return {name: dict(found[name]) for name in names}
+        return names
+
+    def _open(self, path, mode='rb', block_size=None, autocommit=True,
+              cache_options=None, **kwargs):
+        """Opens a GssFile for reading, or a file uploaded as written.
+
+        `cache_options` may set `cache_blocks` and `read_ahead` of the
+        GssFile. Existing files opened for writing are replaced, missing
+        parent folders are created.
+        """
+        path = self._strip_protocol(path)
+        if mode == 'rb':
+            try:
+                return self.gss.open(path, self.session_token,
+                                     block_size=block_size or self.block_size,
+                                     **(cache_options or {}))
+            except AttributeError:
+                raise FileNotFoundError(path)
+        if mode in ('wb', 'xb'):
+            exists = self._exists(path)
+            if exists and mode == 'xb':
+                raise FileExistsError(path)
+            if not exists:
+                self.makedirs(self._parent(path), exist_ok=True)
+
+            def upload(chunks):
+                try:
+                    self.gss.upload_stream(path, self.session_token, chunks,
+                                           update=exists)
+                finally:
+                    self.invalidate_cache(self._parent(path))
+
+            def discard():
+                # Only a new file can be removed; an update stays incomplete
+                if not exists and self.exists(path):
+                    self.rm_file(path)
+            return _UploadFile(upload, path, discard)
+        raise NotImplementedError("Mode {} is not supported".format(mode))
+
+    def _exists(self, path):
+        exists = self.gss.contains_file(path, self.session_token)
+        if isinstance(exists, Exception):
+            raise exists
+        return exists
+
+    def cat_file(self, path, start=None, end=None, **kwargs):
+        """Returns the content of a file, or the bytes start to end.
+
+        Whole files are streamed, byte ranges are read through a GssFile.
+        Negative offsets count from the end of the file.
+        """
+        path = self._strip_protocol(path)
+        try:
+            if not start and end is None:
+                with self.gss.open_read(path, self.session_token) as stream:
+                    return stream.read()
+            with self.gss.open(path, self.session_token,
+                               block_size=self.block_size,
+                               read_ahead=0) as gss_file:
+                if (start or 0) < 0 or (end or 0) < 0:
+                    size = gss_file.size
+                    start = max(size + start, 0) if (start or 0) < 0 \
+                        else start
+                    end = size + end if end is not None and end < 0 else end
+                gss_file.seek(start or 0)
+                if end is None:
+                    return gss_file.read()
+                return gss_file.read(max(end - (start or 0), 0))
+        except AttributeError:
+            raise FileNotFoundError(path)
+
+    def cat(self, path, recursive=False, on_error='raise', **kwargs):
+        """Returns the contents of files, read concurrently if there are
+        several."""
+        paths = self.expand_path(path, recursive=recursive)
+        if len(paths) == 1 and not isinstance(path, list) and \
+                paths[0] == self._strip_protocol(path):
+            return self.cat_file(paths[0], **kwargs)
+        if recursive:
+            paths = [p for p in paths if not self.isdir(p)]
+        contents = {}
+        for p, data, error in run_concurrently(
+                lambda p: self.cat_file(p, **kwargs), paths,
+                self.max_workers):
+            if error is None:
+                contents[p] = data
+            elif on_error == 'raise':
+                raise error
+            elif on_error == 'return':
+                contents[p] = error
+        return {p: contents[p] for p in paths if p in contents}
+
+    def cat_ranges(self, paths, starts, ends, max_gap=None, on_error='return',
+                   **kwargs):
+        """Returns byte ranges of files, read concurrently."""
+        if max_gap is not None:
+            raise NotImplementedError
+        if not isinstance(paths, list):
+            raise TypeError
+        if not isinstance(starts, list):
+            starts = [starts] * len(paths)
+        if not isinstance(ends, list):
+            ends = [ends] * len(paths)
+        if len(starts) != len(paths) or len(ends) != len(paths):
+            raise ValueError
+        results = [None] * len(paths)
+        for i, data, error in run_concurrently(
+                lambda i: self.cat_file(paths[i], starts[i], ends[i],
+                                        **kwargs),
+                range(len(paths)), self.max_workers):
+            if error is not None and on_error != 'return':
+                raise error
+            results[i] = data if error is None else error
+        return results
+
+    def pipe_file(self, path, value, mode='overwrite', **kwargs):
+        path = self._strip_protocol(path)
+        exists = self._exists(path)
+        if exists and mode == 'create':
+            raise FileExistsError(path)
+        if not exists:
+            self.makedirs(self._parent(path), exist_ok=True)
+        try:
+            self.gss.upload_stream(path, self.session_token, [value],
+                                   size=len(value), update=exists)
+        finally:
+            self.invalidate_cache(self._parent(path))
+
+    def get_file(self, rpath, lpath, callback=None, outfile=None, **kwargs):
+        if outfile is None and isfilelike(lpath):
+            outfile = lpath
+        callback = callback or DEFAULT_CALLBACK
+        if outfile is not None:
+            with self.open_stream(rpath) as stream:
+                if stream.size is not None:
+                    callback.set_size(stream.size)
+                for chunk in stream.iter_chunks():
+                    outfile.write(chunk)
+                    callback.relative_update(len(chunk))
+            return
+        if self.isdir(rpath):
+            os.makedirs(lpath, exist_ok=True)
+            return
+        pending = getattr(self._batch, 'transfers', None)
+        if pending is not None:
+            pending.append((rpath, lpath))
+        else:
+            self._download(rpath, lpath, callback)
+
+    def open_stream(self, path):
+        """Opens a file for streaming reads, see GssClient.open_read()."""
+        path = self._strip_protocol(path)
+        try:
+            return self.gss.open_read(path, self.session_token)
+        except AttributeError:
+            raise FileNotFoundError(path)
+
+    def _download(self, rpath, lpath, callback=None):
+        folder = os.path.dirname(os.path.abspath(lpath))
+        os.makedirs(folder, exist_ok=True)
+        try:
+            self.gss.download_to_file(self._strip_protocol(rpath),
+                                      self.session_token, lpath,
+                                      progress=_progress(callback))
+        except AttributeError:
+            raise FileNotFoundError(rpath)
+
+    def get(self, rpath, lpath, recursive=False, callback=None, maxdepth=None,
+            **kwargs):
+        """Downloads files, up to `max_workers` at a time."""
+        self._batched(super().get, self._download, rpath, lpath, callback,
+                      recursive=recursive, maxdepth=maxdepth, **kwargs)
+
+    def put_file(self, lpath, rpath, callback=None, mode='overwrite',
+                 **kwargs):
+        rpath = self._strip_protocol(rpath)
+        if os.path.isdir(lpath):
+            self.makedirs(rpath, exist_ok=True)
+            return
+        pending = getattr(self._batch, 'transfers', None)
+        if pending is None:
+            self.makedirs(self._parent(rpath), exist_ok=True)
+            self._upload(lpath, rpath, mode, callback)
+            return
+        # Folders are created up front, so concurrent uploads do not race
+        # for them
+        parent = self._parent(rpath)
+        if parent not in self._batch.folders:
+            self.makedirs(parent, exist_ok=True)
+            self._batch.folders.add(parent)
+        pending.append((lpath, rpath, mode))
+
+    def _upload(self, lpath, rpath, mode='overwrite', callback=None):
+        progress = _progress(callback)
+        try:
+            if self._exists(rpath):
+                if mode == 'create':
+                    raise FileExistsError(rpath)
+                self.gss.update(rpath, self.session_token, lpath,
+                                progress=progress, check=True)
+            else:
+                self.gss.upload(rpath, self.session_token, lpath,
+                                progress=progress, check=True)
+        finally:
+            self.invalidate_cache(self._parent(rpath))
+
+    def put(self, lpath, rpath, recursive=False, callback=None, maxdepth=None,
+            **kwargs):
+        """Uploads files, up to `max_workers` at a time."""
+        self._batched(super().put, self._upload, lpath, rpath, callback,
+                      recursive=recursive, maxdepth=maxdepth, **kwargs)
+
+    def _batched(self, collect, transfer, source, target, callback,
+                 **kwargs):
+        """Collects the transfers of get() or put() and runs them
+        concurrently.
+
+        The base class maps the sources to targets and calls get_file() or
+        put_file() per file, which only record the transfers here. Like in
+        the base class, `callback` counts the files and its branches get
+        the bytes of each file. Errors are raised after all other transfers
+        finished.
+        """
+        callback = callback or DEFAULT_CALLBACK
+        self._batch.transfers = []
+        self._batch.folders = set()
+        try:
+            collect(source, target, **kwargs)
+            transfers = self._batch.transfers
+        finally:
+            self._batch.transfers = None
+            self._batch.folders = None
+        callback.set_size(len(transfers))
+
+        def run(args):
+            with callback.branched(args[0], args[1]) as child:
+                transfer(*args, callback=child)
+
+        first_error = None
+        for _, _, error in run_concurrently(run, transfers, self.max_workers):
+            callback.relative_update(1)
+            if error is not None and first_error is None:
+                first_error = error
+        if first_error is not None:
+            raise first_error
+
+    def mkdir(self, path, create_parents=True, **kwargs):
+        path = self._strip_protocol(path)
+        if create_parents:
+            self.makedirs(path, exist_ok=True)
+            return
+        try:
+            self._create_folder(path)
+        finally:
+            self.invalidate_cache(self._parent(path))
+
+    def makedirs(self, path, exist_ok=False):
+        path = self._strip_protocol(path)
+        missing = []
+        while path != self._parent(path) and not self.exists(path):
+            missing.append(path)
+            path = self._parent(path)
+        if not missing and not exist_ok:
+            raise FileExistsError(path)
+        try:
+            for folder in reversed(missing):
+                self._create_folder(folder)
+        finally:
+            self.invalidate_cache(path)
+
+    def _create_folder(self, path):
+        created = self.gss.create_folder(path, self.session_token)
+        if isinstance(created, Exception):
+            raise created
+        if not created:
+            raise OSError("Could not create folder {}".format(path))
+
+    def rmdir(self, path):
+        path = self._strip_protocol(path)
+        if self.ls(path, refresh=True):
+            raise OSError("Folder {} is not empty".format(path))
+        self._delete_folder(path)
+
+    def _delete_folder(self, path):
+        try:
+            deleted = self.gss.delete_folder(path, self.session_token)
+        finally:
+            self.invalidate_cache(path)
+        if isinstance(deleted, Exception):
+            raise deleted
+
+    def rm_file(self, path):
+        path = self._strip_protocol(path)
+        try:
+            self.gss.delete(path, self.session_token)
+        except AttributeError:
+            raise FileNotFoundError(path)
+        finally:
+            self.invalidate_cache(self._parent(path))
+
+    def rm(self, path, recursive=False, maxdepth=None):
+        """Deletes files, up to `max_workers` at a time, and with
+        `recursive=True` folders with all their contents."""
+        paths = self.expand_path(path)
+        folders = [p for p in paths if self.isdir(p)]
+        if folders and not recursive:
+            raise IsADirectoryError(folders[0])
+        files = [p for p in paths if p not in folders]
+        for _, _, error in run_concurrently(self.rm_file, files,
+                                            self.max_workers):
+            if error is not None:
+                raise error
+        for folder in folders:
+            self._delete_folder(folder)
+
+    def invalidate_cache(self, path=None):
+        if path is None:
+            self.dircache.clear()
+            return
+        path = self._strip_protocol(path)
+        self.dircache.pop(path, None)
+        self.dircache.pop(self._parent(path), None)
+        for name in list(self.dircache):
+            if name.startswith(path + '/'):
+                self.dircache.pop(name, None)
+
+
+class _Aborted(Exception):
+    """The writer of an uploaded file failed"""
+
+
+class _UploadFile(io.RawIOBase):
+    """Writable file uploaded to GSS while it is written.
+
+    `upload(chunks)` runs in a background thread and consumes the data in
+    blocks of `block_size` bytes as they are written; at most
+    UPLOAD_QUEUE_BLOCKS blocks wait for it. Errors of the upload are
+    raised on the next write() or on close(). Leaving a with block with an
+    exception aborts the upload and calls `discard()` to remove what the
+    storage may have kept of it.
+    """
+
+    def __init__(self, upload, name, discard=None,
+                 block_size=DEFAULT_BLOCK_SIZE):
+        super().__init__()
+        self.name = name
+        self._discard = discard
+        self.mode = 'wb'
+        self.block_size = block_size
+        self._buffer = bytearray()
+        self._position = 0
+        self._blocks = queue.Queue(UPLOAD_QUEUE_BLOCKS)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, args=(upload,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        n_bytes = memoryview(data).nbytes
+        self._buffer += memoryview(data).cast('B')
+        self._position += n_bytes
+        if len(self._buffer) >= self.block_size:
+            self._send(bytes(self._buffer))
+            self._buffer = bytearray()
+        return n_bytes
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._buffer:
+                self._send(bytes(self._buffer))
+                self._buffer = bytearray()
+            self._send(None)
+            self._thread.join()
+            if self._error is not None:
+                raise self._error
+        finally:
+            super().close()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None and not self.closed:
+            self._abort()
+        return super().__exit__(exc_type, exc_value, traceback)
+
+    def _abort(self):
+        try:
+            self._send(_Aborted)
+            self._thread.join()
+            if self._discard is not None:
+                self._discard()
+        except Exception:
+            pass
+        finally:
+            super().close()
+
+    def _send(self, block):
+        while True:
+            if self._error is not None:
+                raise self._error
+            if not self._thread.is_alive():
+                raise IOError("Upload of {} ended early".format(self.name))
+            try:
+                self._blocks.put(block, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _chunks(self):
+        while True:
+            block = self._blocks.get()
+            if block is None:
+                return
+            if block is _Aborted:
+                raise _Aborted("Upload of {} aborted".format(self.name))
+            yield block
+
+    def _run(self, upload):
+        try:
+            upload(self._chunks())
+        except Exception as error:
+            self._error = error
@@ -21,36 +21,59 @@ class HpcImagesClient(SoapClient):
         hpc_images = HpcImagesClient(<wsdl>)
     """
 
-    def __init__(self, wsdl_url):
-        super(HpcImagesClient, self).__init__(wsdl_url)
+    def __init__(self, wsdl_url, **kwargs):
+        super(HpcImagesClient, self).__init__(wsdl_url, **kwargs)
 
     def list_images(self, token):
         return self.method_call('listImages', [token])
 
     def get_image_info(self, token, image_name):
         res = self.method_call('getImageInfo', [token, image_name])
-        if "404: Image not found" in str(res):
-            raise ImageNotFoundException
-        if "400: Image name or source file path illegal" in str(res):
-            raise ImageNameIllegalException
-
-        return res
+        return _check_image_info(res)
 
     def register_image(self, token, target_name, source_gss_ID):
         res = self.method_call('registerImage', [token, target_name, source_gss_ID])
-        if "404: Image source file not found" in str(res):
-            raise ImageSourceNotFoundException
-        if "400: Image name or source file path illegal" in str(res):
-            raise ImageNameIllegalException
-        return res
+        return _check_image_source(res)
 
     def update_image(self, token, target_name, source_gss_ID):
         res = self.method_call('updateImage', [token, target_name, source_gss_ID])
-        if "404: Image source file not found" in str(res):
-            raise ImageSourceNotFoundException
-        if "400: Image name or source file path illegal" in str(res):
-            raise ImageNameIllegalException
-        return res
-    
+        return _check_image_source(res)
+
     def delete_image(self, token, image_name):
         return self.method_call('deleteImage', [token, image_name])
+
+    def list_images_async(self, token):
+        return self.method_call_async('listImages', [token])
+
+    def get_image_info_async(self, token, image_name):
+        return self.method_call_async('getImageInfo', [token, image_name],
+                                      _check_image_info)
+
+    def register_image_async(self, token, target_name, source_gss_ID):
+        return self.method_call_async('registerImage',
+                                      [token, target_name, source_gss_ID],
+                                      _check_image_source)
+
+    def update_image_async(self, token, target_name, source_gss_ID):
+        return self.method_call_async('updateImage',
+                                      [token, target_name, source_gss_ID],
+                                      _check_image_source)
+
+    def delete_image_async(self, token, image_name):
+        return self.method_call_async('deleteImage', [token, image_name])
+
+
+def _check_image_info(res):
+    if "404: Image not found" in str(res):
+        raise ImageNotFoundException
+    if "400: Image name or source file path illegal" in str(res):
+        raise ImageNameIllegalException
+    return res
+
+
+def _check_image_source(res):
+    if "404: Image source file not found" in str(res):
+        raise ImageSourceNotFoundException
+    if "400: Image name or source file path illegal" in str(res):
+        raise ImageNameIllegalException
+    return res
@@ -0,0 +1,196 @@
+"""Per-method latency, size and fault instrumentation for the SOAP clients"""
+import math
+import threading
+
+_sizes = threading.local()
+
+
+def note_sizes(request_bytes, response_bytes):
+    """Called by transports to report the message sizes of the current call."""
+    _sizes.value = (request_bytes, response_bytes)
+
+
+def _take_sizes():
+    sizes = getattr(_sizes, 'value', None)
+    _sizes.value = None
+    return sizes or (None, None)
+
+
+class LatencyHistogram(object):
+    """Latency histogram with logarithmic buckets and bounded memory.
+
+    Bucket boundaries grow by 10 %, so percentiles are accurate to within
+    10 % regardless of the number of samples.
+    """
+
+    base = 1e-4
+    growth = 1.1
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._buckets = {}
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if seconds <= self.base:
+            index = 0
+        else:
+            index = int(math.log(seconds / self.base, self.growth)) + 1
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+
+    def percentile(self, q):
+        """Returns the upper bound of the bucket holding the q-th percentile."""
+        if not self.count:
+            return None
+        rank = q / 100.0 * self.count
+        seen = 0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen >= rank:
+                return min(self.base * self.growth ** index, self.max)
+        return self.max
+
+
+class MethodStats(object):
+    """Counters for one SOAP method of one client class"""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.faults = {}
+        self.errors = {}
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    def snapshot(self):
+        latency = self.latency
+        return {
+            'calls': latency.count,
+            'total_s': latency.total,
+            'mean_s': latency.total / latency.count if latency.count else None,
+            'p50_s': latency.percentile(50),
+            'p95_s': latency.percentile(95),
+            'p99_s': latency.percentile(99),
+            'max_s': latency.max,
+            'request_bytes': self.request_bytes,
+            'response_bytes': self.response_bytes,
+            'faults': dict(self.faults),
+            'errors': dict(self.errors),
+        }
+
+
+class Instrumentation(object):
+    """Collects statistics of SOAP calls and WSDL loads.
+
+    By default, all SOAP clients report to one process-wide instance (see
+    get_instrumentation()). Methods are keyed as "<ClientClass>.<method>".
+
+    Hooks are called with an event dict for every call and WSDL load:
+        {'type': 'call', 'method': 'GssClient.listFiles', 'seconds': 0.12,
+         'request_bytes': 512, 'response_bytes': 20480, 'fault': None,
+         'error': None}
+        {'type': 'wsdl_load', 'url': <wsdl>, 'seconds': 0.8}
+    Exceptions raised by hooks are ignored.
+    """
+
+    def __init__(self):
+        self.hooks = []
+        self._methods = {}
+        self._wsdl_loads = {}
+        self._lock = threading.Lock()
+
+    def add_hook(self, callback):
+        self.hooks.append(callback)
+
+    def remove_hook(self, callback):
+        self.hooks.remove(callback)
+
+    def record_call(self, method, seconds, request_bytes=None,
+                    response_bytes=None, fault=None, error=None):
+        with self._lock:
+            stats = self._methods.get(method)
+            if stats is None:
+                stats = self._methods[method] = MethodStats()
+            stats.latency.add(seconds)
+            stats.request_bytes += request_bytes or 0
+            stats.response_bytes += response_bytes or 0
+            if fault is not None:
+                stats.faults[fault] = stats.faults.get(fault, 0) + 1
+            if error is not None:
+                stats.errors[error] = stats.errors.get(error, 0) + 1
+        self._notify({'type': 'call', 'method': method, 'seconds': seconds,
+                      'request_bytes': request_bytes,
+                      'response_bytes': response_bytes, 'fault': fault,
+                      'error': error})
+
+    def record_wsdl_load(self, url, seconds):
+        with self._lock:
+            loads = self._wsdl_loads.setdefault(url, {'count': 0,
+                                                      'total_s': 0.0})
+            loads['count'] += 1
+            loads['total_s'] += seconds
+            loads['last_s'] = seconds
+        self._notify({'type': 'wsdl_load', 'url': url, 'seconds': seconds})
+
+    def stats(self, prefix=''):
+        """Returns a snapshot of all statistics.
+
+        With `prefix`, e.g. "GssClient.", only matching methods are included.
+        """
+        with self._lock:
+            return {
+                'methods': {name: stats.snapshot()
+                            for name, stats in self._methods.items()
+                            if name.startswith(prefix)},
+                'wsdl_loads': {url: dict(loads)
+                               for url, loads in self._wsdl_loads.items()},
+            }
+
+    def summary(self):
+        """Returns a text table of all methods, most time-consuming first."""
+        methods = self.stats()['methods']
+        lines = ["{:<45}{:>8}{:>10}{:>9}{:>9}{:>9}{:>8}".format(
+            'Method', 'Calls', 'Total s', 'p50 ms', 'p95 ms', 'p99 ms',
+            'Faults')]
+        for name, s in sorted(methods.items(),
+                              key=lambda item: -item[1]['total_s']):
+            lines.append("{:<45}{:>8}{:>10.2f}{:>9.1f}{:>9.1f}{:>9.1f}{:>8}"
+                         .format(name, s['calls'], s['total_s'],
+                                 s['p50_s'] * 1000, s['p95_s'] * 1000,
+                                 s['p99_s'] * 1000,
+                                 sum(s['faults'].values())))
+        return "\n".join(lines)
+
+    def reset(self):
+        with self._lock:
+            self._methods.clear()
+            self._wsdl_loads.clear()
+
+    def _notify(self, event):
+        for hook in list(self.hooks):
+            try:
+                hook(event)
+            except Exception:
+                pass
+
+
+_default_instrumentation = Instrumentation()
+
+
+def get_instrumentation():
+    """Returns the process-wide instrumentation used by all SOAP clients."""
+    return _default_instrumentation
+
+
+def describe_fault(response):
+    """Returns the fault string of a fault response, None for results."""
+    if not isinstance(response, Exception):
+        return None
+    fault = getattr(response, 'fault', None)
+    faultstring = getattr(fault, 'faultstring', None)
+    if faultstring is not None:
+        return str(faultstring)
+    return str(response)
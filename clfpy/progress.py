@@ -0,0 +1,229 @@
+"""Progress reporting for GSS transfers"""
+import sys
+import time
+import threading
+
+# Redraws per second of the terminal renderer
+DEFAULT_REFRESH_RATE = 10
+# Seconds between lines when the output is not a terminal, e.g. a CI log
+LOG_INTERVAL = 5.0
+
+
+class Progress(object):
+    """Interface of transfer progress reporters.
+
+    GssClient calls start() when a file transfer begins, advance() with the
+    number of bytes transferred since the previous call, and finish() when
+    the transfer ended. Folder transfers share one reporter between their
+    worker threads and announce files with expect() as they are found, so
+    implementations must be thread-safe. A transfer that failed and is
+    repeated (e.g. after falling back to another URL) first takes back its
+    bytes with a negative advance().
+
+    All methods do nothing here; override the ones you need.
+    """
+
+    def expect(self, n_files=1, n_bytes=None):
+        """Announces files of a folder transfer (n_bytes None if unknown)."""
+
+    def start(self, name, size=None):
+        """A file transfer of `size` bytes (None if unknown) begins."""
+
+    def advance(self, name, n_bytes):
+        """`n_bytes` more bytes of a file were transferred."""
+
+    def finish(self, name, error=None):
+        """A file transfer ended, with an exception if it failed."""
+
+    def close(self):
+        """All transfers ended."""
+
+
+class Tracker(object):
+    """Feeds the cumulative byte counts of one transfer into a reporter.
+
+    Called with (bytes so far[, total bytes]) like the callbacks of
+    clfpy.transfer.download(), from any thread.
+    """
+
+    def __init__(self, reporter, name, size=None):
+        self.reporter = reporter
+        self.name = name
+        self.size = size
+        self._reported = 0
+        self._started = False
+        self._finished = False
+        self._lock = threading.Lock()
+
+    def _start(self, size):
+        if not self._started:
+            self._started = True
+            self.reporter.start(self.name, size)
+
+    def __call__(self, copied, total=None):
+        with self._lock:
+            self._start(self.size if total is None else total)
+            delta = copied - self._reported
+            self._reported = copied
+            if delta:
+                self.reporter.advance(self.name, delta)
+
+    def finish(self, error=None):
+        """Ends the transfer; only the first call has an effect."""
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+            self._start(self.size)
+            if error is not None and self._reported:
+                self.reporter.advance(self.name, -self._reported)
+                self._reported = 0
+            self.reporter.finish(self.name, error)
+
+
+class _Tracking(object):
+    """Context manager returned by track()"""
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+
+    def __enter__(self):
+        return self.tracker
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.tracker is not None:
+            self.tracker.finish(exc_value)
+        return False
+
+
+_NOT_TRACKING = _Tracking(None)
+
+
+def track(reporter, name, size=None):
+    """Tracks one transfer in a with statement:
+
+        with track(reporter, name, size) as tracker:
+            download(..., callback=tracker)
+
+    `tracker` is None if `reporter` is None, so transfers without progress
+    reporting pay nothing but this test.
+    """
+    if reporter is None:
+        return _NOT_TRACKING
+    return _Tracking(Tracker(reporter, name, size))
+
+
+def _format_seconds(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return "{}:{:02d}:{:02d}".format(hours, minutes, seconds)
+
+
+class TerminalProgress(Progress):
+    """Renders one progress bar for all transfers reported to it.
+
+    Redraws at most `refresh_rate` times per second, and only every
+    LOG_INTERVAL seconds, line by line, if `stream` is not a terminal. Shows
+    the bytes transferred, the throughput and, once the total is known, the
+    percentage and estimated time left. For folder transfers (see expect()),
+    the number of files done is shown as well; the time left is estimated
+    from the files if their sizes are unknown.
+    """
+
+    def __init__(self, prefix='', stream=None,
+                 refresh_rate=DEFAULT_REFRESH_RATE, bar_length=20):
+        self.prefix = prefix
+        self.stream = stream or sys.stdout
+        self.bar_length = bar_length
+        try:
+            self._is_terminal = self.stream.isatty()
+        except (AttributeError, ValueError):
+            self._is_terminal = False
+        self.interval = 1.0 / refresh_rate if self._is_terminal \
+            else max(1.0 / refresh_rate, LOG_INTERVAL)
+        self.files = 0
+        self.files_done = 0
+        self.bytes = 0
+        self.total_bytes = 0
+        self._sizes_known = True
+        self._planned = False
+        self._active = {}
+        self._start_time = time.time()
+        self._last_render = 0.0
+        self._lock = threading.Lock()
+
+    def expect(self, n_files=1, n_bytes=None):
+        with self._lock:
+            self._planned = True
+            self.files += n_files
+            if n_bytes is None:
+                self._sizes_known = False
+            else:
+                self.total_bytes += n_bytes
+
+    def start(self, name, size=None):
+        with self._lock:
+            self._active[name] = size
+            if not self._planned:
+                self.files += 1
+                if size is None:
+                    self._sizes_known = False
+                else:
+                    self.total_bytes += size
+
+    def advance(self, name, n_bytes):
+        with self._lock:
+            self.bytes += n_bytes
+            now = time.time()
+            if now - self._last_render >= self.interval:
+                self._last_render = now
+                self._render(now)
+
+    def finish(self, name, error=None):
+        with self._lock:
+            size = self._active.pop(name, None)
+            if error is None:
+                self.files_done += 1
+            elif not self._planned:
+                # The transfer is repeated or given up
+                self.files -= 1
+                if size is not None:
+                    self.total_bytes -= size
+
+    def close(self):
+        with self._lock:
+            self._render(time.time())
+            if self._is_terminal:
+                self.stream.write('\n')
+                self.stream.flush()
+
+    def _render(self, now):
+        elapsed = max(now - self._start_time, 1e-6)
+        rate = self.bytes / elapsed
+        parts = [self.prefix] if self.prefix else []
+        fraction = None
+        if self._sizes_known and self.total_bytes:
+            fraction = min(float(self.bytes) / self.total_bytes, 1.0)
+            parts.append("{:.1f}/{:.1f} MB".format(self.bytes / 1e6,
+                                                   self.total_bytes / 1e6))
+        else:
+            parts.append("{:.1f} MB".format(self.bytes / 1e6))
+        if fraction is None and self._planned and self.files:
+            fraction = float(self.files_done) / self.files
+        if fraction is not None:
+            filled = int(round(self.bar_length * fraction))
+            parts.insert(len(parts) - 1, "|{}{}| {:5.1f}%".format(
+                '#' * filled, '-' * (self.bar_length - filled),
+                100 * fraction))
+        parts.append("{:.1f} MB/s".format(rate / 1e6))
+        if self._planned:
+            parts.append("[{}/{} files]".format(self.files_done, self.files))
+        if fraction:
+            parts.append("ETA {}".format(
+                _format_seconds(elapsed * (1 - fraction) / fraction)))
+        line = " ".join(parts)
+        if self._is_terminal:
+            self.stream.write('\r' + line.ljust(79))
+        else:
+            self.stream.write(line + '\n')
+        self.stream.flush()
@@ -0,0 +1,26 @@
+"""Process-wide registry of shared SOAP clients"""
+import threading
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_client(client_class, wsdl_url):
+    """Returns the shared client of the given class for a WSDL URL.
+
+    The client is created on first use and handed out again on every
+    subsequent call, so the WSDL is loaded at most once per process (and only
+    when the client is first used):
+        gss = get_client(GssClient, <wsdl>)
+    """
+    key = (client_class, wsdl_url)
+    with _lock:
+        if key not in _clients:
+            _clients[key] = client_class(wsdl_url)
+        return _clients[key]
+
+
+def clear_clients():
+    """Forgets all shared clients, e.g. after the endpoints changed."""
+    with _lock:
+        _clients.clear()
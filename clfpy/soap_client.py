@@ -1,24 +1,181 @@
 """Simple SOAP client as base class for more specialized clients"""
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
 from suds.client import Client
 from suds.cache import NoCache
 from suds import WebFault, MethodNotFound
+from suds.bindings.multiref import MultiRef
+
+from .wsdl_cache import get_default_wsdl_cache
+from .ttl_cache import TTLCache
+from .instrumentation import get_instrumentation, describe_fault, _take_sizes
+from .transport import (SessionTransport, PrefetchedTransport,
+                        get_default_session,
+                        DEFAULT_TIMEOUT, DEFAULT_MAX_WORKERS)
+
+if sys.version_info >= (3, 5):
+    from .aio import AsyncSoapMixin
+else:
+    AsyncSoapMixin = object
+
+# Sentinel for "use the process-wide default"
+DEFAULT = object()
 
 
-class SoapClient(object):
+class SoapClient(AsyncSoapMixin):
     """Simple wrapper around a suds.client.Client object.
 
     Create by passing a wsdl url:
         client = SoapClient(<WSDL_URL>)
 
+    The parsed WSDL is kept in a persistent on-disk cache (see
+    clfpy.WsdlCache). Pass `wsdl_cache=None` to always load it from the
+    network, or a WsdlCache instance to use a custom cache folder or TTL.
+
+    All SOAP requests go through a pooled keep-alive requests.Session which,
+    by default, is shared by all clients (see clfpy.make_session). Pass
+    `session=None` to fall back to suds' own urllib transport.
+
+    The WSDL is only loaded on the first method call, or when calling
+    warm_up() (optionally in a background thread).
+
+    Latencies, message sizes and faults of all calls as well as WSDL load
+    times are reported to the process-wide clfpy.Instrumentation (see
+    stats()). Pass `instrumentation=None` to turn this off, or an
+    Instrumentation instance to collect separately.
+
+    On Python 3.5+, method_call_async() and method_call_many_async() are
+    asyncio counterparts of the call methods (see clfpy.aio).
+
     Serves as a base class for more specialized clients.
     """
-    def __init__(self, wsdl_url):
+    def __init__(self, wsdl_url, wsdl_cache=DEFAULT, session=DEFAULT,
+                 timeout=DEFAULT_TIMEOUT, instrumentation=DEFAULT):
         self.wsdl_url = wsdl_url
-        self.client = Client(self.wsdl_url, cache=NoCache())
+        if wsdl_cache is DEFAULT:
+            wsdl_cache = get_default_wsdl_cache()
+        self.wsdl_cache = wsdl_cache
+        self._session = session
+        self._timeout = timeout
+        self._client = None
+        self._nosend_client = None
+        self._client_lock = threading.Lock()
+        self.memo = None
+        self.memoized_methods = frozenset()
+        if instrumentation is DEFAULT:
+            instrumentation = get_instrumentation()
+        self.instrumentation = instrumentation
+
+    @property
+    def client(self):
+        """The underlying suds client, created on first access.
+
+        Loading the WSDL is deferred until it is actually needed, so creating
+        a SoapClient never blocks on the network.
+        """
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._make_client()
+        return self._client
+
+    def _get_nosend_client(self):
+        """Returns a suds client that only builds and parses messages."""
+        if self._nosend_client is None:
+            with self._client_lock:
+                if self._nosend_client is None:
+                    self._nosend_client = self._make_client(nosend=True)
+        return self._nosend_client
+
+    def _make_client(self, **options):
+        start = time.time()
+        documents = {}
+        response = None
+        if self.wsdl_cache is not None:
+            cache = self.wsdl_cache.suds_cache(self.wsdl_url,
+                                               self._http_session())
+            if not self.wsdl_cache.is_recorded(self.wsdl_url):
+                # Downloaded once, for the validators and for suds
+                response = self.wsdl_cache.fetch(
+                    self.wsdl_url, self._http_session(), self._timeout)
+                if response is not None and response.status_code == 200:
+                    documents[self.wsdl_url] = response.content
+
+        if self._session is not None:
+            options['transport'] = SessionTransport(
+                None if self._session is DEFAULT else self._session,
+                self._timeout, documents)
+        elif documents:
+            options['transport'] = PrefetchedTransport(documents)
+
+        if self.wsdl_cache is None:
+            client = Client(self.wsdl_url, cache=NoCache(), **options)
+        else:
+            client = Client(self.wsdl_url, cache=cache, cachingpolicy=1,
+                            **options)
+            self.wsdl_cache.record(self.wsdl_url, response)
+        _make_thread_safe(client)
+        if self.instrumentation is not None:
+            self.instrumentation.record_wsdl_load(self.wsdl_url,
+                                                  time.time() - start)
+        return client
+
+    def _http_session(self):
+        """Returns the requests session (or module) for plain HTTP calls."""
+        if self._session is DEFAULT:
+            return get_default_session()
+        if self._session is None:
+            return requests
+        return self._session
+
+    def warm_up(self, background=False):
+        """Loads the WSDL now instead of on the first method call.
+
+        With `background=True`, the WSDL is loaded in a daemon thread which is
+        returned. Errors are ignored there; they surface again on the first
+        method call.
+        """
+        if not background:
+            self.client
+            return None
+
+        thread = threading.Thread(target=self._warm_up_quietly)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def _warm_up_quietly(self):
+        try:
+            self.client
+        except Exception:
+            pass
+
+    def enable_memo(self, methodnames, ttl=60, maxsize=1024):
+        """Memoizes the results of the given read-only SOAP methods.
+
+        Successful results are kept per (method, arguments) for `ttl` seconds
+        in an LRU cache of at most `maxsize` entries (see clfpy.TTLCache,
+        available as `self.memo`). Faults are never memoized. Only use this
+        for methods without side effects; cached results are shared between
+        callers.
+        """
+        self.memo = TTLCache(maxsize, ttl)
+        self.memoized_methods = frozenset(methodnames)
+
+    def _memo_key(self, methodname, method_args):
+        if self.memo is None or methodname not in self.memoized_methods:
+            return None
+        return (methodname, tuple(method_args))
 
     def method_call(self, methodname, method_args):
         """Calls an arbitrary SOAP method.
 
+        Safe to use from several threads at the same time.
+
         Args:
             methodname (str): name of the method to call
             method_args (list): argument list to pass to the method
@@ -26,6 +183,54 @@ class SoapClient(object):
         Returns:
             SOAP response or SOAP fault object
         """
+        memo_key = self._memo_key(methodname, method_args)
+        if memo_key is not None:
+            found, response = self.memo.get(memo_key)
+            if found:
+                return response
+
+        if self.instrumentation is None:
+            response = self._method_call(methodname, method_args)
+        else:
+            response = self._timed_method_call(methodname, method_args)
+
+        if memo_key is not None and not isinstance(response, Exception):
+            self.memo.put(memo_key, response)
+        return response
+
+    def _timed_method_call(self, methodname, method_args):
+        _take_sizes()
+        start = time.time()
+        try:
+            response = self._method_call(methodname, method_args)
+        except Exception as error:
+            self._record_call(methodname, start, error=error)
+            raise
+        self._record_call(methodname, start, response=response)
+        return response
+
+    def _record_call(self, methodname, start, response=None, error=None,
+                     sizes=None):
+        """Reports a finished call to the instrumentation."""
+        request_bytes, response_bytes = sizes or _take_sizes()
+        self.instrumentation.record_call(
+            "{}.{}".format(type(self).__name__, methodname),
+            time.time() - start, request_bytes, response_bytes,
+            fault=describe_fault(response),
+            error=type(error).__name__ if error is not None else None)
+
+    def stats(self):
+        """Returns the call statistics of this client class.
+
+        See clfpy.Instrumentation.stats() for the format. Returns None if
+        instrumentation is turned off.
+        """
+        if self.instrumentation is None:
+            return None
+        return self.instrumentation.stats(
+            prefix="{}.".format(type(self).__name__))
+
+    def _method_call(self, methodname, method_args):
         try:
             method = getattr(self.client.service, methodname)
         except MethodNotFound as error:
@@ -37,3 +242,59 @@ class SoapClient(object):
             return error
 
         return response
+
+    def method_call_many(self, calls, max_workers=DEFAULT_MAX_WORKERS):
+        """Calls many SOAP methods concurrently.
+
+        Args:
+            calls (iterable): (methodname, method_args) tuples
+            max_workers (int): maximum number of calls in flight
+
+        Returns:
+            List of results in the order of `calls`. Just like for
+            method_call(), each result is the SOAP response or fault object;
+            calls failing on the transport level yield the exception instead
+            of aborting the other calls.
+        """
+        calls = list(calls)
+        if not calls:
+            return []
+        self.client
+
+        def call(methodname, method_args):
+            try:
+                return self.method_call(methodname, method_args)
+            except Exception as error:
+                return error
+
+        max_workers = max(1, min(max_workers, len(calls)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(call, methodname, method_args)
+                       for methodname, method_args in calls]
+            return [future.result() for future in futures]
+
+
+class _ThreadLocalMultiRef(threading.local):
+    """Per-thread replacement for the MultiRef object of a suds binding"""
+
+    def __init__(self):
+        self.multiref = MultiRef()
+
+    def process(self, body):
+        return self.multiref.process(body)
+
+
+def _make_thread_safe(client):
+    """Allows concurrent method calls on a suds client.
+
+    suds bindings are shared by all calls and keep the state of the reply
+    being processed in a MultiRef object, so concurrent replies would get
+    mixed up. Every thread gets its own MultiRef object instead.
+    """
+    for service in client.wsdl.services:
+        for port in service.ports:
+            for method in port.methods.values():
+                for binding in (method.binding.input, method.binding.output):
+                    if binding is not None and not isinstance(
+                            binding.multiref, _ThreadLocalMultiRef):
+                        binding.multiref = _ThreadLocalMultiRef()
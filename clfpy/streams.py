@@ -0,0 +1,416 @@
+"""Streaming reads and writes of GSS files without temporary files"""
+import io
+import threading
+from collections import OrderedDict
+
+from .transport import DEFAULT_TIMEOUT
+from .transfer import (DEFAULT_BLOCK_SIZE, content_length,
+                       parse_content_range, _range_headers)
+
+# Bytes fetched per Range request of a GssFile, and blocks kept per file
+RANGE_BLOCK_SIZE = 256 * 1024
+DEFAULT_CACHE_BLOCKS = 64
+# Blocks fetched in addition once a GssFile is read sequentially
+DEFAULT_READ_AHEAD = 4
+# Storage endpoints answer expired or revoked request descriptions with these
+REJECTED_STATUS_CODES = (401, 403)
+
+
+class ResponseReader(io.RawIOBase):
+    """Read-only file-like object streaming the body of a response.
+
+    Wraps a requests.Response created with stream=True. The body is read
+    from the connection as it is consumed, so memory use does not depend on
+    the size of the file; iter_chunks() yields it in blocks. Closing the
+    reader (also by leaving a with block) releases the connection.
+
+    `size` is the length of the body, None if the storage did not send it.
+    Wrap the reader in io.BufferedReader for efficient readline() and
+    small reads.
+    """
+
+    def __init__(self, response, block_size=DEFAULT_BLOCK_SIZE):
+        super(ResponseReader, self).__init__()
+        self.response = response
+        self.size = content_length(response)
+        self.block_size = block_size
+        self._raw = response.raw
+        self._raw.decode_content = True
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def _advance(self, n_read, requested):
+        """Counts read bytes and detects a body cut short."""
+        self._position += n_read
+        if not n_read and requested and self.size is not None and \
+                self._position < self.size:
+            raise IOError("Incomplete download: got {} of {} bytes".format(
+                self._position, self.size))
+        return n_read
+
+    def readinto(self, buf):
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        return self._advance(self._raw.readinto(buf) or 0, len(buf))
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return self.readall()
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        data = self._raw.read(size)
+        self._advance(len(data), size)
+        return data
+
+    def readall(self):
+        return b''.join(self.iter_chunks())
+
+    def iter_chunks(self, chunk_size=None):
+        """Yields the rest of the body in chunks of up to `chunk_size`
+        bytes (by default `block_size`)."""
+        chunk_size = chunk_size or self.block_size
+        while True:
+            chunk = self.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def close(self):
+        if not self.closed:
+            self.response.close()
+        super(ResponseReader, self).close()
+
+
+def iter_source(source, block_size=DEFAULT_BLOCK_SIZE, callback=None):
+    """Yields the non-empty chunks of a binary file object or an iterable
+    of bytes.
+
+    File objects are read in blocks of `block_size` bytes. `callback` is
+    called with the number of bytes yielded so far after every chunk.
+    """
+    read = getattr(source, 'read', None)
+    if read is not None:
+        chunks = iter(lambda: read(block_size), b'')
+    else:
+        chunks = iter(source)
+    copied = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        copied += len(chunk)
+        if callback is not None:
+            callback(copied)
+        yield chunk
+
+
+class SizedSource(object):
+    """File-like view of an iterator of chunks with a known total size.
+
+    requests sends bodies with a length as Content-Length delimited
+    requests and iterators with chunked transfer encoding; this gives an
+    iterator a length. The chunks have to add up to exactly `size` bytes,
+    otherwise read() raises IOError rather than sending a request the
+    storage would wait on or truncate.
+    """
+
+    def __init__(self, chunks, size):
+        self._chunks = iter(chunks)
+        self._size = size
+        self._position = 0
+        self._pending = memoryview(b'')
+
+    def __len__(self):
+        return self._size
+
+    def read(self, size=-1):
+        remaining = self._size - self._position
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        pieces = []
+        n_read = 0
+        while n_read < size:
+            if not len(self._pending):
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    raise IOError("Source ended after {} of {} bytes".format(
+                        self._position + n_read, self._size))
+                self._pending = memoryview(chunk)
+            piece = self._pending[:size - n_read]
+            self._pending = self._pending[len(piece):]
+            pieces.append(piece.tobytes())
+            n_read += len(piece)
+        self._position += n_read
+        if self._position == self._size and (
+                len(self._pending) or next(self._chunks, None) is not None):
+            raise IOError("Source is longer than {} bytes".format(self._size))
+        return b''.join(pieces)
+
+
+class GssFile(io.RawIOBase):
+    """Seekable read-only file-like object reading a remote file on demand.
+
+    Reads are served from a cache of up to `cache_blocks` blocks of
+    `block_size` bytes, evicting the least recently used block first.
+    Missing blocks are fetched with HTTP Range requests, one request per
+    run of adjacent blocks. Once the file is read sequentially, requests
+    fetch `read_ahead` more blocks, doubling with every further request up
+    to half of the cache; other access patterns reset this window.
+    read(n) always returns n bytes before the end of the file, so the
+    object works with libraries expecting regular files, e.g. tarfile,
+    zipfile or h5py.
+
+    The remote file is requested with `method`, `url` and `headers`; if
+    the storage rejects them (HTTP 401/403), `refresh` (if given) is called
+    for a new (method, url, headers) tuple and the request repeated once.
+    Storage endpoints without Range support answer with the whole file,
+    which is then read up to the requested bytes; `ranges_supported` tells
+    whether this happened.
+
+    Reads are serialised, so one object can be shared between threads.
+    """
+
+    mode = 'rb'
+
+    def __init__(self, session, method, url, headers, size=None,
+                 block_size=RANGE_BLOCK_SIZE,
+                 cache_blocks=DEFAULT_CACHE_BLOCKS,
+                 read_ahead=DEFAULT_READ_AHEAD, timeout=DEFAULT_TIMEOUT,
+                 refresh=None, name=None):
+        super(GssFile, self).__init__()
+        self.session = session
+        self.method = method
+        self.url = url
+        self.headers = dict(headers)
+        self.block_size = block_size
+        self.cache_blocks = max(cache_blocks, 1)
+        self.read_ahead = read_ahead
+        self.timeout = timeout
+        self.refresh = refresh
+        self.name = name if name is not None else url
+        self.ranges_supported = True
+        self._size = size
+        self._position = 0
+        self._next_block = None
+        self._window = read_ahead
+        self._blocks = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._requests = 0
+        self._fetched = 0
+
+    @property
+    def size(self):
+        """Size of the remote file, fetched with the first block if it was
+        not given."""
+        if self._size is None:
+            with self._lock:
+                if self._size is None:
+                    self._load(0, 0)
+        return self._size
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError("Invalid whence: {}".format(whence))
+        if position < 0:
+            raise ValueError("Negative seek position {}".format(position))
+        self._position = position
+        return position
+
+    def read(self, size=-1):
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        file_size = self.size
+        with self._lock:
+            start = self._position
+            end = file_size if size is None or size < 0 \
+                else min(start + size, file_size)
+            data = self._read_range(start, end)
+            self._position += len(data)
+        return data
+
+    def readall(self):
+        return self.read()
+
+    def readinto(self, buf):
+        data = self.read(len(buf))
+        buf[:len(data)] = data
+        return len(data)
+
+    def peek(self, size=0):
+        """Returns the cached rest of the current block without moving, at
+        least one byte before the end of the file; makes readline()
+        efficient."""
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        if self._position >= self.size:
+            return b''
+        with self._lock:
+            index = self._position // self.block_size
+            block = self._load(index, index)[index]
+        return block[self._position - index * self.block_size:]
+
+    def stats(self):
+        """Returns the block cache and request counters."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {'hits': self._hits, 'misses': self._misses,
+                    'hit_rate': float(self._hits) / lookups if lookups
+                    else 0.0,
+                    'evictions': self._evictions, 'size': len(self._blocks),
+                    'requests': self._requests,
+                    'bytes_fetched': self._fetched}
+
+    def close(self):
+        self._blocks.clear()
+        super(GssFile, self).close()
+
+    def _read_range(self, start, end):
+        if start >= end:
+            return b''
+        first = start // self.block_size
+        last = (end - 1) // self.block_size
+        blocks = self._load(first, last)
+        data = b''.join(blocks[index] for index in range(first, last + 1))
+        offset = first * self.block_size
+        return data[start - offset:end - offset]
+
+    def _load(self, first, last):
+        """Returns the blocks first..last, fetching the missing ones."""
+        blocks = {}
+        missing = []
+        for index in range(first, last + 1):
+            block = self._blocks.pop(index, None)
+            if block is None:
+                self._misses += 1
+                missing.append(index)
+            else:
+                self._hits += 1
+                self._blocks[index] = block
+                blocks[index] = block
+        sequential = self._next_block is not None and \
+            self._next_block - 1 <= first <= self._next_block
+        self._next_block = last + 1
+        if not sequential:
+            self._window = self.read_ahead
+
+        runs = []
+        for index in missing:
+            if runs and runs[-1][1] == index - 1:
+                runs[-1][1] = index
+            else:
+                runs.append([index, index])
+        for run_first, run_last in runs:
+            if sequential and run_last == last and self._window:
+                ahead = self._window
+                self._window = min(2 * ahead, max(self.read_ahead,
+                                                  self.cache_blocks // 2))
+                n_blocks = self._block_count()
+                while run_last < last + ahead and \
+                        (n_blocks is None or run_last + 1 < n_blocks) and \
+                        run_last + 1 not in self._blocks:
+                    run_last += 1
+            for index, block in self._fetch(run_first, run_last):
+                if first <= index <= last:
+                    blocks[index] = block
+                self._blocks[index] = block
+        while len(self._blocks) > self.cache_blocks:
+            self._blocks.popitem(last=False)
+            self._evictions += 1
+        return blocks
+
+    def _block_count(self):
+        if self._size is None:
+            return None
+        return -(-self._size // self.block_size)
+
+    def _request(self, first_byte, last_byte):
+        headers = dict(self.headers)
+        headers.update(_range_headers(first_byte, last_byte))
+        response = self.session.request(self.method, self.url,
+                                        headers=headers, stream=True,
+                                        timeout=self.timeout)
+        if response.status_code in REJECTED_STATUS_CODES and \
+                self.refresh is not None:
+            response.close()
+            self.method, self.url, headers = self.refresh()
+            self.headers = dict(headers)
+            headers = dict(self.headers)
+            headers.update(_range_headers(first_byte, last_byte))
+            response = self.session.request(self.method, self.url,
+                                            headers=headers, stream=True,
+                                            timeout=self.timeout)
+        self._requests += 1
+        return response
+
+    def _fetch(self, first, last):
+        """Fetches blocks first..last, returns a list of (index, block)."""
+        first_byte = first * self.block_size
+        last_byte = (last + 1) * self.block_size - 1
+        response = self._request(first_byte, last_byte)
+        try:
+            if response.status_code == 416 and first_byte == 0:
+                # Empty file
+                self._size = 0
+                return []
+            response.raise_for_status()
+            raw = response.raw
+            raw.decode_content = True
+            if response.status_code == 206:
+                content_range = parse_content_range(
+                    response.headers.get('Content-Range'))
+                if content_range is None:
+                    raise IOError("Invalid Content-Range header: {}".format(
+                        response.headers.get('Content-Range')))
+                self._size = content_range[2]
+                data = raw.read()
+            else:
+                # No Range support: skip to the requested bytes
+                self.ranges_supported = False
+                self._size = content_length(response)
+                skipped = 0
+                while skipped < first_byte:
+                    skip = raw.read(min(first_byte - skipped,
+                                        DEFAULT_BLOCK_SIZE))
+                    if not skip:
+                        break
+                    skipped += len(skip)
+                data = raw.read(last_byte - first_byte + 1)
+        finally:
+            response.close()
+        self._fetched += len(data)
+        if self._size is None and len(data) < last_byte - first_byte + 1:
+            self._size = first_byte + len(data)
+        expected = min(last_byte + 1, self._size) - first_byte \
+            if self._size is not None else len(data)
+        if len(data) < expected:
+            raise IOError("Incomplete read: got {} of {} bytes".format(
+                len(data), expected))
+        view = memoryview(data)
+        return [(index, view[offset:offset + self.block_size].tobytes())
+                for index, offset in zip(
+                    range(first, last + 1),
+                    range(0, len(data), self.block_size))]
@@ -0,0 +1,565 @@
+"""Local stand-in for the GSS SOAP service, used by the timed test scripts
+
+Serves a GSS-like WSDL (with an imported schema), answers the SOAP methods
+used by clfpy.GssClient (and a few of clfpy.AuthClient), and stores file contents in a local folder which is
+exposed through plain HTTP GET/PUT/DELETE request descriptions.
+
+Usage:
+    server = StandinServer()
+    server.start()
+    gss = clfpy.GssClient(server.wsdl_url)
+    ...
+    server.stop()
+
+or from the command line: python standin_server.py [PORT [FOLDER [RATE]]]
+(RATE limits the download bandwidth per connection in bytes/s)
+"""
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+from email.utils import formatdate
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import quote, unquote
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urllib import quote, unquote
+
+NS = "http://gss.standin.clfpy/"
+ROOT = "it4i_barbora://"
+
+XSD = """<?xml version="1.0" encoding="UTF-8"?>
+<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema"
+           xmlns:tns="{ns}" targetNamespace="{ns}" version="1.0">
+  <xs:complexType name="header">
+    <xs:sequence>
+      <xs:element name="key" type="xs:string" minOccurs="0"/>
+      <xs:element name="value" type="xs:string" minOccurs="0"/>
+    </xs:sequence>
+  </xs:complexType>
+  <xs:complexType name="requestDescription">
+    <xs:sequence>
+      <xs:element name="supported" type="xs:boolean"/>
+      <xs:element name="url" type="xs:string" minOccurs="0"/>
+      <xs:element name="httpMethod" type="xs:string" minOccurs="0"/>
+      <xs:element name="headers" type="tns:header" minOccurs="0"
+                  maxOccurs="unbounded"/>
+    </xs:sequence>
+  </xs:complexType>
+  <xs:complexType name="resourceInformation">
+    <xs:sequence>
+      <xs:element name="uniqueName" type="xs:string" minOccurs="0"/>
+      <xs:element name="visualName" type="xs:string" minOccurs="0"/>
+      <xs:element name="type" type="xs:string" minOccurs="0"/>
+      <xs:element name="queryForName" type="xs:boolean"/>
+      <xs:element name="createDescription" type="tns:requestDescription"
+                  minOccurs="0"/>
+      <xs:element name="readDescription" type="tns:requestDescription"
+                  minOccurs="0"/>
+      <xs:element name="updateDescription" type="tns:requestDescription"
+                  minOccurs="0"/>
+      <xs:element name="deleteDescription" type="tns:requestDescription"
+                  minOccurs="0"/>
+    </xs:sequence>
+  </xs:complexType>
+  <xs:complexType name="call">
+    <xs:sequence>
+      <xs:element name="arg0" type="xs:string" minOccurs="0"/>
+      <xs:element name="arg1" type="xs:string" minOccurs="0"/>
+      <xs:element name="arg2" type="xs:string" minOccurs="0"/>
+    </xs:sequence>
+  </xs:complexType>
+  <xs:complexType name="resourceResponse">
+    <xs:sequence>
+      <xs:element name="return" type="tns:resourceInformation" minOccurs="0"/>
+    </xs:sequence>
+  </xs:complexType>
+  <xs:complexType name="listResponse">
+    <xs:sequence>
+      <xs:element name="return" type="tns:resourceInformation" minOccurs="0"
+                  maxOccurs="unbounded"/>
+    </xs:sequence>
+  </xs:complexType>
+  <xs:complexType name="booleanResponse">
+    <xs:sequence>
+      <xs:element name="return" type="xs:boolean"/>
+    </xs:sequence>
+  </xs:complexType>
+  <xs:complexType name="stringResponse">
+    <xs:sequence>
+      <xs:element name="return" type="xs:string" minOccurs="0"/>
+    </xs:sequence>
+  </xs:complexType>
+{elements}
+</xs:schema>
+"""
+
+# SOAP method name -> response type
+METHODS = {
+    'getResourceInformation': 'resourceResponse',
+    'listFiles': 'listResponse',
+    'listFilesMinimal': 'listResponse',
+    'createFolder': 'booleanResponse',
+    'deleteFolder': 'booleanResponse',
+    'containsFile': 'booleanResponse',
+    'getDirectInteractionEndpoint': 'stringResponse',
+}
+
+# A few AuthManager methods, so clfpy.AuthClient can use the same service.
+# The only valid session token is TOKEN, of USER in PROJECT.
+AUTH_METHODS = {
+    'getSessionToken': 'stringResponse',
+    'validateSessionToken': 'booleanResponse',
+    'getUsername': 'stringResponse',
+    'getProject': 'stringResponse',
+    'getEmail': 'stringResponse',
+}
+TOKEN = 'token'
+USER = 'user'
+PROJECT = 'project'
+
+WSDL = """<?xml version="1.0" encoding="UTF-8"?>
+<definitions xmlns="http://schemas.xmlsoap.org/wsdl/"
+             xmlns:soap="http://schemas.xmlsoap.org/wsdl/soap/"
+             xmlns:tns="{ns}" xmlns:xsd="http://www.w3.org/2001/XMLSchema"
+             targetNamespace="{ns}" name="FileUtilitiesService">
+  <types>
+    <xsd:schema>
+      <xsd:import namespace="{ns}" schemaLocation="{base}/FileUtilities?xsd=1"/>
+    </xsd:schema>
+  </types>
+{messages}
+  <portType name="FileUtilities">
+{port_ops}
+  </portType>
+  <binding name="FileUtilitiesPortBinding" type="tns:FileUtilities">
+    <soap:binding transport="http://schemas.xmlsoap.org/soap/http"
+                  style="document"/>
+{binding_ops}
+  </binding>
+  <service name="FileUtilitiesService">
+    <port name="FileUtilitiesPort" binding="tns:FileUtilitiesPortBinding">
+      <soap:address location="{base}/FileUtilities"/>
+    </port>
+  </service>
+</definitions>
+"""
+
+
+def make_xsd():
+    elements = []
+    for name, response_type in sorted(list(METHODS.items()) +
+                                      list(AUTH_METHODS.items())):
+        elements.append('  <xs:element name="{0}" type="tns:call"/>'
+                        .format(name))
+        elements.append('  <xs:element name="{0}Response" type="tns:{1}"/>'
+                        .format(name, response_type))
+    return XSD.format(ns=NS, elements="\n".join(elements))
+
+
+def make_wsdl(base):
+    messages, port_ops, binding_ops = [], [], []
+    for name in sorted(list(METHODS) + list(AUTH_METHODS)):
+        messages.append(
+            '  <message name="{0}"><part name="parameters" '
+            'element="tns:{0}"/></message>\n'
+            '  <message name="{0}Response"><part name="parameters" '
+            'element="tns:{0}Response"/></message>'.format(name))
+        port_ops.append(
+            '    <operation name="{0}"><input message="tns:{0}"/>'
+            '<output message="tns:{0}Response"/></operation>'.format(name))
+        binding_ops.append(
+            '    <operation name="{0}"><soap:operation soapAction=""/>'
+            '<input><soap:body use="literal"/></input>'
+            '<output><soap:body use="literal"/></output></operation>'
+            .format(name))
+    return WSDL.format(ns=NS, base=base, messages="\n".join(messages),
+                       port_ops="\n".join(port_ops),
+                       binding_ops="\n".join(binding_ops))
+
+
+def xml_escape(text):
+    return (text.replace('&', '&amp;').replace('<', '&lt;')
+            .replace('>', '&gt;'))
+
+
+class StandinStorage(object):
+    """Maps GSS IDs below ROOT onto a local folder"""
+
+    def __init__(self, folder, base):
+        self.folder = folder
+        self.base = base
+        # With signed URLs, data URLs carry this generation and expire when
+        # it is incremented
+        self.signature = None
+
+    def local_path(self, gss_ID):
+        if not gss_ID.startswith(ROOT):
+            return None
+        rel_path = gss_ID[len(ROOT):].strip('/')
+        if '..' in rel_path.split('/'):
+            return None
+        return os.path.join(self.folder, rel_path)
+
+    def resource_type(self, gss_ID):
+        path = self.local_path(gss_ID)
+        if path is None or not os.path.exists(path):
+            return 'NOTEXIST'
+        return 'FOLDER' if os.path.isdir(path) else 'FILE'
+
+    def data_url(self, gss_ID):
+        url = "{}/data/{}".format(self.base,
+                                  quote(gss_ID[len(ROOT):].strip('/')))
+        if self.signature is not None:
+            url += "?sig={}".format(self.signature)
+        return url
+
+    def signed(self, query):
+        return self.signature is None or \
+            query == "sig={}".format(self.signature)
+
+    def request_description(self, tag, supported, method, url):
+        if not supported:
+            return "<{0}><supported>false</supported></{0}>".format(tag)
+        return ("<{0}><supported>true</supported><url>{1}</url>"
+                "<httpMethod>{2}</httpMethod>"
+                "<headers><key>X-Standin</key><value>1</value></headers>"
+                "</{0}>".format(tag, xml_escape(url), method))
+
+    def resource_information(self, gss_ID, tag='return', minimal=False):
+        res_type = self.resource_type(gss_ID)
+        name = gss_ID.rstrip('/').split('/')[-1]
+        parts = ["<uniqueName>{}</uniqueName>".format(xml_escape(gss_ID)),
+                 "<visualName>{}</visualName>".format(xml_escape(name)),
+                 "<type>{}</type>".format(res_type),
+                 "<queryForName>false</queryForName>"]
+        if not minimal:
+            url = self.data_url(gss_ID)
+            is_file = res_type == 'FILE'
+            parts.extend([
+                self.request_description('createDescription',
+                                         res_type == 'NOTEXIST', 'PUT', url),
+                self.request_description('readDescription', is_file, 'GET',
+                                         url),
+                self.request_description('updateDescription', is_file, 'PUT',
+                                         url),
+                self.request_description('deleteDescription',
+                                         res_type != 'NOTEXIST', 'DELETE',
+                                         url),
+            ])
+        return "<{0}>{1}</{0}>".format(tag, "".join(parts))
+
+    def list_folder(self, gss_ID, minimal):
+        path = self.local_path(gss_ID)
+        if path is None or not os.path.isdir(path):
+            return ""
+        prefix = gss_ID if gss_ID.endswith('/') else gss_ID + '/'
+        return "".join(self.resource_information(prefix + name,
+                                                 minimal=minimal)
+                       for name in sorted(os.listdir(path)))
+
+    def call(self, method, args):
+        if method in AUTH_METHODS:
+            return self.auth_call(method, args)
+        gss_ID = args[0] if args else ''
+        path = self.local_path(gss_ID)
+        if path is None and method in METHODS:
+            raise ValueError("Invalid GSS ID '{}'".format(gss_ID))
+        if method == 'getResourceInformation':
+            return self.resource_information(gss_ID)
+        if method in ('listFiles', 'listFilesMinimal'):
+            return self.list_folder(gss_ID, method == 'listFilesMinimal')
+        if method == 'containsFile':
+            return "<return>{}</return>".format(
+                'false' if self.resource_type(gss_ID) == 'NOTEXIST'
+                else 'true')
+        if method == 'createFolder':
+            if path is None or os.path.exists(path):
+                return "<return>false</return>"
+            os.makedirs(path)
+            return "<return>true</return>"
+        if method == 'deleteFolder':
+            if path is None or not os.path.isdir(path):
+                return "<return>false</return>"
+            shutil.rmtree(path)
+            return "<return>true</return>"
+        if method == 'getDirectInteractionEndpoint':
+            return "<return>{}/data/</return>".format(self.base)
+        raise KeyError(method)
+
+    def auth_call(self, method, args):
+        if method == 'getSessionToken':
+            if args[:3] != [USER, 'password', PROJECT]:
+                raise ValueError("401 Unauthorized")
+            return "<return>{}</return>".format(TOKEN)
+        if method == 'validateSessionToken':
+            return "<return>{}</return>".format(
+                'true' if args[:1] == [TOKEN] else 'false')
+        if args[:1] != [TOKEN]:
+            raise ValueError("Couldn't validate token")
+        value = {'getUsername': USER, 'getProject': PROJECT,
+                 'getEmail': USER + '@example.org'}[method]
+        return "<return>{}</return>".format(value)
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Avoid delayed-ACK stalls on keep-alive connections
+    disable_nagle_algorithm = True
+    wbufsize = 64 * 1024
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.count('connections')
+
+    @property
+    def storage(self):
+        return self.server.storage
+
+    def send_body(self, body, content_type='text/xml; charset=utf-8',
+                  status=200, headers=None):
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def data_path(self):
+        rel_path, _, query = self.path[len('/data/'):].partition('?')
+        if not self.storage.signed(query):
+            return None
+        return self.storage.local_path(ROOT + unquote(rel_path))
+
+    def send_data_error(self):
+        if self.storage.signed(self.path.partition('?')[2]):
+            self.send_body('Not found', 'text/plain', 404)
+        else:
+            self.send_body('Signature expired', 'text/plain', 403)
+
+    def do_GET(self):
+        if self.path.endswith('?wsdl'):
+            self.server.count('wsdl_requests')
+            self.send_body(make_wsdl(self.storage.base))
+        elif self.path.endswith('?xsd=1'):
+            self.send_body(make_xsd())
+        elif self.path.startswith('/data/'):
+            if self.server.latency:
+                time.sleep(self.server.latency)
+            self.send_file(self.data_path())
+        else:
+            self.send_body('Not found', 'text/plain', 404)
+
+    def send_file(self, path):
+        if path is None or not os.path.isfile(path):
+            self.send_data_error()
+            return
+        size = os.path.getsize(path)
+        start, end, status = 0, size - 1, 200
+        headers = {'Accept-Ranges': 'bytes'} if self.server.ranges else {}
+        headers['Last-Modified'] = formatdate(os.path.getmtime(path),
+                                              usegmt=True)
+        byte_range = self.headers.get('Range') if self.server.ranges else None
+        if byte_range and byte_range.startswith('bytes='):
+            first, _, last = byte_range[len('bytes='):].partition('-')
+            if first:
+                start = int(first)
+                end = min(int(last), size - 1) if last else size - 1
+            else:
+                start = max(size - int(last), 0)
+            if start >= size:
+                self.send_body('', 'text/plain', 416,
+                               {'Content-Range': 'bytes */{}'.format(size)})
+                return
+            status = 206
+            headers['Content-Range'] = 'bytes {}-{}/{}'.format(start, end,
+                                                               size)
+        length = max(end - start + 1, 0)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(length))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        rate = self.server.rate
+        block_size = 64 * 1024 if rate else 1024 * 1024
+        start_time = time.time()
+        sent = 0
+        with open(path, 'rb') as in_file:
+            in_file.seek(start)
+            while length > 0:
+                block = in_file.read(min(length, block_size))
+                if not block:
+                    break
+                self.wfile.write(block)
+                length -= len(block)
+                sent += len(block)
+                if rate:
+                    delay = start_time + float(sent) / rate - time.time()
+                    if delay > 0:
+                        time.sleep(delay)
+
+    def read_body(self):
+        """Reads a request body, either Content-Length delimited or chunked"""
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    raise IOError("Chunked body cut short")
+                chunk_len = int(line.split(b';')[0], 16)
+                if chunk_len == 0:
+                    self.rfile.readline()
+                    return
+                remaining = chunk_len
+                while remaining > 0:
+                    block = self.rfile.read(min(remaining, 1024 * 1024))
+                    remaining -= len(block)
+                    yield block
+                self.rfile.readline()
+        remaining = int(self.headers.get('Content-Length', 0))
+        while remaining > 0:
+            block = self.rfile.read(min(remaining, 1024 * 1024))
+            if not block:
+                return
+            remaining -= len(block)
+            yield block
+
+    def do_PUT(self):
+        path = self.data_path() if self.path.startswith('/data/') else None
+        if path is None or not os.path.isdir(os.path.dirname(path)):
+            for _ in self.read_body():
+                pass
+            self.send_data_error()
+            return
+        # Partial uploads continue an existing file at the given offset
+        content_range = self.headers.get('Content-Range', '')
+        offset = 0
+        if content_range.startswith('bytes ') and os.path.isfile(path):
+            offset = int(content_range[len('bytes '):].split('-')[0])
+        with open(path, 'r+b' if offset else 'wb') as out_file:
+            out_file.seek(offset)
+            out_file.truncate()
+            for block in self.read_body():
+                out_file.write(block)
+        self.send_body('', 'text/plain', 201)
+
+    def do_DELETE(self):
+        path = self.data_path() if self.path.startswith('/data/') else None
+        if path is None or not os.path.isfile(path):
+            self.send_data_error()
+            return
+        os.remove(path)
+        self.send_body('Deleted', 'text/plain')
+
+    def do_POST(self):
+        body = b"".join(self.read_body())
+        envelope = ET.fromstring(body)
+        operation = envelope.find(
+            '{http://schemas.xmlsoap.org/soap/envelope/}Body')[0]
+        method = operation.tag.split('}')[-1]
+        args = [child.text or '' for child in operation]
+        self.server.count('soap_calls')
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        try:
+            result = self.storage.call(method, args)
+        except KeyError:
+            self.send_body(FAULT.format('Unknown method ' + method),
+                           status=500)
+            return
+        except ValueError as error:
+            self.send_body(FAULT.format(xml_escape(str(error))), status=500)
+            return
+        self.send_body(ENVELOPE.format(
+            '<ns:{0}Response xmlns:ns="{1}">{2}</ns:{0}Response>'
+            .format(method, NS, result)))
+
+
+ENVELOPE = ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<S:Envelope xmlns:S="http://schemas.xmlsoap.org/soap/envelope/">'
+            '<S:Body>{}</S:Body></S:Envelope>')
+FAULT = ENVELOPE.format('<S:Fault><faultcode>S:Server</faultcode>'
+                        '<faultstring>{}</faultstring></S:Fault>')
+
+
+class ThreadedServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, *args):
+        HTTPServer.__init__(self, *args)
+        # Accepted connections, served WSDL documents and SOAP calls, for
+        # the tests
+        self.counters = {'connections': 0, 'wsdl_requests': 0,
+                         'soap_calls': 0}
+        self._counter_lock = threading.Lock()
+
+    def count(self, name):
+        with self._counter_lock:
+            self.counters[name] += 1
+
+    def handle_error(self, request, client_address):
+        # Clients aborting transfers are part of the tests
+        if not isinstance(sys.exc_info()[1], (IOError, OSError)):
+            HTTPServer.handle_error(self, request, client_address)
+
+
+class StandinServer(object):
+    """Runs the stand-in GSS service in a background thread"""
+
+    def __init__(self, port=0, folder=None, latency=0.0, rate=None,
+                 ranges=True, signed=False):
+        self.httpd = ThreadedServer(('127.0.0.1', port), StandinHandler)
+        # Simulated network latency per SOAP call and download in seconds
+        self.httpd.latency = latency
+        # Simulated bandwidth limit per connection in bytes/s
+        self.httpd.rate = rate
+        # Whether data downloads honour Range requests
+        self.httpd.ranges = ranges
+        self.base = "http://127.0.0.1:{}".format(self.httpd.server_port)
+        self._owns_folder = folder is None
+        self.folder = folder or tempfile.mkdtemp(prefix='clfpy_standin_')
+        self.httpd.storage = StandinStorage(self.folder, self.base)
+        if signed:
+            self.httpd.storage.signature = 0
+        self.wsdl_url = self.base + "/FileUtilities?wsdl"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def expire_signatures(self):
+        """Invalidates all data URLs handed out so far (needs signed=True)"""
+        self.httpd.storage.signature += 1
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._owns_folder:
+            shutil.rmtree(self.folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    folder = sys.argv[2] if len(sys.argv) > 2 else None
+    rate = float(sys.argv[3]) if len(sys.argv) > 3 else None
+    server = StandinServer(port, folder, rate=rate)
+    print("Serving stand-in GSS at {}".format(server.wsdl_url))
+    print("Storage folder: {}".format(server.folder))
+    sys.stdout.flush()
+    server.httpd.serve_forever()
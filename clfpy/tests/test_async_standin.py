@@ -0,0 +1,89 @@
+"""Test script for the asyncio API, runs against the stand-in GSS"""
+import os
+import time
+import asyncio
+
+import clfpy as cf
+from clfpy.aio import close_async_pool
+from standin_server import StandinServer
+
+n_files = 200
+latency = 0.02
+
+
+async def main(gss, gss_IDs):
+    print("Single calls ...")
+    res_info = await gss.get_resource_information_async(gss_IDs[0], 'token')
+    assert res_info.type == "FILE"
+    assert await gss.contains_file_async(gss_IDs[0], 'token')
+    assert not await gss.contains_file_async(gss_IDs[0] + 'x', 'token')
+    listing = await gss.list_files_minimal_async('it4i_barbora://home',
+                                                 'token')
+    assert len(listing) == n_files
+    fault = await gss.method_call_async('noSuchMethod', [])
+    print("-> Unknown method: {}".format(fault))
+
+    print("Concurrent calls ...")
+    for max_concurrency in [1, 8, 32]:
+        start_time = time.time()
+        results = await gss.get_resource_information_many_async(
+            gss_IDs, 'token', max_concurrency=max_concurrency)
+        print("-> {:2d} in flight: {:6.0f} ms for {} calls".format(
+            max_concurrency, (time.time() - start_time) * 1000, n_files))
+        assert [r.uniqueName for r in results] == gss_IDs
+
+    print("Cancellation ...")
+    task = asyncio.ensure_future(
+        gss.get_resource_information_many_async(gss_IDs, 'token'))
+    await asyncio.sleep(latency * 2)
+    task.cancel()
+    try:
+        await task
+        raise AssertionError("Task was not cancelled")
+    except asyncio.CancelledError:
+        print("-> cancelled")
+    res_info = await gss.get_resource_information_async(gss_IDs[-1], 'token')
+    assert res_info.uniqueName == gss_IDs[-1]
+
+    print("Client settings ...")
+    pooled = cf.GssClient(server.wsdl_url, wsdl_cache=None,
+                          session=cf.make_session(2))
+    pooled.warm_up()
+    before = server.httpd.counters['connections']
+    results = await pooled.get_resource_information_many_async(
+        gss_IDs[:8], 'token', max_concurrency=8)
+    assert [r.uniqueName for r in results] == gss_IDs[:8]
+    opened = server.httpd.counters['connections'] - before
+    print("-> session with pool size 2: {} connections".format(opened))
+    assert opened <= 2
+    impatient = cf.GssClient(server.wsdl_url, wsdl_cache=None,
+                             timeout=(5, 0.2))
+    impatient.warm_up()
+    server.httpd.latency = 0.5
+    try:
+        await impatient.contains_file_async(gss_IDs[0], 'token')
+        raise AssertionError("Async calls time out")
+    except asyncio.TimeoutError:
+        print("-> timed out after 0.2 s")
+    assert await gss.contains_file_async(gss_IDs[0], 'token')
+    server.httpd.latency = latency
+
+    await close_async_pool()
+
+
+server = StandinServer(latency=latency).start()
+try:
+    os.makedirs(os.path.join(server.folder, 'home'))
+    gss_IDs = []
+    for i in range(n_files):
+        with open(os.path.join(server.folder, 'home', str(i)), 'w') as fout:
+            fout.write('x')
+        gss_IDs.append('it4i_barbora://home/{}'.format(i))
+
+    gss = cf.GssClient(server.wsdl_url, wsdl_cache=None)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(main(gss, gss_IDs))
+    print("All good")
+finally:
+    server.stop()
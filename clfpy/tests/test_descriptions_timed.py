@@ -0,0 +1,88 @@
+"""Reuse of signed request descriptions against the stand-in GSS
+
+The stand-in signs its data URLs and rejects them with HTTP 403 once
+expire_signatures() was called. Compares polling downloads and repeated
+updates of small files with and without description reuse, and checks that
+rejected descriptions are refreshed transparently.
+"""
+import os
+import time
+import shutil
+import tempfile
+
+import clfpy as cf
+from standin_server import StandinServer
+
+latency = 0.02
+n_polls = 50
+
+
+def read(filename):
+    with open(filename, 'rb') as in_file:
+        return in_file.read()
+
+
+server = StandinServer(latency=latency, signed=True).start()
+work_folder = tempfile.mkdtemp(prefix='clfpy_desc_')
+try:
+    os.makedirs(os.path.join(server.folder, 'home', 'results'))
+    remote_file = os.path.join(server.folder, 'home', 'results', 'status')
+    with open(remote_file, 'wb') as fout:
+        fout.write(b'running')
+    gss_ID = 'it4i_barbora://home/results/status'
+    out_filename = os.path.join(work_folder, 'status')
+    in_filename = os.path.join(work_folder, 'input')
+    with open(in_filename, 'wb') as fout:
+        fout.write(os.urandom(1000))
+
+    for reuse in (False, True):
+        gss = cf.GssClient(server.wsdl_url, wsdl_cache=None,
+                           reuse_descriptions=reuse)
+        gss.warm_up()
+        start_time = time.time()
+        for _ in range(n_polls):
+            gss.download_to_file(gss_ID, 'token', out_filename,
+                                 progress=False, connections=1)
+        print("Polling download, reuse={}: {:.1f} ms per poll".format(
+            reuse, (time.time() - start_time) / n_polls * 1000))
+        start_time = time.time()
+        for _ in range(n_polls):
+            gss.update(gss_ID, 'token', in_filename, progress=False,
+                       check=True)
+        print("Repeated update, reuse={}: {:.1f} ms per update".format(
+            reuse, (time.time() - start_time) / n_polls * 1000))
+    print("Description stats: {}".format(gss.description_stats()))
+    assert gss.description_stats()['saved_round_trips'] == 2 * n_polls - 1
+
+    # Expired signatures are refreshed transparently
+    with open(remote_file, 'wb') as fout:
+        fout.write(b'finished')
+    server.expire_signatures()
+    gss.download_to_file(gss_ID, 'token', out_filename, progress=False)
+    assert read(out_filename) == b'finished'
+    assert gss.description_stats()['refreshed'] == 1
+    server.expire_signatures()
+    gss.update(gss_ID, 'token', in_filename, progress=False, check=True)
+    assert read(remote_file) == read(in_filename)
+    assert gss.description_stats()['refreshed'] == 2
+
+    # Deleting and creating a file drops its descriptions
+    gss.delete(gss_ID, 'token')
+    assert not os.path.exists(remote_file)
+    assert gss.upload(gss_ID, 'token', in_filename, progress=False,
+                      check=True) == gss_ID
+    gss.download_to_file(gss_ID, 'token', out_filename, progress=False)
+    assert read(out_filename) == read(in_filename)
+
+    # Listings provide the descriptions for the files they contain
+    other_ID = 'it4i_barbora://home/results/other'
+    gss.upload(other_ID, 'token', in_filename, progress=False, check=True)
+    before = gss.description_stats()['saved_round_trips']
+    for _ in gss.walk('it4i_barbora://home', 'token', minimal=False):
+        pass
+    gss.update(other_ID, 'token', in_filename, progress=False, check=True)
+    assert gss.description_stats()['saved_round_trips'] == before + 1
+    print("Description reuse OK")
+finally:
+    server.stop()
+    shutil.rmtree(work_folder, ignore_errors=True)
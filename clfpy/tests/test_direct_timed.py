@@ -0,0 +1,114 @@
+"""Direct-endpoint transfers against the stand-in GSS with latency
+
+The stand-in's direct interaction endpoint serves the same files as its
+request descriptions. Compares downloads and updates through both paths,
+and checks the fallback to the described URLs when the direct endpoint
+refuses access, while local errors do not turn the direct path off.
+"""
+import os
+import time
+import shutil
+import tempfile
+
+import requests
+
+import clfpy as cf
+from standin_server import StandinServer
+
+MB = 1000 * 1000
+latency = 0.02
+rate = 50 * MB
+n_small = 50
+big_size = 100 * MB
+
+
+def read(filename):
+    with open(filename, 'rb') as in_file:
+        return in_file.read()
+
+
+server = StandinServer(latency=latency, rate=rate).start()
+signed = StandinServer(latency=latency, signed=True).start()
+work_folder = tempfile.mkdtemp(prefix='clfpy_direct_')
+try:
+    for folder in (server.folder, signed.folder):
+        os.makedirs(os.path.join(folder, 'home'))
+        for name in ('small', 'upd'):
+            with open(os.path.join(folder, 'home', name), 'wb') as fout:
+                fout.write(os.urandom(10000))
+    with open(os.path.join(server.folder, 'home', 'big'), 'wb') as fout:
+        fout.write(os.urandom(big_size))
+    out_filename = os.path.join(work_folder, 'out')
+    in_filename = os.path.join(work_folder, 'in')
+    with open(in_filename, 'wb') as fout:
+        fout.write(os.urandom(10000))
+
+    for direct in (False, True):
+        gss = cf.GssClient(server.wsdl_url, wsdl_cache=None, direct=direct)
+        gss.warm_up()
+        for _ in range(n_small):
+            gss.download_to_file('it4i_barbora://home/small', 'token',
+                                 out_filename, progress=False)
+            assert read(out_filename) == read(
+                os.path.join(server.folder, 'home', 'small'))
+            gss.update('it4i_barbora://home/upd', 'token', in_filename,
+                       progress=False, check=True)
+        for connections in (1, 4):
+            gss.download_to_file('it4i_barbora://home/big', 'token',
+                                 out_filename, progress=False,
+                                 connections=connections)
+            assert os.path.getsize(out_filename) == big_size
+        print(gss.throughput.summary())
+    stats = gss.throughput_stats()['it4i_barbora://']
+    assert stats['direct']['transfers'] == 2 * n_small + 2
+    assert 'described' not in stats
+    assert read(os.path.join(server.folder, 'home', 'upd')) == \
+        read(in_filename)
+
+    # Small files: the direct path saves the getResourceInformation call
+    for direct in (False, True):
+        gss = cf.GssClient(server.wsdl_url, wsdl_cache=None, direct=direct)
+        gss.warm_up()
+        gss.download_to_file('it4i_barbora://home/small', 'token',
+                             out_filename, progress=False)
+        start_time = time.time()
+        for _ in range(n_small):
+            gss.download_to_file('it4i_barbora://home/small', 'token',
+                                 out_filename, progress=False)
+        print("Small downloads, direct={}: {:.1f} ms each".format(
+            direct, (time.time() - start_time) / n_small * 1000))
+
+    # Local errors are raised and the direct endpoint stays in use
+    gss = cf.GssClient(server.wsdl_url, wsdl_cache=None, direct=True)
+    try:
+        gss.download_to_file('it4i_barbora://home/small', 'token',
+                             os.path.join(work_folder, 'missing', 'out'),
+                             progress=False)
+        raise AssertionError("Downloads into missing folders fail")
+    except (IOError, OSError) as error:
+        assert not isinstance(error, requests.RequestException)
+    gss.download_to_file('it4i_barbora://home/small', 'token',
+                         out_filename, progress=False)
+    stats = gss.throughput_stats()['it4i_barbora://']
+    assert stats['direct']['transfers'] == 1
+    assert 'described' not in stats
+
+    # A direct endpoint refusing access is given up after the first failure
+    gss = cf.GssClient(signed.wsdl_url, wsdl_cache=None, direct=True)
+    for _ in range(3):
+        gss.download_to_file('it4i_barbora://home/small', 'token',
+                             out_filename, progress=False)
+        assert read(out_filename) == read(
+            os.path.join(signed.folder, 'home', 'small'))
+    gss.update('it4i_barbora://home/small', 'token', in_filename,
+               progress=False, check=True)
+    assert read(os.path.join(signed.folder, 'home', 'small')) == \
+        read(in_filename)
+    stats = gss.throughput_stats()['it4i_barbora://']
+    assert stats['direct'] == dict(stats['direct'], transfers=0, failures=1)
+    assert stats['described']['transfers'] == 4
+    print("Direct transfers OK")
+finally:
+    signed.stop()
+    server.stop()
+    shutil.rmtree(work_folder, ignore_errors=True)
@@ -0,0 +1,130 @@
+"""Local download cache against the stand-in GSS
+
+The stand-in is throttled to 50 MB/s with 20 ms latency per request.
+Compares repeated downloads of the same file with and without a
+clfpy.DownloadCache, and checks hard links and copies, changed remote
+files, LRU eviction and concurrent downloads from several processes.
+"""
+import os
+import time
+import shutil
+import filecmp
+import tempfile
+import multiprocessing
+
+import clfpy as cf
+from standin_server import StandinServer
+
+latency = 0.02
+rate = 50 * 1000 * 1000
+file_size = 50 * 1000 * 1000
+n_repeats = 5
+n_processes = 4
+
+
+def write(filename, n_bytes, mtime=None):
+    with open(filename, 'wb') as fout:
+        fout.write(os.urandom(n_bytes))
+    if mtime is not None:
+        os.utime(filename, (mtime, mtime))
+
+
+def download_in_process(wsdl_url, cache_folder, gss_ID, out_filename,
+                        results):
+    gss = cf.GssClient(wsdl_url, wsdl_cache=None, progress=False,
+                       download_cache=cf.DownloadCache(cache_folder))
+    gss.download_to_file(gss_ID, 'token', out_filename)
+    results.put(gss.download_cache_stats()['misses'])
+
+
+server = StandinServer(latency=latency, rate=rate).start()
+work_folder = tempfile.mkdtemp(prefix='clfpy_dlcache_')
+try:
+    home = os.path.join(server.folder, 'home')
+    os.makedirs(home)
+    remote_file = os.path.join(home, 'mesh.vtk')
+    write(remote_file, file_size, time.time() - 100)
+    gss_ID = 'it4i_barbora://home/mesh.vtk'
+    cache_folder = os.path.join(work_folder, 'cache')
+
+    for cache in (None, cf.DownloadCache(cache_folder)):
+        gss = cf.GssClient(server.wsdl_url, wsdl_cache=None, progress=False,
+                           download_cache=cache)
+        gss.warm_up()
+        start_time = time.time()
+        for i in range(n_repeats):
+            out_filename = os.path.join(work_folder, 'step_{}.vtk'.format(i))
+            assert gss.download_to_file(gss_ID, 'token',
+                                        out_filename) == file_size
+            assert filecmp.cmp(out_filename, remote_file, shallow=False)
+        print("{} downloads, cache={}: {:.2f} s".format(
+            n_repeats, cache is not None, time.time() - start_time))
+    stats = gss.download_cache_stats()
+    print("Cache stats: {}".format(stats))
+    assert stats['hits'] == n_repeats - 1 and stats['misses'] == 1
+    assert stats['bytes_saved'] == (n_repeats - 1) * file_size
+    assert stats['size'] == 1 and stats['bytes'] == file_size
+
+    # Hits are read-only hard links to the entry, or copies
+    entry = gss.download_cache.path(gss.download_cache.key(
+        gss_ID, file_size, int(os.path.getmtime(remote_file))))
+    assert os.stat(out_filename).st_ino == os.stat(entry).st_ino
+    assert not os.access(entry, os.W_OK) or os.getuid() == 0
+    copying = cf.GssClient(server.wsdl_url, wsdl_cache=None, progress=False,
+                           download_cache=cf.DownloadCache(cache_folder,
+                                                           link=False))
+    copy = os.path.join(work_folder, 'copy.vtk')
+    copying.download_to_file(gss_ID, 'token', copy)
+    assert os.stat(copy).st_ino != os.stat(entry).st_ino
+    assert filecmp.cmp(copy, remote_file, shallow=False)
+    assert copying.download_cache_stats()['hits'] == 1
+
+    # A changed remote file is downloaded again
+    write(remote_file, 1000)
+    changed = os.path.join(work_folder, 'changed.vtk')
+    gss.download_to_file(gss_ID, 'token', changed)
+    assert filecmp.cmp(changed, remote_file, shallow=False)
+    assert gss.download_cache_stats()['misses'] == 2
+
+    # Least recently used entries are evicted beyond max_size
+    small = cf.DownloadCache(os.path.join(work_folder, 'small'),
+                             max_size=2500)
+    gss = cf.GssClient(server.wsdl_url, wsdl_cache=None, progress=False,
+                       download_cache=small)
+    for name in ('a', 'b', 'c'):
+        write(os.path.join(home, name), 1000)
+    out_filename = os.path.join(work_folder, 'small_out')
+    for name in ('a', 'b', 'a', 'c', 'a'):
+        time.sleep(0.01)
+        gss.download_to_file('it4i_barbora://home/' + name, 'token',
+                             out_filename)
+    stats = small.stats()
+    print("Small cache stats: {}".format(stats))
+    assert stats['evictions'] == 1 and stats['size'] == 2
+    assert stats['hits'] == 2 and stats['misses'] == 3
+
+    # Concurrent processes download the file once
+    write(remote_file, file_size, time.time() - 50)
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(
+        target=download_in_process,
+        args=(server.wsdl_url, cache_folder, gss_ID,
+              os.path.join(work_folder, 'process_{}'.format(i)), results))
+        for i in range(n_processes)]
+    start_time = time.time()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    misses = [results.get() for _ in processes]
+    print("{} processes: {:.2f} s, {} download(s)".format(
+        n_processes, time.time() - start_time, sum(misses)))
+    assert sum(misses) == 1
+    for i in range(n_processes):
+        assert filecmp.cmp(os.path.join(work_folder, 'process_{}'.format(i)),
+                           remote_file, shallow=False)
+    assert not os.listdir(os.path.join(cache_folder, 'tmp'))
+    print("Download cache OK")
+finally:
+    server.stop()
+    shutil.rmtree(work_folder, ignore_errors=True)
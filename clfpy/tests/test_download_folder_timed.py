@@ -0,0 +1,109 @@
+"""Folder download against the stand-in GSS with simulated latency
+
+Compares a sequential download (one getResourceInformation call and one
+download per file, as download_folder() used to work) with the concurrent
+download_folder(), and checks the downloaded tree. Checks that incomplete
+downloads are retried and local errors are not.
+"""
+import os
+import time
+import shutil
+import filecmp
+import tempfile
+
+import clfpy as cf
+from standin_server import StandinServer
+
+latency = 0.02
+n_folders = 5
+n_files = 100
+
+
+def sequential_download(gss, gss_tree, local_root):
+    folders = [gss_tree]
+    while folders:
+        folder = folders.pop(0)
+        local_folder = os.path.join(local_root, folder[len(gss_tree):]
+                                    .strip('/'))
+        os.makedirs(local_folder)
+        for entry in gss.list_files_minimal(folder, 'token'):
+            if 'FOLDER' in entry['type']:
+                folders.append(entry['uniqueName'])
+            else:
+                gss.download_to_file(
+                    entry['uniqueName'], 'token',
+                    os.path.join(local_folder, entry['visualName']),
+                    progress=False, connections=1)
+
+
+server = StandinServer(latency=latency).start()
+out_folder = tempfile.mkdtemp(prefix='clfpy_dl_')
+try:
+    tree = os.path.join(server.folder, 'home', 'results')
+    for i in range(n_folders):
+        folder = os.path.join(tree, 'case_{}'.format(i))
+        os.makedirs(os.path.join(folder, 'empty'))
+        for j in range(n_files):
+            with open(os.path.join(folder, 'f{}.dat'.format(j)), 'wb') as f:
+                f.write(os.urandom(10000))
+    gss = cf.GssClient(server.wsdl_url, wsdl_cache=None)
+    gss_tree = 'it4i_barbora://home/results'
+
+    start_time = time.time()
+    sequential_download(gss, gss_tree, os.path.join(out_folder, 'seq'))
+    print("Sequential: {:.2f} s".format(time.time() - start_time))
+
+    for workers in (1, 8, 32):
+        shutil.rmtree(os.path.join(out_folder, 'results'), ignore_errors=True)
+        summary = gss.download_folder(gss_tree, 'token', out_folder,
+                                      max_workers=workers, verbose=False)
+        print("download_folder, {} workers: {}".format(workers, summary))
+        assert summary.files == n_folders * n_files and not summary.failed
+
+    comparison = filecmp.dircmp(tree, os.path.join(out_folder, 'results'))
+    assert not comparison.left_only and not comparison.right_only
+    for i in range(n_folders):
+        case = 'case_{}'.format(i)
+        _, mismatch, errors = filecmp.cmpfiles(
+            os.path.join(tree, case), os.path.join(out_folder, 'results', case),
+            ['f{}.dat'.format(j) for j in range(n_files)], shallow=False)
+        assert not mismatch and not errors
+        assert os.path.isdir(os.path.join(out_folder, 'results', case,
+                                          'empty'))
+
+    # An existing folder is only accepted when resuming
+    assert gss.download_folder(gss_tree, 'token', out_folder,
+                               verbose=False) is None
+    os.remove(os.path.join(out_folder, 'results', 'case_0', 'f0.dat'))
+    summary = gss.download_folder(gss_tree, 'token', out_folder,
+                                  resume=True, verbose=False)
+    assert summary.files == 1 and summary.skipped == n_folders * n_files - 1
+
+    # Incomplete downloads are retried, local errors raised at once
+    gss_ID = gss_tree + '/case_0/f0.dat'
+    retried = []
+    gss.invalidate_cache = retried.append
+    download_desc = gss._download_desc
+
+    def cut_short(*args, **kwargs):
+        if not retried:
+            raise cf.transfer.TransferError("Incomplete download")
+        return download_desc(*args, **kwargs)
+    gss._download_desc = cut_short
+    out_filename = os.path.join(out_folder, 'retried.dat')
+    assert gss._download_with_retries(gss_ID, 'token', None,
+                                      out_filename) == 10000
+    assert retried == [gss_ID]
+    del retried[:]
+    del gss._download_desc
+    try:
+        gss._download_with_retries(gss_ID, 'token', None, os.path.join(
+            out_folder, 'missing', 'f0.dat'))
+        raise AssertionError("Local errors are raised")
+    except OSError as error:
+        assert not isinstance(error, cf.transfer.TransferError)
+    assert not retried
+    print("Folder download OK")
+finally:
+    server.stop()
+    shutil.rmtree(out_folder, ignore_errors=True)
@@ -0,0 +1,78 @@
+"""Download throughput of GssClient.download_to_file() against the stand-in
+
+Compares the old 256 byte iter_content() loop with the block copy engine for
+files from 1 MB to 1 GB; set CLFPY_BENCH_5GB=1 to include a 5 GB file. The
+stand-in GSS runs in a separate process.
+"""
+import os
+import sys
+import time
+import shutil
+import socket
+import tempfile
+import subprocess
+
+import requests
+
+import clfpy as cf
+
+MB = 1000 * 1000
+sizes = [1 * MB, 10 * MB, 100 * MB, 1000 * MB]
+if os.environ.get('CLFPY_BENCH_5GB') == '1':
+    sizes.append(5000 * MB)
+# The old loop is too slow for larger files
+max_old_size = 100 * MB
+
+
+def old_download(url, out_filename):
+    response = requests.get(url, stream=True)
+    with open(out_filename, 'wb') as out_file:
+        for chunk in response.iter_content(chunk_size=256):
+            out_file.write(chunk)
+
+
+folder = tempfile.mkdtemp(prefix='clfpy_standin_')
+os.makedirs(os.path.join(folder, 'home'))
+block = os.urandom(MB)
+for size in sizes:
+    with open(os.path.join(folder, 'home', str(size)), 'wb') as fout:
+        for _ in range(size // MB):
+            fout.write(block)
+
+sock = socket.socket()
+sock.bind(('127.0.0.1', 0))
+port = sock.getsockname()[1]
+sock.close()
+server = subprocess.Popen(
+    [sys.executable, os.path.join(os.path.dirname(__file__),
+                                  'standin_server.py'), str(port), folder],
+    stdout=subprocess.PIPE)
+server.stdout.readline()
+
+out_filename = os.path.join(tempfile.mkdtemp(prefix='clfpy_dl_'), 'out')
+try:
+    gss = cf.GssClient("http://127.0.0.1:{}/FileUtilities?wsdl".format(port),
+                       wsdl_cache=None)
+    gss.warm_up()
+    for size in sizes:
+        gss_ID = 'it4i_barbora://home/{}'.format(size)
+        url = gss.get_resource_information(gss_ID,
+                                           'token').readDescription.url
+        runs = [('download_to_file', lambda: gss.download_to_file(
+            gss_ID, 'token', out_filename, progress=False))]
+        if size <= max_old_size:
+            runs.insert(0, ('256 B chunks', lambda: old_download(
+                url, out_filename)))
+        for name, run in runs:
+            start_time = time.time()
+            start_cpu = time.process_time()
+            run()
+            elapsed = time.time() - start_time
+            cpu = time.process_time() - start_cpu
+            assert os.path.getsize(out_filename) == size
+            print("{:>5} MB {:<18} {:8.1f} MB/s, client CPU {:.2f} s".format(
+                size // MB, name, size / MB / elapsed, cpu))
+finally:
+    server.terminate()
+    shutil.rmtree(folder, ignore_errors=True)
+    shutil.rmtree(os.path.dirname(out_filename), ignore_errors=True)
@@ -0,0 +1,76 @@
+"""Micro-benchmark of the fast SOAP path against suds
+
+Measures the client-side CPU time per call (envelope building plus reply
+parsing) for replies captured from the stand-in GSS, and the wall-clock time
+of complete calls.
+"""
+import os
+import time
+
+import clfpy as cf
+from standin_server import StandinServer
+
+n_entries = 1000
+repetitions = 200
+
+
+def cpu_per_call(build, parse, reply, n):
+    start_time = time.process_time()
+    for _ in range(n):
+        build()
+        parse(reply)
+    return (time.process_time() - start_time) / n * 1000
+
+
+server = StandinServer().start()
+try:
+    os.makedirs(os.path.join(server.folder, 'home'))
+    for i in range(n_entries):
+        with open(os.path.join(server.folder, 'home', str(i)), 'w') as fout:
+            fout.write('x')
+    file_ID = 'it4i_barbora://home/0'
+    folder_ID = 'it4i_barbora://home'
+
+    gss = cf.GssClient(server.wsdl_url, wsdl_cache=None)
+    fast_gss = cf.GssClient(server.wsdl_url, wsdl_cache=None, fast_path=True)
+    engine = fast_gss.fast_engine
+    nosend = gss._get_nosend_client()
+
+    # Results must be equivalent
+    slow_info = gss.get_resource_information(file_ID, 'token')
+    fast_info = fast_gss.get_resource_information(file_ID, 'token')
+    assert fast_info.readDescription.url == slow_info.readDescription.url
+    assert [h.key for h in fast_info.readDescription.headers] == \
+        [h.key for h in slow_info.readDescription.headers]
+    assert [c['uniqueName'] for c in
+            fast_gss.list_files_minimal(folder_ID, 'token')] == \
+        [c['uniqueName'] for c in gss.list_files_minimal(folder_ID, 'token')]
+
+    for methodname, gss_ID, n in [('getResourceInformation', file_ID,
+                                   repetitions),
+                                  ('listFilesMinimal', folder_ID, 20)]:
+        args = [gss_ID, 'token']
+        reply = engine.post(methodname, args).content
+        method = getattr(nosend.service, methodname)
+        suds_ms = cpu_per_call(lambda: method(*args),
+                               lambda r: method(*args).process_reply(r),
+                               reply, n)
+        fast_ms = cpu_per_call(lambda: engine.envelope(methodname, args),
+                               lambda r: engine.parse(methodname, r),
+                               reply, n)
+        print("{} ({} bytes reply), CPU per call: suds {:.2f} ms, "
+              "fast {:.2f} ms ({:.1f}x)".format(methodname, len(reply),
+                                                suds_ms, fast_ms,
+                                                suds_ms / fast_ms))
+
+    for name, client in [('suds', gss), ('fast', fast_gss)]:
+        start_time = time.time()
+        for _ in range(repetitions):
+            client.get_resource_information(file_ID, 'token')
+        print("getResourceInformation wall clock, {}: {:.2f} ms per call"
+              .format(name, (time.time() - start_time) / repetitions * 1000))
+
+    fault = fast_gss.get_resource_information('bogus://x', 'token')
+    print("Fault handled by suds: {}".format(repr(fault)))
+finally:
+    server.stop()
@@ -0,0 +1,101 @@
+"""Resource information and listing cache against the stand-in GSS
+
+Replays the queries of a typical CLI command sequence with and without the
+cache, and checks that create_folder, upload, update, delete and
+delete_folder invalidate the affected entries.
+"""
+import os
+import time
+import shutil
+import tempfile
+
+import clfpy as cf
+from standin_server import StandinServer
+
+latency = 0.02
+
+
+def soap_calls(gss):
+    return sum(method['calls']
+               for method in gss.stats()['methods'].values())
+
+
+def session(gss, folder):
+    """Queries of `cd`, `ls`, `mkdir`, `ul` and `dl` on one folder"""
+    for _ in range(3):
+        gss.get_resource_information(folder, 'token')
+        gss.contains_file(folder, 'token')
+        gss.list_files_minimal(folder, 'token')
+        for name in ('a', 'b', 'c'):
+            gss.contains_file(folder + '/' + name, 'token')
+            gss.get_resource_information(folder + '/' + name, 'token')
+
+
+def is_file(gss, gss_ID):
+    return gss.get_resource_information(gss_ID, 'token').type == 'FILE'
+
+
+def names(gss, folder):
+    return sorted(entry['visualName']
+                  for entry in gss.list_files_minimal(folder, 'token'))
+
+
+server = StandinServer(latency=latency).start()
+local_folder = tempfile.mkdtemp(prefix='clfpy_cache_')
+try:
+    os.makedirs(os.path.join(server.folder, 'home', 'work'))
+    for name in ('a', 'b', 'c'):
+        with open(os.path.join(server.folder, 'home', 'work', name), 'w') as f:
+            f.write(name)
+    local_file = os.path.join(local_folder, 'local')
+    with open(local_file, 'w') as fout:
+        fout.write('content')
+
+    for cache in (False, True):
+        gss = cf.GssClient(server.wsdl_url, wsdl_cache=None, cache=cache,
+                           instrumentation=cf.Instrumentation())
+        gss.warm_up()
+        start_time = time.time()
+        session(gss, 'it4i_barbora://home/work')
+        print("cache={}: {} SOAP calls in {:.2f} s, cache stats {}".format(
+            cache, soap_calls(gss), time.time() - start_time,
+            gss.cache_stats()))
+    assert gss.cache_stats()['hit_rate'] > 0.6
+
+    folder = 'it4i_barbora://home/work'
+    new_file = folder + '/new'
+    assert not is_file(gss, new_file)
+    assert names(gss, folder) == ['a', 'b', 'c']
+    assert not gss.contains_file(new_file, 'token')
+
+    # upload invalidates the file and its parent listing
+    gss.upload(new_file, 'token', local_file, progress=False)
+    assert is_file(gss, new_file)
+    assert gss.contains_file(new_file, 'token')
+    assert names(gss, folder) == ['a', 'b', 'c', 'new']
+
+    # delete as well
+    gss.delete(new_file, 'token')
+    assert not gss.contains_file(new_file, 'token')
+    assert names(gss, folder) == ['a', 'b', 'c']
+
+    # create_folder and a recursive delete_folder
+    sub = folder + '/sub'
+    gss.create_folder(sub, 'token')
+    assert names(gss, folder) == ['a', 'b', 'c', 'sub']
+    gss.upload(sub + '/x', 'token', local_file, progress=False)
+    assert names(gss, sub) == ['x']
+    assert gss.contains_file(sub + '/x', 'token')
+    gss.delete_folder(sub, 'token')
+    assert names(gss, folder) == ['a', 'b', 'c']
+    assert not gss.contains_file(sub + '/x', 'token')
+
+    # Changes by other clients show up after invalidate_cache()
+    os.remove(os.path.join(server.folder, 'home', 'work', 'c'))
+    assert names(gss, folder) == ['a', 'b', 'c']
+    gss.invalidate_cache()
+    assert names(gss, folder) == ['a', 'b']
+    print("Cache invalidation OK")
+finally:
+    server.stop()
+    shutil.rmtree(local_folder, ignore_errors=True)
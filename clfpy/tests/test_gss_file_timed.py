@@ -0,0 +1,157 @@
+"""Random access to GSS files with GssClient.open() against the stand-in
+
+The stand-in is throttled to 50 MB/s with 20 ms latency per request.
+Compares full downloads with partial reads through a GssFile: the header
+and tail of a large file, listing a tar archive and extracting one member
+of a zip archive. Also checks random reads against the local copy, the
+effect of read-ahead on sequential reads, storage endpoints without Range
+support and expired signatures.
+"""
+import io
+import os
+import time
+import random
+import shutil
+import tarfile
+import zipfile
+import tempfile
+
+import clfpy as cf
+from standin_server import StandinServer
+
+latency = 0.02
+rate = 50 * 1000 * 1000
+n_members = 20
+member_size = 5 * 1000 * 1000
+
+
+def timed(label, func):
+    start_time = time.time()
+    result = func()
+    print("{}: {:.3f} s".format(label, time.time() - start_time))
+    return result
+
+
+def read(filename):
+    with open(filename, 'rb') as in_file:
+        return in_file.read()
+
+
+server = StandinServer(latency=latency, rate=rate, signed=True).start()
+work_folder = tempfile.mkdtemp(prefix='clfpy_gssfile_')
+try:
+    home = os.path.join(server.folder, 'home')
+    os.makedirs(home)
+    member = os.path.join(work_folder, 'member')
+    with tarfile.open(os.path.join(home, 'results.tar'), 'w') as archive, \
+            zipfile.ZipFile(os.path.join(home, 'results.zip'), 'w') as zipped:
+        for i in range(n_members):
+            with open(member, 'wb') as fout:
+                fout.write(os.urandom(member_size))
+            archive.add(member, 'step_{}.vtk'.format(i))
+            zipped.write(member, 'step_{}.vtk'.format(i))
+    expected_zip_member = read(member)
+    tar_file = os.path.join(home, 'results.tar')
+    tar_content = read(tar_file)
+    with open(os.path.join(home, 'log.txt'), 'w') as fout:
+        for i in range(10000):
+            fout.write("iteration {} residual {:.6e}\n".format(i, 0.5 ** i))
+
+    gss = cf.GssClient(server.wsdl_url, wsdl_cache=None, progress=False,
+                       reuse_descriptions=True)
+    gss.warm_up()
+    tar_ID = 'it4i_barbora://home/results.tar'
+    out_filename = os.path.join(work_folder, 'download')
+
+    # Full downloads, as needed before
+    timed("Full download of {:.0f} MB".format(len(tar_content) / 1e6),
+          lambda: gss.download_to_file(tar_ID, 'token', out_filename))
+
+    def header():
+        with gss.open(tar_ID, 'token') as gss_file:
+            return gss_file.read(512)
+    assert timed("Header (512 bytes) via GssFile", header) == \
+        tar_content[:512]
+
+    def tail():
+        with gss.open(tar_ID, 'token') as gss_file:
+            gss_file.seek(-1000 * 1000, io.SEEK_END)
+            return gss_file.read()
+    assert timed("Last MB via GssFile", tail) == tar_content[-1000 * 1000:]
+
+    def list_tar():
+        with gss.open(tar_ID, 'token') as gss_file:
+            with tarfile.open(fileobj=gss_file, mode='r:') as archive:
+                names = archive.getnames()
+            return names, gss_file.stats()
+    names, stats = timed("Listing the tar archive via GssFile", list_tar)
+    assert len(names) == n_members
+    print("  {} requests, {:.1f} MB fetched".format(
+        stats['requests'], stats['bytes_fetched'] / 1e6))
+
+    def zip_member():
+        with gss.open('it4i_barbora://home/results.zip', 'token') as gss_file:
+            with zipfile.ZipFile(gss_file) as zipped:
+                return zipped.read('step_{}.vtk'.format(n_members - 1))
+    assert timed("Last zip member via GssFile", zip_member) == \
+        expected_zip_member
+
+    def log_tail():
+        with gss.open('it4i_barbora://home/log.txt', 'token') as gss_file:
+            gss_file.seek(-200, io.SEEK_END)
+            gss_file.readline()
+            return gss_file.readlines()
+    assert timed("Log tail via readline()", log_tail)[-1] == \
+        b"iteration 9999 residual 0.000000e+00\n"
+
+    # Sequential reads with and without read-ahead
+    for read_ahead in (0, 4, 16):
+        def sequential():
+            with gss.open(tar_ID, 'token', read_ahead=read_ahead) as gss_file:
+                while gss_file.read(64 * 1024):
+                    pass
+                return gss_file.stats()
+        stats = timed("Sequential read, read_ahead={}".format(read_ahead),
+                      sequential)
+        print("  {} requests".format(stats['requests']))
+
+    # Random reads match the file
+    rng = random.Random(42)
+    with gss.open(tar_ID, 'token', cache_blocks=8) as gss_file:
+        assert gss_file.size == len(tar_content)
+        for _ in range(300):
+            offset = rng.randrange(len(tar_content))
+            size = rng.choice((1, 100, 300 * 1000, 2 * 1000 * 1000))
+            gss_file.seek(offset)
+            assert gss_file.read(size) == tar_content[offset:offset + size]
+            assert gss_file.tell() == min(offset + size, len(tar_content))
+        buf = bytearray(10)
+        gss_file.seek(5)
+        assert gss_file.readinto(buf) == 10
+        assert bytes(buf) == tar_content[5:15]
+        gss_file.seek(len(tar_content) + 10)
+        assert gss_file.read(10) == b''
+        stats = gss_file.stats()
+        print("Random reads: {}".format(stats))
+        assert stats['size'] <= 8 and stats['evictions'] > 0
+
+        # Expired signatures are refreshed
+        server.expire_signatures()
+        gss_file.seek(len(tar_content) // 2)
+        assert gss_file.read(100) == \
+            tar_content[len(tar_content) // 2:len(tar_content) // 2 + 100]
+
+    # Empty files and storage endpoints without Range support
+    open(os.path.join(home, 'empty'), 'w').close()
+    with gss.open('it4i_barbora://home/empty', 'token') as gss_file:
+        assert gss_file.size == 0 and gss_file.read() == b''
+    server.httpd.ranges = False
+    with gss.open(tar_ID, 'token') as gss_file:
+        gss_file.seek(3 * member_size)
+        assert gss_file.read(1000) == \
+            tar_content[3 * member_size:3 * member_size + 1000]
+        assert not gss_file.ranges_supported
+    print("GssFile OK")
+finally:
+    server.stop()
+    shutil.rmtree(work_folder, ignore_errors=True)
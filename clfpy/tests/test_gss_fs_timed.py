@@ -0,0 +1,242 @@
+"""fsspec file system for GSS against the stand-in (Python 3, needs fsspec)
+
+The stand-in is throttled to 50 MB/s with 20 ms latency per request.
+Compares reading and downloading many files one by one with the concurrent
+cat() and get() of clfpy.gss_fs.GssFileSystem, and uploading a folder with
+put(). Also checks ls/info/find/glob with the listings cache, random reads
+through open(), writes, pipe_file(), rm(), progress callbacks and access
+through fsspec URLs.
+"""
+import os
+import time
+import shutil
+import filecmp
+import tempfile
+
+import fsspec
+from fsspec.callbacks import Callback
+
+import clfpy as cf
+from clfpy.gss_fs import GssFileSystem
+from standin_server import StandinServer
+
+latency = 0.02
+rate = 50 * 1000 * 1000
+n_files = 40
+file_size = 1000 * 1000
+
+
+def timed(label, func):
+    start_time = time.time()
+    result = func()
+    print("{}: {:.3f} s".format(label, time.time() - start_time))
+    return result
+
+
+class Recorder(Callback):
+    """Records the sizes and updates, and those of its branches"""
+
+    def __init__(self):
+        super().__init__()
+        self.sizes = []
+        self.children = []
+
+    def set_size(self, size):
+        self.sizes.append(size)
+        super().set_size(size)
+
+    def branched(self, path_1, path_2, **kwargs):
+        child = Recorder()
+        self.children.append(child)
+        return child
+
+
+def read(filename):
+    with open(filename, 'rb') as in_file:
+        return in_file.read()
+
+
+server = StandinServer(latency=latency, rate=rate).start()
+work_folder = tempfile.mkdtemp(prefix='clfpy_gssfs_')
+try:
+    results = os.path.join(server.folder, 'home', 'results')
+    os.makedirs(os.path.join(results, 'logs'))
+    for i in range(n_files):
+        with open(os.path.join(results, 'step_{:02d}.vtk'.format(i)),
+                  'wb') as fout:
+            fout.write(os.urandom(file_size))
+    with open(os.path.join(results, 'logs', 'solver.log'), 'w') as fout:
+        fout.write("".join("iteration {}\n".format(i) for i in range(1000)))
+    root = 'it4i_barbora://home/results'
+
+    gss = cf.GssClient(server.wsdl_url, wsdl_cache=None, progress=False)
+    gss.warm_up()
+    fs = GssFileSystem('token', gss=gss, skip_instance_cache=True)
+    paths = ['{}/step_{:02d}.vtk'.format(root, i) for i in range(n_files)]
+
+    # Listings, with the listings cache
+    listing = timed("ls", lambda: fs.ls(root, detail=False))
+    assert sorted(listing) == sorted(paths + [root + '/logs'])
+    timed("ls, cached", lambda: fs.ls(root))
+    assert fs.isdir(root + '/logs') and fs.isfile(paths[0])
+    assert not fs.exists(root + '/missing')
+    info = fs.info(paths[0])
+    assert info['type'] == 'file' and info['size'] == file_size
+    assert fs.size(paths[0]) == file_size
+    assert fs.modified(paths[0]).timestamp() > time.time() - 3600
+    assert fs.ls(paths[0]) == [info]
+    found = timed("find", lambda: fs.find('it4i_barbora://home'))
+    assert found == sorted(paths + [root + '/logs/solver.log'])
+    assert fs.glob(root + '/step_1*.vtk') == paths[10:20]
+    assert fs.glob('home/results/logs/*') == [root + '/logs/solver.log']
+    try:
+        fs.info(root + '/missing')
+        raise AssertionError("Missing files have no info")
+    except FileNotFoundError:
+        pass
+
+    # Reading many files
+    expected = {path: read(os.path.join(results, path.rsplit('/', 1)[1]))
+                for path in paths}
+    contents = timed("{} x cat_file()".format(n_files),
+                     lambda: {path: fs.cat_file(path) for path in paths})
+    assert contents == expected
+    contents = timed("cat() of {} files".format(n_files),
+                     lambda: fs.cat(root + '/*.vtk'))
+    assert contents == expected
+    assert fs.cat(paths[:2] + [root + '/missing'], on_error='omit') == \
+        {path: expected[path] for path in paths[:2]}
+    ranges = fs.cat_ranges(paths, 1000, 2000)
+    assert ranges == [expected[path][1000:2000] for path in paths]
+    assert fs.cat_file(paths[0], -100) == expected[paths[0]][-100:]
+    assert fs.cat_file(paths[0], 10, -10) == expected[paths[0]][10:-10]
+    assert fs.read_block(paths[0], 500, 100) == expected[paths[0]][500:600]
+
+    # Random access and text mode
+    with fs.open(paths[3], 'rb') as gss_file:
+        gss_file.seek(-1000, os.SEEK_END)
+        assert gss_file.read() == expected[paths[3]][-1000:]
+        assert gss_file.stats()['bytes_fetched'] < file_size
+    with fs.open(root + '/logs/solver.log', 'r') as text:
+        assert text.readlines()[-1] == "iteration 999\n"
+
+    # Downloading many files
+    def one_by_one():
+        for path in paths:
+            gss.download_to_file(path, 'token', os.path.join(
+                work_folder, 'single', path.rsplit('/', 1)[1]),
+                progress=False)
+    os.makedirs(os.path.join(work_folder, 'single'))
+    timed("{} x download_to_file()".format(n_files), one_by_one)
+    local = os.path.join(work_folder, 'local')
+    timed("get() of {} files".format(n_files),
+          lambda: fs.get(root, local, recursive=True))
+    for path in paths + [root + '/logs/solver.log']:
+        rel_path = path[len(root) + 1:]
+        assert filecmp.cmp(os.path.join(local, rel_path),
+                           os.path.join(results, rel_path), shallow=False)
+
+    # Progress callbacks
+    recorder = Recorder()
+    fs.get_file(paths[0], os.path.join(work_folder, 'cb.vtk'),
+                callback=recorder)
+    assert recorder.sizes == [file_size] and recorder.value == file_size
+    recorder = Recorder()
+    with open(os.path.join(work_folder, 'cb_stream.vtk'), 'wb') as fout:
+        fs.get_file(paths[0], fout, callback=recorder)
+    assert recorder.sizes == [file_size] and recorder.value == file_size
+    recorder = Recorder()
+    fs.put_file(os.path.join(local, 'step_00.vtk'),
+                'it4i_barbora://home/cb/step_00.vtk', callback=recorder)
+    assert recorder.sizes == [file_size] and recorder.value == file_size
+    recorder = Recorder()
+    fs.get(paths[:5], [os.path.join(work_folder, 'cb', path.rsplit('/')[-1])
+                       for path in paths[:5]], callback=recorder)
+    assert recorder.sizes == [5] and recorder.value == 5
+    assert [child.value for child in recorder.children] == [file_size] * 5
+    recorder = Recorder()
+    fs.put(os.path.join(work_folder, 'cb'), 'it4i_barbora://home/cb2',
+           recursive=True, callback=recorder)
+    assert recorder.sizes == [5] and recorder.value == 5
+    assert [child.value for child in recorder.children] == [file_size] * 5
+    fs.rm(['it4i_barbora://home/cb', 'it4i_barbora://home/cb2'],
+          recursive=True)
+
+    # Uploading many files
+    def upload_one_by_one():
+        gss.create_folder('it4i_barbora://home/single', 'token')
+        for path in paths:
+            name = path.rsplit('/', 1)[1]
+            gss.upload('it4i_barbora://home/single/' + name, 'token',
+                       os.path.join(local, name), progress=False)
+    timed("{} x upload()".format(n_files), upload_one_by_one)
+    timed("put() of {} files".format(n_files),
+          lambda: fs.put(local, 'it4i_barbora://home/copy', recursive=True))
+    copied = fs.find('it4i_barbora://home/copy')
+    assert len(copied) == n_files + 1
+    for path in copied:
+        rel_path = path[len('it4i_barbora://home/copy/'):]
+        assert filecmp.cmp(os.path.join(local, rel_path),
+                           os.path.join(server.folder, 'home', 'copy',
+                                        rel_path), shallow=False)
+    fs.put(os.path.join(local, 'step_00.vtk'), 'it4i_barbora://home/copy/')
+    assert fs.cat_file('it4i_barbora://home/copy/step_00.vtk') == \
+        expected[paths[0]]
+
+    # Writing, replacing and removing files
+    fs.pipe_file('it4i_barbora://home/new/a.txt', b'first')
+    assert fs.ls('it4i_barbora://home/new', detail=False) == \
+        ['it4i_barbora://home/new/a.txt']
+    fs.pipe('it4i_barbora://home/new/a.txt', b'second')
+    assert fs.cat('it4i_barbora://home/new/a.txt') == b'second'
+    with fs.open('it4i_barbora://home/new/big.bin', 'wb') as fout:
+        for path in paths[:5]:
+            fout.write(expected[path])
+    assert fs.cat_file('it4i_barbora://home/new/big.bin') == \
+        b''.join(expected[path] for path in paths[:5])
+    assert fs.info('it4i_barbora://home/new/big.bin')['size'] == \
+        5 * file_size
+    try:
+        with fs.open('it4i_barbora://home/new/broken.bin', 'wb') as fout:
+            fout.write(b'x' * 3 * 1000 * 1000)
+            raise KeyError("writer failed")
+    except KeyError:
+        pass
+    assert not fs.exists('it4i_barbora://home/new/broken.bin')
+    try:
+        fs.open('it4i_barbora://home/new/a.txt', 'xb')
+        raise AssertionError("Exclusive creation of an existing file")
+    except FileExistsError:
+        pass
+    fs.rm('it4i_barbora://home/new/a.txt')
+    assert not fs.exists('it4i_barbora://home/new/a.txt')
+    try:
+        fs.rm('it4i_barbora://home/copy')
+        raise AssertionError("Folders are only removed recursively")
+    except IsADirectoryError:
+        pass
+    timed("rm() of {} files".format(n_files),
+          lambda: fs.rm('it4i_barbora://home/copy/*.vtk'))
+    assert fs.ls('it4i_barbora://home/copy', detail=False) == \
+        ['it4i_barbora://home/copy/logs']
+    fs.rm('it4i_barbora://home/copy', recursive=True)
+    assert not os.path.exists(os.path.join(server.folder, 'home', 'copy'))
+    fs.mkdir('it4i_barbora://home/a/b/c')
+    assert fs.isdir('it4i_barbora://home/a/b/c')
+    fs.rmdir('it4i_barbora://home/a/b/c')
+    assert fs.ls('it4i_barbora://home/a/b') == []
+
+    # fsspec URLs
+    fsspec.register_implementation('it4i_barbora', GssFileSystem,
+                                   clobber=True)
+    options = {'session_token': 'token', 'gss': gss}
+    with fsspec.open(paths[1], 'rb', **options) as gss_file:
+        assert gss_file.read(100) == expected[paths[1]][:100]
+    files = fsspec.open_files(root + '/step_0*.vtk', **options)
+    assert len(files) == 10
+    mapper = fsspec.get_mapper(root, **options)
+    assert mapper['logs/solver.log'].startswith(b'iteration 0\n')
+    print("GSS file system OK")
+finally:
+    server.stop()
+    shutil.rmtree(work_folder, ignore_errors=True)
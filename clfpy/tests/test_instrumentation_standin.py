@@ -0,0 +1,72 @@
+"""Checks the call instrumentation against the stand-in GSS
+
+Runs synchronous, fast-path, streaming and async calls, prints the resulting
+summary table and the per-call overhead of the instrumentation.
+"""
+import os
+import sys
+import time
+
+import clfpy as cf
+from standin_server import StandinServer
+
+repetitions = 300
+
+server = StandinServer().start()
+try:
+    os.makedirs(os.path.join(server.folder, 'home'))
+    for i in range(50):
+        with open(os.path.join(server.folder, 'home', str(i)), 'w') as fout:
+            fout.write('x')
+    file_ID = 'it4i_barbora://home/0'
+    folder_ID = 'it4i_barbora://home'
+
+    events = []
+    instr = cf.Instrumentation()
+    instr.add_hook(events.append)
+
+    gss = cf.GssClient(server.wsdl_url, wsdl_cache=None,
+                       instrumentation=instr)
+    fast_gss = cf.GssClient(server.wsdl_url, wsdl_cache=None, fast_path=True,
+                            instrumentation=instr)
+    for _ in range(10):
+        gss.get_resource_information(file_ID, 'token')
+        fast_gss.get_resource_information(file_ID, 'token')
+    gss.list_files(folder_ID, 'token')
+    fault = gss.get_resource_information('invalid', 'token')
+    assert isinstance(fault, Exception)
+    assert len(list(gss.iter_files_minimal(folder_ID, 'token'))) == 50
+    if sys.version_info >= (3, 5):
+        import asyncio
+        asyncio.get_event_loop().run_until_complete(
+            gss.get_resource_information_async(file_ID, 'token'))
+
+    stats = gss.stats()
+    info = stats['methods']['GssClient.getResourceInformation']
+    print(instr.summary())
+    print("WSDL loads: {}".format(stats['wsdl_loads']))
+    expected_calls = 21 + (1 if sys.version_info >= (3, 5) else 0)
+    assert info['calls'] == expected_calls, info
+    assert sum(info['faults'].values()) == 1, info['faults']
+    assert info['request_bytes'] > 0 and info['response_bytes'] > 0
+    assert info['p50_s'] <= info['p95_s'] <= info['p99_s'] <= info['max_s']
+    assert stats['methods']['GssClient.listFilesMinimal']['calls'] == 1
+    assert stats['wsdl_loads'][server.wsdl_url]['count'] >= 1
+    assert any(e['type'] == 'wsdl_load' for e in events)
+    assert len([e for e in events if e['type'] == 'call']) == \
+        sum(s['calls'] for s in instr.stats()['methods'].values())
+
+    # Overhead of the instrumentation per call
+    plain = cf.GssClient(server.wsdl_url, wsdl_cache=None,
+                         instrumentation=None)
+    plain.get_resource_information(file_ID, 'token')
+    assert plain.stats() is None
+    for client, label in [(plain, 'off'), (gss, 'on')]:
+        start_time = time.process_time()
+        for _ in range(repetitions):
+            client.get_resource_information(file_ID, 'token')
+        cpu_ms = (time.process_time() - start_time) / repetitions * 1000
+        print("Instrumentation {}: {:.3f} ms CPU per call".format(label,
+                                                                  cpu_ms))
+finally:
+    server.stop()
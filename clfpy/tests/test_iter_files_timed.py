@@ -0,0 +1,60 @@
+"""Compares list_files_minimal() and iter_files_minimal() on a huge folder
+
+The stand-in GSS runs in a separate process so that only the client's memory
+is measured.
+"""
+import os
+import sys
+import time
+import shutil
+import socket
+import tempfile
+import subprocess
+import tracemalloc
+
+import clfpy as cf
+
+n_entries = 50000
+
+folder = tempfile.mkdtemp(prefix='clfpy_standin_')
+os.makedirs(os.path.join(folder, 'home', 'huge'))
+for i in range(n_entries):
+    open(os.path.join(folder, 'home', 'huge', 'file_{:06d}'.format(i)),
+         'w').close()
+
+sock = socket.socket()
+sock.bind(('127.0.0.1', 0))
+port = sock.getsockname()[1]
+sock.close()
+server = subprocess.Popen(
+    [sys.executable, os.path.join(os.path.dirname(__file__),
+                                  'standin_server.py'), str(port), folder],
+    stdout=subprocess.PIPE)
+server.stdout.readline()
+
+try:
+    gss = cf.GssClient("http://127.0.0.1:{}/FileUtilities?wsdl".format(port),
+                       wsdl_cache=None)
+    gss.warm_up()
+    gss_ID = 'it4i_barbora://home/huge'
+
+    for name, method in [('list_files_minimal', gss.list_files_minimal),
+                         ('iter_files_minimal', gss.iter_files_minimal)]:
+        tracemalloc.start()
+        start_time = time.time()
+        first_entry = None
+        count = 0
+        for entry in method(gss_ID, 'token'):
+            if first_entry is None:
+                first_entry = time.time() - start_time
+            count += 1
+        total = time.time() - start_time
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert count == n_entries
+        print("{}: first entry after {:.2f} s, all {} entries after {:.2f} s,"
+              " peak memory {:.1f} MB".format(name, first_entry, count, total,
+                                              peak / 1e6))
+finally:
+    server.terminate()
+    shutil.rmtree(folder, ignore_errors=True)
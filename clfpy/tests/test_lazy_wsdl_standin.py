@@ -0,0 +1,78 @@
+"""Deferred WSDL loading against the stand-in GSS
+
+Checks that constructing SOAP clients does no network I/O, also for
+unreachable endpoints, that the WSDL is loaded on the first call and only
+once when many threads make their first call at the same time, and that
+warm_up() loads it in advance, optionally in a background thread.
+"""
+import time
+import threading
+
+import requests
+
+import clfpy as cf
+from standin_server import StandinServer
+
+n_threads = 16
+
+
+def wsdl_requests():
+    return server.httpd.counters['wsdl_requests']
+
+
+server = StandinServer().start()
+try:
+    # Construction does not touch the network
+    start_time = time.time()
+    for _ in range(100):
+        cf.AuthClient('http://192.0.2.1/AuthManager?wsdl', wsdl_cache=None)
+    print("100 clients of an unreachable endpoint: {:.3f} s".format(
+        time.time() - start_time))
+    assert time.time() - start_time < 1
+    gss = cf.GssClient(server.wsdl_url, wsdl_cache=None)
+    assert wsdl_requests() == 0
+
+    # The first call loads the WSDL
+    assert gss.contains_file('it4i_barbora://', 'token') is True
+    assert wsdl_requests() == 1
+    gss.contains_file('it4i_barbora://', 'token')
+    assert wsdl_requests() == 1
+
+    # Concurrent first calls load it once
+    gss = cf.GssClient(server.wsdl_url, wsdl_cache=None)
+    start = threading.Event()
+    results = []
+
+    def first_call():
+        start.wait()
+        results.append(gss.contains_file('it4i_barbora://', 'token'))
+    threads = [threading.Thread(target=first_call) for _ in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    start.set()
+    for thread in threads:
+        thread.join()
+    assert results == [True] * n_threads
+    assert wsdl_requests() == 2
+
+    # warm_up() loads in advance, in the foreground or background
+    gss = cf.GssClient(server.wsdl_url, wsdl_cache=None)
+    assert gss.warm_up() is None and wsdl_requests() == 3
+    gss = cf.GssClient(server.wsdl_url, wsdl_cache=None)
+    thread = gss.warm_up(background=True)
+    thread.join()
+    assert wsdl_requests() == 4
+    gss.contains_file('it4i_barbora://', 'token')
+    assert wsdl_requests() == 4
+
+    # Errors of a background warm-up surface on the first call
+    broken = cf.GssClient('http://127.0.0.1:1/missing?wsdl', wsdl_cache=None)
+    broken.warm_up(background=True).join()
+    try:
+        broken.contains_file('it4i_barbora://', 'token')
+        raise AssertionError("Unreachable WSDLs fail on the first call")
+    except requests.ConnectionError:
+        pass
+    print("Lazy WSDL loading OK")
+finally:
+    server.stop()
@@ -0,0 +1,74 @@
+"""Memoized AuthClient token queries against the stand-in with latency
+
+Compares repeated get_username()/get_project() calls with and without
+memoization, and checks that faults and getSessionToken are never
+memoized, that entries expire after the TTL, that the LRU size is bounded
+and that invalidate_memo() drops the entries of one token.
+"""
+import time
+
+import clfpy as cf
+from standin_server import StandinServer
+
+latency = 0.02
+n_calls = 50
+
+
+def soap_calls():
+    return server.httpd.counters['soap_calls']
+
+
+server = StandinServer(latency=latency).start()
+try:
+    for memoize in (False, True):
+        auth = cf.AuthClient(server.wsdl_url, wsdl_cache=None,
+                             memoize=memoize)
+        auth.warm_up()
+        before = soap_calls()
+        start_time = time.time()
+        for _ in range(n_calls):
+            assert auth.get_username('token') == 'user'
+            assert auth.get_project('token') == 'project'
+        print("{} x username and project, memoize={}: {:.2f} s, "
+              "{} SOAP calls".format(n_calls, memoize,
+                                     time.time() - start_time,
+                                     soap_calls() - before))
+        assert soap_calls() - before == (2 if memoize else 2 * n_calls)
+    stats = auth.memo_stats()
+    print("Memo stats: {}".format(stats))
+    assert stats['hits'] == 2 * (n_calls - 1) and stats['misses'] == 2
+
+    # Faults and session tokens always go to the server
+    before = soap_calls()
+    for _ in range(3):
+        assert isinstance(auth.get_username('expired'), Exception)
+        assert auth.get_session_token('user', 'project', 'password') == \
+            'token'
+    assert soap_calls() - before == 6
+
+    # invalidate_memo() drops the entries of one token
+    auth.get_email('token')
+    auth.invalidate_memo('token')
+    before = soap_calls()
+    auth.get_username('token')
+    auth.get_email('token')
+    assert soap_calls() - before == 2
+    auth.invalidate_memo()
+    assert auth.memo_stats()['size'] == 0
+
+    # Entries expire and the cache is bounded
+    auth = cf.AuthClient(server.wsdl_url, wsdl_cache=None, memoize=True,
+                         memo_ttl=0.2, memo_size=2)
+    auth.get_username('token')
+    time.sleep(0.3)
+    before = soap_calls()
+    auth.get_username('token')
+    assert soap_calls() - before == 1
+    for method in (auth.get_project, auth.get_email, auth.get_username):
+        method('token')
+    stats = auth.memo_stats()
+    assert stats['size'] == 2 and stats['evictions'] >= 1
+    assert cf.AuthClient(server.wsdl_url).memo_stats() is None
+    print("Memoization OK")
+finally:
+    server.stop()
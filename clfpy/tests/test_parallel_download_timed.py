@@ -0,0 +1,68 @@
+"""Parallel ranged downloads against the stand-in GSS
+
+The stand-in limits every connection to `rate` bytes/s, like a single TCP
+stream on a high-latency link. Checks that the downloaded files are
+identical, that servers without Range support fall back to a single
+stream, and prints the throughput per number of connections.
+"""
+import os
+import time
+import hashlib
+import shutil
+import tempfile
+
+import clfpy as cf
+from standin_server import StandinServer
+
+MB = 1000 * 1000
+rate = 20 * MB
+size = 200 * MB
+
+
+def digest(filename):
+    sha1 = hashlib.sha1()
+    with open(filename, 'rb') as in_file:
+        for block in iter(lambda: in_file.read(MB), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+server = StandinServer(rate=rate).start()
+no_ranges = StandinServer(folder=server.folder, rate=rate,
+                          ranges=False).start()
+out_folder = tempfile.mkdtemp(prefix='clfpy_dl_')
+try:
+    os.makedirs(os.path.join(server.folder, 'home'))
+    files = {'big': size, 'small': 1000, 'empty': 0,
+             'odd': 3 * cf.transfer.PART_SIZE + 7}
+    for name, length in files.items():
+        with open(os.path.join(server.folder, 'home', name), 'wb') as fout:
+            fout.write(os.urandom(length))
+    out_filename = os.path.join(out_folder, 'out')
+
+    gss = cf.GssClient(server.wsdl_url, wsdl_cache=None)
+    for name, length in files.items():
+        gss_ID = 'it4i_barbora://home/' + name
+        for connections in (1, 4):
+            assert gss.download_to_file(
+                gss_ID, 'token', out_filename, progress=False,
+                connections=connections) == length
+            assert digest(out_filename) == digest(
+                os.path.join(server.folder, 'home', name)), name
+
+    for label, client in [('Range support', gss),
+                          ('no Range support',
+                           cf.GssClient(no_ranges.wsdl_url, wsdl_cache=None))]:
+        for connections in (1, 2, 4, 8):
+            start_time = time.time()
+            client.download_to_file('it4i_barbora://home/big', 'token',
+                                    out_filename, progress=False,
+                                    connections=connections)
+            elapsed = time.time() - start_time
+            assert os.path.getsize(out_filename) == size
+            print("{}, {} connection(s): {:.1f} MB/s".format(
+                label, connections, size / MB / elapsed))
+finally:
+    no_ranges.stop()
+    server.stop()
+    shutil.rmtree(out_folder, ignore_errors=True)
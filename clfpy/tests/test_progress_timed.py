@@ -0,0 +1,161 @@
+"""Progress reporting against the stand-in GSS
+
+Compares the CPU time of a download drawing the old per-block progress bar
+(print_progress() on every block) with the rate-limited
+clfpy.progress.TerminalProgress and with progress reporting turned off, and
+checks that folder transfers report one aggregate progress to a custom
+clfpy.progress.Progress.
+"""
+import io
+import os
+import sys
+import time
+import shutil
+import threading
+import tempfile
+from collections import defaultdict
+
+import clfpy as cf
+from clfpy import gss_client, transfer
+from clfpy.progress import Progress, TerminalProgress
+from standin_server import StandinServer
+
+file_size = 100 * 1000 * 1000
+block_size = 16 * 1024
+n_files = 30
+
+
+class FakeTerminal(io.StringIO):
+    """Discards the output like a fast terminal would show it"""
+
+    def isatty(self):
+        return True
+
+    def write(self, text):
+        self.writes = getattr(self, 'writes', 0) + 1
+        return len(text)
+
+
+class Recorder(Progress):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.expected = [0, 0]
+        self.started = set()
+        self.bytes = defaultdict(int)
+        self.finished = {}
+        self.closed = False
+
+    def expect(self, n_files=1, n_bytes=None):
+        with self.lock:
+            self.expected[0] += n_files
+            self.expected[1] += n_bytes or 0
+
+    def start(self, name, size=None):
+        with self.lock:
+            self.started.add(name)
+
+    def advance(self, name, n_bytes):
+        with self.lock:
+            self.bytes[name] += n_bytes
+
+    def finish(self, name, error=None):
+        with self.lock:
+            self.finished[name] = error
+
+    def close(self):
+        self.closed = True
+
+
+server = StandinServer().start()
+work_folder = tempfile.mkdtemp(prefix='clfpy_progress_')
+try:
+    os.makedirs(os.path.join(server.folder, 'home'))
+    with open(os.path.join(server.folder, 'home', 'big'), 'wb') as fout:
+        fout.write(os.urandom(file_size))
+    gss = cf.GssClient(server.wsdl_url, wsdl_cache=None)
+    gss_ID = 'it4i_barbora://home/big'
+    out_filename = os.path.join(work_folder, 'big')
+    read_desc = gss.get_resource_information(gss_ID, 'token').readDescription
+    headers = {h.key: h.value for h in read_desc.headers}
+
+    terminal = FakeTerminal()
+    stdout, sys.stdout = sys.stdout, terminal
+    try:
+        def old_progress():
+            transfer.download(
+                gss._http_session(), read_desc.httpMethod, read_desc.url,
+                headers, out_filename, connections=1, block_size=block_size,
+                callback=lambda copied, total: gss_client.print_progress(
+                    copied, total, prefix='DL:'))
+        timed_runs = []
+        for label, func in [
+                ("print_progress() per block", old_progress),
+                ("TerminalProgress", lambda: gss.download_to_file(
+                    gss_ID, 'token', out_filename, block_size=block_size,
+                    connections=1)),
+                ("No progress", lambda: gss.download_to_file(
+                    gss_ID, 'token', out_filename, progress=False,
+                    block_size=block_size, connections=1))]:
+            before = getattr(terminal, 'writes', 0)
+            start_cpu = time.process_time()
+            start_time = time.time()
+            func()
+            timed_runs.append((label, time.process_time() - start_cpu,
+                               time.time() - start_time,
+                               getattr(terminal, 'writes', 0) - before))
+    finally:
+        sys.stdout = stdout
+    for label, cpu, wall, writes in timed_runs:
+        print("{}: {:.2f} s CPU, {:.2f} s wall, {} writes".format(
+            label, cpu, wall, writes))
+    assert timed_runs[1][3] < timed_runs[0][3] / 10
+    assert os.path.getsize(out_filename) == file_size
+
+    # The non-terminal renderer writes lines at long intervals only
+    log = io.StringIO()
+    progress = TerminalProgress('DL:', stream=log)
+    gss.download_to_file(gss_ID, 'token', out_filename, progress=progress,
+                         connections=1)
+    progress.close()
+    print("Log output: {!r}".format(log.getvalue()))
+    assert log.getvalue().count('\n') <= 2
+    assert '100.0%' in log.getvalue() and '[' not in log.getvalue()
+
+    # Folder transfers report one aggregate progress
+    local = os.path.join(work_folder, 'case')
+    os.makedirs(os.path.join(local, 'sub'))
+    sizes = {}
+    for i in range(n_files):
+        name = os.path.join(local, 'sub' if i % 2 else '', 'f{}'.format(i))
+        with open(name, 'wb') as fout:
+            fout.write(os.urandom(1000 * (i + 1)))
+        sizes[name] = 1000 * (i + 1)
+    recorder = Recorder()
+    summary = gss.upload_folder('it4i_barbora://home', 'token', local,
+                                verbose=False, progress=recorder)
+    assert not summary.failed
+    assert recorder.expected == [n_files, sum(sizes.values())]
+    assert sorted(recorder.bytes.values()) == sorted(sizes.values())
+    assert len(recorder.finished) == n_files
+    assert not any(recorder.finished.values())
+    assert not recorder.closed
+
+    recorder = Recorder()
+    summary = gss.download_folder('it4i_barbora://home/case', 'token',
+                                  in_foldername=work_folder + '/copy',
+                                  verbose=False, progress=recorder)
+    assert recorder.expected == [n_files, 0]
+    assert sum(recorder.bytes.values()) == sum(sizes.values())
+    assert len(recorder.finished) == n_files
+
+    bar = FakeTerminal()
+    progress = TerminalProgress('UL:', stream=bar)
+    gss.sync(local, 'it4i_barbora://home/synced', 'token', verbose=False,
+             progress=progress)
+    progress.close()
+    assert progress.files == progress.files_done == n_files
+    assert progress.bytes == progress.total_bytes == sum(sizes.values())
+    print("Aggregate folder progress OK")
+finally:
+    server.stop()
+    shutil.rmtree(work_folder, ignore_errors=True)
@@ -0,0 +1,59 @@
+"""Shared client registry against the stand-in GSS
+
+Checks that clfpy.get_client() hands out one client per (class, WSDL URL),
+also to threads asking at the same time, that the WSDL of a registered
+client is loaded once however often it is requested, and that
+clear_clients() forgets the clients.
+"""
+import threading
+
+import clfpy as cf
+from standin_server import StandinServer
+
+
+def wsdl_requests():
+    return server.httpd.counters['wsdl_requests']
+
+
+server = StandinServer().start()
+other = StandinServer().start()
+try:
+    cf.set_default_wsdl_cache(None)
+    gss = cf.get_client(cf.GssClient, server.wsdl_url)
+    assert cf.get_client(cf.GssClient, server.wsdl_url) is gss
+    assert cf.get_client(cf.GssClient, other.wsdl_url) is not gss
+    assert cf.get_client(cf.AuthClient, server.wsdl_url) is not gss
+    assert isinstance(cf.get_client(cf.AuthClient, server.wsdl_url),
+                      cf.AuthClient)
+
+    # Repeated commands reuse the client and its WSDL
+    before = wsdl_requests()
+    for _ in range(20):
+        cf.get_client(cf.GssClient, server.wsdl_url).contains_file(
+            'it4i_barbora://', 'token')
+    print("20 commands: {} WSDL download(s)".format(wsdl_requests() - before))
+    assert wsdl_requests() - before == 1
+
+    # Threads asking at the same time get the same client
+    cf.clear_clients()
+    clients = []
+    start = threading.Event()
+
+    def ask():
+        start.wait()
+        clients.append(cf.get_client(cf.GssClient, server.wsdl_url))
+    threads = [threading.Thread(target=ask) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    start.set()
+    for thread in threads:
+        thread.join()
+    assert len(clients) == 16 and len(set(map(id, clients))) == 1
+    assert clients[0] is not gss
+    cf.clear_clients()
+    assert cf.get_client(cf.GssClient, server.wsdl_url) is not clients[0]
+    print("Client registry OK")
+finally:
+    cf.clear_clients()
+    other.stop()
+    server.stop()
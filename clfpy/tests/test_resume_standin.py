@@ -0,0 +1,127 @@
+"""Resumable downloads and uploads against the stand-in GSS
+
+Interrupts a download half-way, checks that only the partial file and its
+state are left behind and that resuming fetches just the missing bytes.
+Simulates an interrupted upload and checks that it is continued.
+"""
+import os
+import shutil
+import tempfile
+
+import requests
+
+import clfpy as cf
+from clfpy.transfer import (download, UploadState, PART_SIZE, PART_SUFFIX,
+                            STATE_SUFFIX)
+from standin_server import StandinServer
+
+size = 5 * PART_SIZE + 123
+
+
+class Interrupted(Exception):
+    pass
+
+
+def interrupt_after(limit):
+    def callback(copied, total):
+        if copied > limit:
+            raise Interrupted()
+    return callback
+
+
+server = StandinServer().start()
+work_folder = tempfile.mkdtemp(prefix='clfpy_resume_')
+os.environ['CLFPY_TRANSFER_DIR'] = os.path.join(work_folder, 'state')
+try:
+    os.makedirs(os.path.join(server.folder, 'home'))
+    source = os.path.join(server.folder, 'home', 'big')
+    with open(source, 'wb') as fout:
+        fout.write(os.urandom(size))
+    with open(source, 'rb') as fin:
+        content = fin.read()
+    gss = cf.GssClient(server.wsdl_url, wsdl_cache=None)
+    gss_ID = 'it4i_barbora://home/big'
+    url = gss.get_resource_information(gss_ID,
+                                       'token').readDescription.url
+    out_filename = os.path.join(work_folder, 'big')
+
+    # Without resume, nothing is left behind
+    try:
+        download(requests, 'GET', url, {}, out_filename,
+                 callback=interrupt_after(size // 2))
+    except Interrupted:
+        pass
+    assert os.listdir(work_folder) == []
+
+    # With resume, the partial file and its state are kept
+    try:
+        download(requests, 'GET', url, {}, out_filename,
+                 callback=interrupt_after(size // 2), resume=True)
+    except Interrupted:
+        pass
+    assert not os.path.exists(out_filename)
+    assert os.path.exists(out_filename + PART_SUFFIX)
+    assert os.path.exists(out_filename + STATE_SUFFIX)
+
+    reported = []
+    download(requests, 'GET', url, {}, out_filename,
+             callback=lambda copied, total: reported.append(copied),
+             resume=True)
+    print("Resumed download continued at {} of {} bytes".format(
+        reported[0], size))
+    assert reported[0] > size // 2
+    with open(out_filename, 'rb') as fin:
+        assert fin.read() == content
+    assert sorted(os.listdir(work_folder)) == ['big']
+
+    # A file changed on the server is downloaded from scratch
+    os.remove(out_filename)
+    try:
+        download(requests, 'GET', url, {}, out_filename,
+                 callback=interrupt_after(size // 2), resume=True)
+    except Interrupted:
+        pass
+    os.utime(source, (0, 0))
+    reported = []
+    download(requests, 'GET', url, {}, out_filename,
+             callback=lambda copied, total: reported.append(copied),
+             resume=True)
+    assert reported[0] <= PART_SIZE
+    with open(out_filename, 'rb') as fin:
+        assert fin.read() == content
+
+    # The same through the client, after an interruption
+    os.remove(out_filename)
+    try:
+        download(requests, 'GET', url, {}, out_filename,
+                 callback=interrupt_after(size // 2), resume=True)
+    except Interrupted:
+        pass
+    assert gss.download_to_file(gss_ID, 'token', out_filename,
+                                progress=False, resume=True) == size
+    with open(out_filename, 'rb') as fin:
+        assert fin.read() == content
+
+    # Interrupted upload: the state is recorded and half the file arrived
+    upload_ID = 'it4i_barbora://home/uploaded'
+    state = UploadState(upload_ID, out_filename)
+    state.start()
+    with open(os.path.join(server.folder, 'home', 'uploaded'), 'wb') as fout:
+        fout.write(content[:size // 2])
+    assert gss.upload(upload_ID, 'token', out_filename, progress=False,
+                      resume=True) == upload_ID
+    with open(os.path.join(server.folder, 'home', 'uploaded'), 'rb') as fin:
+        assert fin.read() == content
+    assert not state.matches()
+
+    # Without a matching state, existing files are not touched
+    try:
+        gss.upload(upload_ID, 'token', out_filename, progress=False,
+                   resume=True)
+        raise AssertionError("upload to an existing file succeeded")
+    except AttributeError:
+        pass
+    print("Resumable transfers OK")
+finally:
+    server.stop()
+    shutil.rmtree(work_folder, ignore_errors=True)
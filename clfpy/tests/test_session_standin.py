@@ -0,0 +1,83 @@
+"""Pooled keep-alive SOAP transport against the stand-in with latency
+
+Counts the connections the stand-in accepts for a series of SOAP calls
+through the shared pooled session and through suds' own urllib transport,
+checks that clients share the default session and its connections, that
+concurrent calls reuse the connections of the pool, and that the default
+and custom timeouts apply to SOAP calls.
+"""
+import time
+
+import requests
+
+import clfpy as cf
+from clfpy.transport import DEFAULT_TIMEOUT
+from standin_server import StandinServer
+
+latency = 0.02
+n_calls = 50
+pool_size = 16
+
+
+def connections():
+    return server.httpd.counters['connections']
+
+
+server = StandinServer(latency=latency).start()
+try:
+    for session in (None, cf.make_session()):
+        gss = cf.GssClient(server.wsdl_url, wsdl_cache=None, session=session)
+        gss.warm_up()
+        before = connections()
+        start_time = time.time()
+        for _ in range(n_calls):
+            gss.contains_file('it4i_barbora://', 'token')
+        opened = connections() - before
+        print("{} calls, {}: {:.2f} s, {} connections".format(
+            n_calls, 'pooled session' if session else 'urllib',
+            time.time() - start_time, opened))
+        assert opened <= 1 if session else opened == n_calls
+
+    # Clients share the default session and its connections
+    first = cf.GssClient(server.wsdl_url, wsdl_cache=None)
+    second = cf.AuthClient(server.wsdl_url, wsdl_cache=None)
+    assert first._http_session() is second._http_session() is \
+        cf.get_default_session()
+    first.warm_up()
+    second.warm_up()
+    before = connections()
+    for _ in range(10):
+        first.contains_file('it4i_barbora://', 'token')
+        second.get_username('token')
+    assert connections() - before == 0
+
+    # Concurrent calls open at most pool_size connections, which are kept
+    gss = cf.GssClient(server.wsdl_url, wsdl_cache=None,
+                       session=cf.make_session(pool_size))
+    calls = [('containsFile', ['it4i_barbora://', 'token'])] * 4 * pool_size
+    before = connections()
+    gss.method_call_many(calls, max_workers=pool_size)
+    opened = connections() - before
+    gss.method_call_many(calls, max_workers=pool_size)
+    print("{} concurrent calls: {} connections, then {}".format(
+        len(calls), opened, connections() - before - opened))
+    assert opened <= pool_size + 1
+    assert connections() - before == opened
+
+    # Timeouts
+    assert first._timeout == DEFAULT_TIMEOUT == (10, 300)
+    assert first.client.options.transport.timeout == DEFAULT_TIMEOUT
+    impatient = cf.GssClient(server.wsdl_url, wsdl_cache=None,
+                             timeout=(5, 0.2))
+    impatient.warm_up()
+    assert impatient.client.options.transport.timeout == (5, 0.2)
+    server.httpd.latency = 0.5
+    try:
+        impatient.contains_file('it4i_barbora://', 'token')
+        raise AssertionError("Calls time out")
+    except requests.Timeout:
+        pass
+    assert first.contains_file('it4i_barbora://', 'token') is True
+    print("Pooled session OK")
+finally:
+    server.stop()
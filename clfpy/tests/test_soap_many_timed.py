@@ -0,0 +1,40 @@
+"""Compares serial and concurrent SOAP calls against the stand-in GSS
+
+The stand-in adds a simulated network latency to every SOAP call.
+"""
+import os
+import time
+
+import clfpy as cf
+from standin_server import StandinServer
+
+n_files = 200
+latency = 0.02
+
+server = StandinServer(latency=latency).start()
+try:
+    os.makedirs(os.path.join(server.folder, 'home'))
+    gss_IDs = []
+    for i in range(n_files):
+        with open(os.path.join(server.folder, 'home', str(i)), 'w') as fout:
+            fout.write('x')
+        gss_IDs.append('it4i_barbora://home/{}'.format(i))
+
+    gss = cf.GssClient(server.wsdl_url, wsdl_cache=None)
+    gss.warm_up()
+
+    start_time = time.time()
+    serial = [gss.get_resource_information(gss_ID, 'token')
+              for gss_ID in gss_IDs]
+    print("Serial:     {:6.0f} ms for {} calls".format(
+        (time.time() - start_time) * 1000, n_files))
+
+    for max_workers in [4, 8, 16]:
+        start_time = time.time()
+        many = gss.get_resource_information_many(gss_IDs, 'token',
+                                                 max_workers=max_workers)
+        print("{:2d} workers: {:6.0f} ms for {} calls".format(
+            max_workers, (time.time() - start_time) * 1000, n_files))
+        assert [r.uniqueName for r in many] == [r.uniqueName for r in serial]
+finally:
+    server.stop()
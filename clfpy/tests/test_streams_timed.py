@@ -0,0 +1,172 @@
+"""Streaming reads and uploads against the stand-in GSS
+
+Compares hashing a large GSS file through a temporary file (download_to_file
+and reading it back) with hashing it straight from open_read(), including
+the peak Python memory of the streaming variant, and pipes a file through a
+compressor back into the storage with upload_stream(). Also checks
+Content-Length delimited and chunked uploads, size mismatches and the
+refresh of rejected descriptions.
+"""
+import os
+import base64
+import time
+import zlib
+import shutil
+import hashlib
+import tempfile
+import tracemalloc
+
+import requests
+
+import clfpy as cf
+from standin_server import StandinServer
+
+file_size = 200 * 1000 * 1000
+
+
+def digest_file(filename):
+    sha = hashlib.sha256()
+    with open(filename, 'rb') as in_file:
+        for block in iter(lambda: in_file.read(1024 * 1024), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def digest_stream(stream):
+    sha = hashlib.sha256()
+    for chunk in stream.iter_chunks():
+        sha.update(chunk)
+    return sha.hexdigest()
+
+
+def compressed(chunks):
+    compressor = zlib.compressobj(1)
+    for chunk in chunks:
+        block = compressor.compress(chunk)
+        if block:
+            yield block
+    yield compressor.flush()
+
+
+def decompressed(chunks):
+    decompressor = zlib.decompressobj()
+    for chunk in chunks:
+        yield decompressor.decompress(chunk)
+    yield decompressor.flush()
+
+
+def read(filename):
+    with open(filename, 'rb') as in_file:
+        return in_file.read()
+
+
+server = StandinServer(signed=True).start()
+work_folder = tempfile.mkdtemp(prefix='clfpy_streams_')
+try:
+    os.makedirs(os.path.join(server.folder, 'home'))
+    remote_file = os.path.join(server.folder, 'home', 'big')
+    with open(remote_file, 'wb') as fout:
+        # Compressible, but not trivially
+        for i in range(file_size // (1000 * 1000)):
+            fout.write(base64.b64encode(os.urandom(750 * 1000)))
+    expected = digest_file(remote_file)
+    gss = cf.GssClient(server.wsdl_url, wsdl_cache=None, progress=False,
+                       reuse_descriptions=True)
+    gss_ID = 'it4i_barbora://home/big'
+    gss.warm_up()
+
+    start_time = time.time()
+    out_filename = os.path.join(work_folder, 'big')
+    gss.download_to_file(gss_ID, 'token', out_filename)
+    assert digest_file(out_filename) == expected
+    os.remove(out_filename)
+    print("Temporary file: {:.2f} s".format(time.time() - start_time))
+
+    tracemalloc.start()
+    start_time = time.time()
+    with gss.open_read(gss_ID, 'token') as stream:
+        assert stream.size == file_size
+        assert digest_stream(stream) == expected
+        assert stream.tell() == file_size
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print("open_read(): {:.2f} s, peak Python memory {:.1f} MB".format(
+        time.time() - start_time, peak / 1e6))
+    assert peak < 10 * 1000 * 1000
+    assert stream.closed
+
+    # Copy between GSS files without touching the disk
+    for size in (file_size, None):
+        start_time = time.time()
+        with gss.open_read(gss_ID, 'token') as stream:
+            gss.upload_stream('it4i_barbora://home/copy', 'token', stream,
+                              size, update=size is None)
+        print("Streamed copy, size={}: {:.2f} s".format(
+            size, time.time() - start_time))
+    assert digest_file(remote_file[:-3] + 'copy') == expected
+
+    # Compress while downloading, upload while compressing (chunked)
+    start_time = time.time()
+    with gss.open_read(gss_ID, 'token') as stream:
+        gss.upload_stream('it4i_barbora://home/big.z', 'token',
+                          compressed(stream.iter_chunks()))
+    print("Recompressed upload of {:.1f} MB: {:.2f} s".format(
+        os.path.getsize(remote_file + '.z') / 1e6, time.time() - start_time))
+    with gss.open_read('it4i_barbora://home/big.z', 'token') as stream:
+        sha = hashlib.sha256()
+        for chunk in decompressed(stream.iter_chunks()):
+            sha.update(chunk)
+    assert sha.hexdigest() == expected
+
+    # File objects, with and without a size
+    local_file = os.path.join(work_folder, 'local')
+    with open(local_file, 'wb') as fout:
+        fout.write(os.urandom(3 * 1000 * 1000 + 17))
+    for i, size in enumerate((os.path.getsize(local_file), None)):
+        target = 'it4i_barbora://home/local{}'.format(i)
+        with open(local_file, 'rb') as in_file:
+            assert gss.upload_stream(target, 'token', in_file, size,
+                                     block_size=64 * 1024) == target
+        assert read(remote_file[:-3] + 'local{}'.format(i)) == \
+            read(local_file)
+    for size in (0, None):
+        gss.upload_stream('it4i_barbora://home/empty', 'token', [], size,
+                          update=size is None)
+        assert read(os.path.join(server.folder, 'home', 'empty')) == b''
+
+    # update=True replaces, small reads and readinto work
+    gss.upload_stream('it4i_barbora://home/local0', 'token',
+                      [b'new ', b'', b'content'], 11, update=True)
+    with gss.open_read('it4i_barbora://home/local0', 'token') as stream:
+        assert stream.read(4) == b'new '
+        buf = bytearray(3)
+        assert stream.readinto(buf) == 3 and bytes(buf) == b'con'
+        assert stream.read() == b'tent'
+        assert stream.read(10) == b''
+
+    # Sources not matching their size are refused
+    for i, chunks in enumerate(([b'short'], [b'longer than ten bytes'])):
+        try:
+            gss.upload_stream('it4i_barbora://home/wrong{}'.format(i),
+                              'token', chunks, 10)
+        except (IOError, requests.RequestException) as error:
+            print("Size mismatch: {!r}".format(error))
+        else:
+            raise AssertionError("Size mismatch not detected")
+
+    # Missing files and expired signatures
+    try:
+        gss.open_read('it4i_barbora://home/missing', 'token')
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError("Missing file not detected")
+    refreshed = gss.description_stats()['refreshed']
+    server.expire_signatures()
+    with gss.open_read('it4i_barbora://home/local0', 'token') as stream:
+        assert stream.read() == b'new content'
+    assert gss.description_stats()['refreshed'] == refreshed + 1
+    print("Streams OK")
+finally:
+    server.stop()
+    shutil.rmtree(work_folder, ignore_errors=True)
@@ -0,0 +1,150 @@
+"""Incremental folder synchronisation against the stand-in GSS with latency
+
+Synchronises a local tree up and down, checks that unchanged files are
+skipped, changed and new files transferred and extraneous files deleted,
+that the hash manifest recognises files which were only touched, and that
+new files whose upload lost its reply are retried.
+Prints the time of a full transfer and of an incremental one.
+"""
+import os
+import time
+import shutil
+import filecmp
+import tempfile
+
+import requests
+from suds import WebFault
+
+import clfpy as cf
+from standin_server import StandinServer
+
+latency = 0.02
+n_folders = 4
+n_files = 50
+
+
+def compare_trees(left, right):
+    comparison = filecmp.dircmp(left, right)
+    assert not comparison.left_only and not comparison.right_only, \
+        (comparison.left_only, comparison.right_only)
+    _, mismatch, errors = filecmp.cmpfiles(left, right, comparison.common_files,
+                                           shallow=False)
+    assert not mismatch and not errors, (mismatch, errors)
+    for sub in comparison.common_dirs:
+        compare_trees(os.path.join(left, sub), os.path.join(right, sub))
+
+
+def write(filename, content, mtime=None):
+    with open(filename, 'wb') as fout:
+        fout.write(content)
+    if mtime is not None:
+        os.utime(filename, (mtime, mtime))
+
+
+def timed_sync(label, *args, **kwargs):
+    start_time = time.time()
+    summary = gss.sync(*args, verbose=False, **kwargs)
+    print("{}: {} ({:.2f} s)".format(label, summary,
+                                     time.time() - start_time))
+    assert not summary.failed, summary.failed
+    return summary
+
+
+server = StandinServer(latency=latency).start()
+work_folder = tempfile.mkdtemp(prefix='clfpy_sync_')
+os.environ['CLFPY_TRANSFER_DIR'] = os.path.join(work_folder, 'state')
+try:
+    os.makedirs(os.path.join(server.folder, 'home'))
+    local = os.path.join(work_folder, 'case')
+    for i in range(n_folders):
+        os.makedirs(os.path.join(local, 'run_{}'.format(i), 'empty'))
+        for j in range(n_files):
+            write(os.path.join(local, 'run_{}'.format(i), 'f{}'.format(j)),
+                  os.urandom(1000 + j))
+    n_total = n_folders * n_files
+    gss = cf.GssClient(server.wsdl_url, wsdl_cache=None)
+    gss_folder = 'it4i_barbora://home/case'
+    remote = os.path.join(server.folder, 'home', 'case')
+
+    # Up: the first sync transfers everything, the second nothing
+    summary = timed_sync("Initial sync up", local, gss_folder, 'token')
+    assert summary.files == n_total
+    compare_trees(local, remote)
+    summary = timed_sync("Unchanged sync up", local, gss_folder, 'token')
+    assert summary.files == 0 and summary.skipped == n_total
+
+    # Changed, new and deleted files (modification times have a resolution
+    # of one second)
+    time.sleep(1.1)
+    write(os.path.join(local, 'run_0', 'f0'), b'changed')
+    write(os.path.join(local, 'run_1', 'f1'), os.urandom(1001))
+    write(os.path.join(local, 'run_1', 'new'), b'new')
+    os.remove(os.path.join(local, 'run_2', 'f2'))
+    shutil.rmtree(os.path.join(local, 'run_3'))
+    summary = timed_sync("Incremental sync up", local, gss_folder, 'token')
+    assert summary.files == 3 and summary.deleted == 0
+    summary = timed_sync("Sync up with delete", local, gss_folder, 'token',
+                         delete=True)
+    assert summary.files == 0 and summary.deleted == 2
+    compare_trees(local, remote)
+
+    # A new file whose upload created it but lost the reply is retried
+    statuses = []
+    send_file = gss._send_file
+
+    def lose_first_reply(*args, **kwargs):
+        response = send_file(*args, **kwargs)
+        statuses.append(response.status_code)
+        if len(statuses) == 1:
+            raise requests.ConnectionError("Reply lost")
+        return response
+    gss._send_file = lose_first_reply
+    write(os.path.join(local, 'run_0', 'lost'), b'lost reply')
+    summary = timed_sync("New file with a lost reply", local, gss_folder,
+                         'token')
+    del gss._send_file
+    assert summary.files == 1 and len(statuses) == 2
+    compare_trees(local, remote)
+    os.remove(os.path.join(local, 'run_0', 'lost'))
+    os.remove(os.path.join(remote, 'run_0', 'lost'))
+
+    # The manifest skips files that were only touched
+    future = time.time() + 100
+    timed_sync("Sync up recording the manifest", local, gss_folder, 'token',
+               checksum=True)
+    for root, _, names in os.walk(local):
+        for name in names:
+            os.utime(os.path.join(root, name), (future, future))
+    summary = timed_sync("Touched, with checksum", local, gss_folder,
+                         'token', checksum=True)
+    assert summary.files == 0
+    summary = timed_sync("Touched, without checksum", local, gss_folder,
+                         'token')
+    assert summary.files == (n_folders - 1) * n_files
+
+    # Down: into an empty folder, then incrementally
+    copy = os.path.join(work_folder, 'copy')
+    summary = timed_sync("Initial sync down", copy, gss_folder, 'token',
+                         direction=cf.gss_client.SYNC_DOWN)
+    compare_trees(remote, copy)
+    summary = timed_sync("Unchanged sync down", copy, gss_folder, 'token',
+                         direction='down')
+    assert summary.files == 0
+    write(os.path.join(remote, 'run_0', 'f0'), b'changed remotely',
+          time.time() + 100)
+    write(os.path.join(copy, 'extra'), b'extra')
+    summary = timed_sync("Incremental sync down with delete", copy,
+                         gss_folder, 'token', direction='down', delete=True)
+    assert summary.files == 1 and summary.deleted == 1
+    compare_trees(remote, copy)
+
+    # SOAP faults checking the target folder are raised
+    try:
+        gss.sync(local, 'unknown://folder', 'token', verbose=False)
+        raise AssertionError("Faults of containsFile are raised")
+    except WebFault:
+        pass
+    print("Sync OK")
+finally:
+    server.stop()
+    shutil.rmtree(work_folder, ignore_errors=True)
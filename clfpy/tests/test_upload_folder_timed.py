@@ -0,0 +1,160 @@
+"""Folder upload against the stand-in GSS with simulated latency
+
+Compares a sequential upload (all folders created one by one, then one
+upload per file, as upload_folder() used to work) with the concurrent
+upload_folder(), and checks the uploaded tree. Only large files record
+resumable uploads; small files whose upload lost its reply are retried
+through an update, local errors are not retried.
+"""
+import os
+import time
+import shutil
+import filecmp
+import tempfile
+
+import requests
+from suds import WebFault
+
+import clfpy as cf
+from standin_server import StandinServer
+
+latency = 0.02
+n_cases = 5
+n_meshes = 4
+n_files = 25
+
+
+def sequential_upload(gss, gss_tree, local_root):
+    gss_root = gss_tree + '/' + os.path.basename(local_root)
+    folders = []
+    files = []
+    for root, dirs, names in os.walk(local_root):
+        rel_root = os.path.relpath(root, local_root).replace(os.sep, '/')
+        gss_folder = gss_root if rel_root == '.' else gss_root + '/' + rel_root
+        folders.append(gss_folder)
+        files.extend((os.path.join(root, name), gss_folder + '/' + name)
+                     for name in names)
+    for folder in sorted(folders):
+        gss.create_folder(folder, 'token')
+    for local_file, gss_file in files:
+        gss.upload(gss_file, 'token', local_file, progress=False)
+
+
+def compare_trees(left, right):
+    comparison = filecmp.dircmp(left, right)
+    assert not comparison.left_only and not comparison.right_only, \
+        (comparison.left_only, comparison.right_only)
+    _, mismatch, errors = filecmp.cmpfiles(left, right, comparison.common_files,
+                                           shallow=False)
+    assert not mismatch and not errors
+    for sub in comparison.common_dirs:
+        compare_trees(os.path.join(left, sub), os.path.join(right, sub))
+
+
+server = StandinServer(latency=latency).start()
+local_folder = tempfile.mkdtemp(prefix='clfpy_ul_')
+try:
+    os.makedirs(os.path.join(server.folder, 'home'))
+    model = os.path.join(local_folder, 'model')
+    for i in range(n_cases):
+        os.makedirs(os.path.join(model, 'case_{}'.format(i), 'empty'))
+        for j in range(n_meshes):
+            mesh = os.path.join(model, 'case_{}'.format(i), 'mesh_{}'.format(j))
+            os.makedirs(mesh)
+            for k in range(n_files):
+                with open(os.path.join(mesh, 'part{}.msh'.format(k)),
+                          'wb') as fout:
+                    fout.write(os.urandom(k * 100))
+    n_total = n_cases * n_meshes * n_files
+    gss = cf.GssClient(server.wsdl_url, wsdl_cache=None)
+
+    start_time = time.time()
+    os.makedirs(os.path.join(server.folder, 'home', 'seq'))
+    sequential_upload(gss, 'it4i_barbora://home/seq', model)
+    print("Sequential: {:.2f} s".format(time.time() - start_time))
+    compare_trees(model, os.path.join(server.folder, 'home', 'seq', 'model'))
+
+    for workers in (1, 8, 32):
+        target = 'w{}'.format(workers)
+        os.makedirs(os.path.join(server.folder, 'home', target))
+        summary = gss.upload_folder('it4i_barbora://home/' + target, 'token',
+                                    model, max_workers=workers, verbose=False)
+        print("upload_folder, {} workers: {}".format(workers, summary))
+        assert summary.files == n_total and not summary.failed
+        compare_trees(model, os.path.join(server.folder, 'home', target,
+                                          'model'))
+
+    # Existing files are reported as failed, not overwritten
+    summary = gss.upload_folder('it4i_barbora://home/w8', 'token', model,
+                                verbose=False)
+    assert summary.files == 0 and len(summary.failed) == n_total
+
+    # Existing folders are fine, faults are raised
+    gss._create_folder_checked('it4i_barbora://home/w8', 'token')
+    try:
+        gss._create_folder_checked('unknown://folder', 'token')
+        raise AssertionError("Faults of createFolder are raised")
+    except WebFault:
+        pass
+
+    # Only large files record resumable uploads
+    started = []
+    start = cf.transfer.UploadState.start
+    cf.transfer.UploadState.start = \
+        lambda state: started.append(state.gss_ID) or start(state)
+    try:
+        big = os.path.join(local_folder, 'big')
+        os.makedirs(big)
+        with open(os.path.join(big, 'large.bin'), 'wb') as fout:
+            fout.write(os.urandom(cf.gss_client.RESUME_MIN_SIZE))
+        with open(os.path.join(big, 'small.bin'), 'wb') as fout:
+            fout.write(b'small')
+        summary = gss.upload_folder('it4i_barbora://home', 'token', big,
+                                    verbose=False)
+        assert summary.files == 2 and not summary.failed
+        assert started == ['it4i_barbora://home/big/large.bin']
+    finally:
+        cf.transfer.UploadState.start = start
+
+    # An upload which created the file but lost its reply is repeated
+    statuses = []
+    send_file = gss._send_file
+
+    def lose_first_reply(*args, **kwargs):
+        response = send_file(*args, **kwargs)
+        statuses.append(response.status_code)
+        if len(statuses) == 1:
+            raise requests.ConnectionError("Reply lost")
+        return response
+    gss._send_file = lose_first_reply
+    lost = os.path.join(local_folder, 'lost')
+    os.makedirs(lost)
+    with open(os.path.join(lost, 'small.bin'), 'wb') as fout:
+        fout.write(b'small')
+    summary = gss.upload_folder('it4i_barbora://home', 'token', lost,
+                                verbose=False)
+    del gss._send_file
+    print("Lost reply, PUT statuses: {}".format(statuses))
+    assert summary.files == 1 and not summary.failed, summary.failed
+    assert len(statuses) == 2
+    compare_trees(lost, os.path.join(server.folder, 'home', 'lost'))
+
+    # Local errors are not retried
+    attempts = []
+    upload = gss.upload
+    gss.upload = lambda *args, **kwargs: \
+        attempts.append(args) or upload(*args, **kwargs)
+    try:
+        # A folder cannot be read as a file
+        gss._upload_with_retries('it4i_barbora://home/unreadable', 'token',
+                                 lost)
+        raise AssertionError("Local errors are raised")
+    except OSError:
+        pass
+    finally:
+        del gss.upload
+    assert len(attempts) == 1
+    print("Folder upload OK")
+finally:
+    server.stop()
+    shutil.rmtree(local_folder, ignore_errors=True)
@@ -0,0 +1,75 @@
+"""Scanning a GSS tree with walk() against the stand-in with latency
+
+Compares a serial breadth-first scan (one listing at a time, as
+download_folder() used to scan) with walk() for several worker counts, and
+the time until the first folder is available.
+"""
+import os
+import time
+
+import clfpy as cf
+from standin_server import StandinServer
+
+latency = 0.02
+branching = 6
+depth = 3
+n_files = 20
+
+
+def serial_scan(gss, gss_tree):
+    folders = [gss_tree]
+    files = []
+    scanned = 0
+    while scanned < len(folders):
+        for entry in gss.list_files_minimal(folders[scanned], 'token'):
+            if 'FOLDER' in entry['type']:
+                folders.append(entry['uniqueName'])
+            else:
+                files.append(entry['uniqueName'])
+        scanned += 1
+    return folders, files
+
+
+def make_tree(path, level):
+    os.makedirs(path)
+    for i in range(n_files):
+        open(os.path.join(path, 'f{}'.format(i)), 'w').close()
+    if level < depth:
+        for i in range(branching):
+            make_tree(os.path.join(path, 'd{}'.format(i)), level + 1)
+
+
+server = StandinServer(latency=latency).start()
+try:
+    make_tree(os.path.join(server.folder, 'home', 'tree'), 0)
+    gss = cf.GssClient(server.wsdl_url, wsdl_cache=None)
+    gss_tree = 'it4i_barbora://home/tree'
+    gss.warm_up()
+
+    start_time = time.time()
+    folders, files = serial_scan(gss, gss_tree)
+    print("Serial scan: {} folders, {} files in {:.2f} s".format(
+        len(folders), len(files), time.time() - start_time))
+
+    for workers in (1, 8, 32):
+        start_time = time.time()
+        first = None
+        walked_folders = []
+        walked_files = []
+        for folder, subfolders, entries in gss.walk(gss_tree, 'token',
+                                                     max_workers=workers):
+            if first is None:
+                first = time.time() - start_time
+            walked_folders.append(folder)
+            walked_files.extend(e['uniqueName'] for e in entries)
+        print("walk(), {} workers: first folder after {:.3f} s, all after "
+              "{:.2f} s".format(workers, first, time.time() - start_time))
+        assert sorted(walked_folders) == sorted(folders)
+        assert sorted(walked_files) == sorted(files)
+
+    # Listing errors can be collected instead of aborting the walk
+    errors = []
+    assert list(gss.walk('invalid', 'token', onerror=errors.append)) == []
+    assert len(errors) == 1
+finally:
+    server.stop()
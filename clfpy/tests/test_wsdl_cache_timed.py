@@ -0,0 +1,72 @@
+"""Measures cold vs. warm SOAP client construction with the WSDL cache
+
+Runs against the local stand-in GSS service by default, and then checks
+that a cold cache downloads the WSDL document only once. Pass a WSDL URL as
+first argument to measure a real endpoint instead, e.g.
+    python test_wsdl_cache_timed.py https://api.hetcomp.org/gss-0.1/FileUtilities?wsdl
+"""
+import sys
+import time
+import tempfile
+import shutil
+
+import clfpy as cf
+from standin_server import StandinServer
+
+repetitions = 10
+
+
+def time_construction(wsdl_url, wsdl_cache):
+    """Returns the average construction time in ms"""
+    start_time = time.time()
+    for _ in range(repetitions):
+        cf.GssClient(wsdl_url, wsdl_cache=wsdl_cache).warm_up()
+    return (time.time() - start_time) / repetitions * 1000
+
+
+server = None
+if len(sys.argv) > 1:
+    wsdl_url = sys.argv[1]
+else:
+    server = StandinServer().start()
+    wsdl_url = server.wsdl_url
+
+cache_dir = tempfile.mkdtemp(prefix='clfpy_wsdl_cache_')
+cache = cf.WsdlCache(cache_dir)
+try:
+    print("WSDL: {}".format(wsdl_url))
+    print("No cache:   {:8.1f} ms per client".format(
+        time_construction(wsdl_url, None)))
+
+    start_time = time.time()
+    cf.GssClient(wsdl_url, wsdl_cache=cache).warm_up()
+    print("Cold cache: {:8.1f} ms per client".format(
+        (time.time() - start_time) * 1000))
+
+    print("Warm cache: {:8.1f} ms per client".format(
+        time_construction(wsdl_url, cache)))
+
+    cache.ttl = 0
+    print("Warm cache, revalidated: {:8.1f} ms per client".format(
+        time_construction(wsdl_url, cache)))
+
+    if server is not None:
+        # A cold cache downloads the WSDL document once, also without a
+        # session
+        for session in (cf.make_session(), None):
+            cache.clear()
+            cache.ttl = 3600
+            before = server.httpd.counters['wsdl_requests']
+            gss = cf.GssClient(wsdl_url, wsdl_cache=cache, session=session)
+            gss.warm_up()
+            assert server.httpd.counters['wsdl_requests'] == before + 1
+            assert cache.is_recorded(wsdl_url)
+            assert gss.contains_file('it4i_barbora://', 'token') is not None
+            cf.GssClient(wsdl_url, wsdl_cache=cache,
+                         session=session).warm_up()
+            assert server.httpd.counters['wsdl_requests'] == before + 1
+        print("Cold cache downloads the WSDL once")
+finally:
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    if server is not None:
+        server.stop()
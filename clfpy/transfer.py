@@ -0,0 +1,803 @@
+"""High-throughput file transfers for the GSS client"""
+import os
+import json
+import time
+import hashlib
+import threading
+from email.utils import parsedate_tz, mktime_tz
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+from requests.packages.urllib3.exceptions import HTTPError as _Urllib3Error
+
+from .transport import DEFAULT_TIMEOUT, DEFAULT_MAX_WORKERS
+
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+MIN_BLOCK_SIZE = 64 * 1024
+MAX_BLOCK_SIZE = 8 * 1024 * 1024
+
+# Concurrent connections per file download
+DEFAULT_CONNECTIONS = 4
+# Files are only split into byte ranges of at least this size
+PART_SIZE = 16 * 1024 * 1024
+
+# Downloads are written to <out_filename>PART_SUFFIX and renamed when done
+PART_SUFFIX = '.clfpy-part'
+# Sidecar file with the progress of a resumable download
+STATE_SUFFIX = '.clfpy-state'
+
+
+class TransferError(IOError):
+    """The storage endpoint sent an incomplete or unexpected response."""
+
+
+# Errors worth repeating a transfer for: network errors, also while reading
+# a body, and bad responses. Local errors, e.g. of a full disk, are not.
+TRANSIENT_ERRORS = (requests.RequestException, _Urllib3Error, TransferError)
+
+
+def auto_block_size(total_size):
+    """Picks a block size of about 1/64 of the file, within sane bounds.
+
+    Small files are copied with small buffers, large files with blocks of up
+    to MAX_BLOCK_SIZE to keep the per-block overhead negligible.
+    """
+    if not total_size:
+        return DEFAULT_BLOCK_SIZE
+    block_size = MIN_BLOCK_SIZE
+    while block_size < MAX_BLOCK_SIZE and block_size * 64 < total_size:
+        block_size *= 2
+    return block_size
+
+
+def copy_response(response, out_file, block_size=None, callback=None):
+    """Copies the body of a streamed requests.Response into a file.
+
+    The body is read into one preallocated buffer which is reused for every
+    block, so no per-block objects are created and each block costs a
+    single write() call.
+
+    Args:
+        response: requests.Response created with stream=True
+        out_file: binary file object to write to
+        block_size (int): buffer size, chosen by auto_block_size() if None
+        callback (callable): called with the number of bytes copied so far
+            after every block
+
+    Returns:
+        Number of bytes copied
+
+    Raises:
+        TransferError if the body is shorter than its Content-Length
+    """
+    expected = content_length(response)
+    if block_size is None:
+        block_size = auto_block_size(expected)
+
+    raw = response.raw
+    raw.decode_content = True
+    buf = memoryview(bytearray(block_size))
+    copied = 0
+    while True:
+        n_read = raw.readinto(buf)
+        if not n_read:
+            break
+        out_file.write(buf[:n_read])
+        copied += n_read
+        if callback is not None:
+            callback(copied)
+
+    if expected is not None and copied != expected:
+        raise TransferError("Incomplete download: got {} of {} bytes"
+                            .format(copied, expected))
+    return copied
+
+
+def content_length(response):
+    """Returns the Content-Length of a response, None if unknown.
+
+    Encoded (e.g. gzipped) bodies are decoded while copying, so their length
+    is unknown as well.
+    """
+    if response.headers.get('Content-Encoding', 'identity') != 'identity':
+        return None
+    length = response.headers.get('Content-Length')
+    return int(length) if length is not None else None
+
+
+def parse_content_range(value):
+    """Parses a "bytes first-last/total" header into (first, last, total).
+
+    Returns None for missing or unparseable headers, and for an unknown
+    total ("*").
+    """
+    if not value or not value.startswith('bytes '):
+        return None
+    try:
+        byte_range, _, total = value[len('bytes '):].partition('/')
+        first, _, last = byte_range.partition('-')
+        return int(first), int(last), int(total)
+    except ValueError:
+        return None
+
+
+class _Cancelled(Exception):
+    """Another part of a parallel download failed."""
+
+
+def _replace(source, destination):
+    """Renames a file, replacing the destination atomically where possible."""
+    if hasattr(os, 'replace'):
+        os.replace(source, destination)
+        return
+    if os.name == 'nt' and os.path.exists(destination):
+        os.remove(destination)
+    os.rename(source, destination)
+
+
+def _remove(filename):
+    """Removes a file if possible, returns whether it was removed."""
+    try:
+        os.remove(filename)
+        return True
+    except OSError:
+        return False
+
+
+def _cache_location(subfolder, env_var):
+    """Returns the folder `subfolder` of clfpy in the user's cache folder,
+    or the value of the environment variable `env_var` if it is set."""
+    location = os.environ.get(env_var)
+    if location:
+        return location
+    cache_home = os.environ.get('XDG_CACHE_HOME',
+                                os.path.join(os.path.expanduser('~'),
+                                             '.cache'))
+    return os.path.join(cache_home, 'clfpy', subfolder)
+
+
+def _write_json(filename, data):
+    """Writes a JSON file atomically."""
+    tmp_name = '{}.{}'.format(filename, os.getpid())
+    with open(tmp_name, 'w') as out_file:
+        json.dump(data, out_file)
+    _replace(tmp_name, filename)
+
+
+def _read_json(filename):
+    """Reads a JSON file, returning None if it is missing or corrupt."""
+    try:
+        with open(filename) as in_file:
+            return json.load(in_file)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def _validators(response):
+    return {'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified')}
+
+
+class DownloadState(object):
+    """Progress of a ranged download, kept in a sidecar file.
+
+    `parts` is a list of [first, last, next] byte offsets, `next` being the
+    first byte of the part not yet written to the partial file. The
+    validators (ETag, Last-Modified) detect files changed in the meantime.
+    """
+
+    def __init__(self, filename, total, validators, parts):
+        self.filename = filename
+        self.total = total
+        self.validators = validators
+        self.parts = parts
+
+    @classmethod
+    def load(cls, filename):
+        """Returns the state stored in a file, None if there is none."""
+        data = _read_json(filename)
+        try:
+            return cls(filename, data['total'], data['validators'],
+                       [list(part) for part in data['parts']])
+        except (TypeError, KeyError):
+            return None
+
+    def save(self):
+        _write_json(self.filename, {'total': self.total,
+                                    'validators': self.validators,
+                                    'parts': self.parts})
+
+    def remove(self):
+        _remove(self.filename)
+
+    def pending(self):
+        return [part for part in self.parts if part[2] <= part[1]]
+
+    def done(self):
+        return sum(part[2] - part[0] for part in self.parts)
+
+    def matches(self, response):
+        """Checks that a response belongs to the same version of the file."""
+        current = _validators(response)
+        return all(current[key] == value
+                   for key, value in self.validators.items()
+                   if value is not None and current[key] is not None)
+
+
+def download(session, method, url, headers, out_filename,
+             connections=DEFAULT_CONNECTIONS, block_size=None, callback=None,
+             timeout=DEFAULT_TIMEOUT, resume=False):
+    """Downloads a URL to a file, over several connections if possible.
+
+    The data is written to `out_filename` + PART_SUFFIX, which is renamed to
+    `out_filename` once complete and verified, so an interrupted download
+    never leaves a truncated file under the final name.
+
+    With `connections` > 1 or `resume`, the first PART_SIZE bytes are
+    requested with a Range header. If the server answers with 206 Partial
+    Content, the partial file is preallocated and the rest is split into up
+    to `connections` byte ranges which are fetched concurrently and written
+    in place. Otherwise, the response is saved as a single stream.
+
+    With `resume`, the progress of ranged downloads is recorded in a sidecar
+    file (`out_filename` + STATE_SUFFIX) and both files are kept on errors.
+    The next call with `resume` continues with the missing byte ranges,
+    unless the file changed on the server in the meantime. Without `resume`,
+    partial files are removed on errors.
+
+    Args:
+        session: requests.Session (or the requests module) to use
+        method (str): HTTP method, usually GET
+        url (str): URL to download
+        headers (dict): HTTP headers to send
+        out_filename (str): file to write
+        connections (int): maximum number of concurrent connections
+        block_size (int): copy buffer size, see copy_response()
+        callback (callable): called with (bytes copied, total bytes or None)
+            while downloading, from several threads but never concurrently
+        timeout: requests timeout
+        resume (bool): continue a previously interrupted download
+
+    Returns:
+        Number of bytes downloaded in total
+    """
+    part_filename = out_filename + PART_SUFFIX
+    state_filename = out_filename + STATE_SUFFIX
+
+    def request(extra_headers=None):
+        request_headers = dict(headers)
+        request_headers.update(extra_headers or {})
+        response = session.request(method, url, headers=request_headers,
+                                   stream=True, timeout=timeout)
+        try:
+            response.raise_for_status()
+        except Exception:
+            response.close()
+            raise
+        return response
+
+    job = _RangedDownload(request, part_filename, block_size, callback,
+                          resume)
+    copied = None
+    try:
+        if resume:
+            state = DownloadState.load(state_filename)
+            if state is not None:
+                copied = job.resume(state, connections)
+        else:
+            _remove(state_filename)
+        if copied is None:
+            copied = _download_new(session, method, url, headers, request,
+                                   job, state_filename, connections, timeout)
+    except BaseException:
+        if job.state is None or not resume:
+            _remove(part_filename)
+            _remove(state_filename)
+        raise
+
+    _replace(part_filename, out_filename)
+    _remove(state_filename)
+    return copied
+
+
+def _download_new(session, method, url, headers, request, job,
+                  state_filename, connections, timeout):
+    """Starts a download from scratch."""
+    if connections > 1 or job.persist:
+        probe_headers = dict(headers)
+        probe_headers.update(_range_headers(0, PART_SIZE - 1))
+        response = session.request(method, url, headers=probe_headers,
+                                   stream=True, timeout=timeout)
+        if response.status_code == 416:
+            # Empty file, nothing to split
+            response.close()
+            response = request()
+    else:
+        response = request()
+
+    try:
+        response.raise_for_status()
+        content_range = None
+        if response.status_code == 206:
+            content_range = parse_content_range(
+                response.headers.get('Content-Range'))
+        if content_range is None or content_range[0] != 0:
+            if response.status_code == 206:
+                raise TransferError("Unexpected Content-Range: {}".format(
+                    response.headers.get('Content-Range')))
+            return _save(response, job.part_filename, job.block_size,
+                         job.callback)
+    except Exception:
+        response.close()
+        raise
+
+    _, first_last, total = content_range
+    parts = [[0, first_last, 0]]
+    if first_last + 1 < total:
+        parts.extend([first, last, first] for first, last in
+                     _split(first_last + 1, total - 1, connections))
+    with open(job.part_filename, 'wb') as out_file:
+        out_file.truncate(total)
+    state = DownloadState(state_filename, total, _validators(response),
+                          parts)
+    return job.run(state, response, connections)
+
+
+def _save(response, out_filename, block_size, callback):
+    """Saves a complete response as a single stream."""
+    total = content_length(response)
+    on_block = None
+    if callback is not None:
+        def on_block(copied):
+            callback(copied, total)
+    try:
+        with open(out_filename, 'wb') as out_file:
+            return copy_response(response, out_file, block_size, on_block)
+    finally:
+        response.close()
+
+
+def _range_headers(first, last):
+    # Encoded bodies would not match the byte ranges of the file
+    return {'Range': 'bytes={}-{}'.format(first, last),
+            'Accept-Encoding': 'identity'}
+
+
+def _split(first, last, n_parts):
+    """Splits the byte range first..last into up to n_parts ranges."""
+    size = last - first + 1
+    n_parts = max(1, min(n_parts, -(-size // PART_SIZE)))
+    part_size = -(-size // n_parts)
+    return [(start, min(start + part_size, last + 1) - 1)
+            for start in range(first, last + 1, part_size)]
+
+
+class _RangedDownload(object):
+    """Fetches the pending parts of a DownloadState concurrently."""
+
+    def __init__(self, request, part_filename, block_size, callback,
+                 persist):
+        self.request = request
+        self.part_filename = part_filename
+        self.block_size = block_size
+        self.callback = callback
+        self.persist = persist
+        self.state = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._copied = 0
+
+    def resume(self, state, connections):
+        """Continues an interrupted download.
+
+        Returns None if the partial file cannot be used, e.g. because the
+        file changed on the server.
+        """
+        try:
+            if os.path.getsize(self.part_filename) != state.total:
+                return None
+        except OSError:
+            return None
+        # Keep the partial file if the server cannot be reached right now
+        self.state = state
+        pending = state.pending()
+        if not pending:
+            return self._verify()
+
+        _, last, next_byte = pending[0]
+        try:
+            response = self.request(_range_headers(next_byte, last))
+        except requests.HTTPError:
+            self.state = None
+            return None
+        if response.status_code != 206 or not state.matches(response) or \
+                parse_content_range(response.headers.get('Content-Range')) \
+                != (next_byte, last, state.total):
+            response.close()
+            self.state = None
+            return None
+        return self.run(state, response, connections)
+
+    def run(self, state, first_response, connections):
+        """Fetches all pending parts, the first one from first_response."""
+        self.state = state
+        self._copied = state.done()
+        if self.persist:
+            state.save()
+        pending = state.pending()
+        try:
+            with ThreadPoolExecutor(max_workers=connections) as executor:
+                futures = [executor.submit(self._fetch, pending[0],
+                                           first_response)]
+                futures.extend(executor.submit(self._fetch, part)
+                               for part in pending[1:])
+                errors = []
+                for future in futures:
+                    try:
+                        future.result()
+                    except Exception as error:
+                        errors.append(error)
+        except BaseException:
+            first_response.close()
+            raise
+        # Report the error that caused the others to be cancelled
+        errors = [e for e in errors if not isinstance(e, _Cancelled)] + errors
+        if errors:
+            raise errors[0]
+        return self._verify()
+
+    def _verify(self):
+        total = self.state.total
+        if self.state.pending() or \
+                os.path.getsize(self.part_filename) != total:
+            raise TransferError("Incomplete download: got {} of {} bytes"
+                                .format(self.state.done(), total))
+        return total
+
+    def _fetch(self, part, response=None):
+        _, last, start = part
+        if response is None:
+            if self._stop.is_set():
+                raise _Cancelled()
+            response = self.request(_range_headers(start, last))
+        try:
+            if parse_content_range(response.headers.get(
+                    'Content-Range')) != (start, last, self.state.total):
+                raise TransferError("Unexpected Content-Range: {}".format(
+                    response.headers.get('Content-Range')))
+            with open(self.part_filename, 'r+b') as out_file:
+                out_file.seek(start)
+
+                def on_block(copied):
+                    if self._stop.is_set():
+                        raise _Cancelled()
+                    if self.persist:
+                        # The state must never get ahead of the data
+                        out_file.flush()
+                    with self._lock:
+                        self._copied += start + copied - part[2]
+                        part[2] = start + copied
+                        if self.persist:
+                            self.state.save()
+                        if self.callback is not None:
+                            self.callback(self._copied, self.state.total)
+
+                copy_response(response, out_file, self.block_size, on_block)
+        except Exception:
+            self._stop.set()
+            raise
+        finally:
+            response.close()
+
+
+def _state_location():
+    """Returns the folder for transfer states, honouring CLFPY_TRANSFER_DIR."""
+    return _cache_location('uploads', 'CLFPY_TRANSFER_DIR')
+
+
+class UploadState(object):
+    """Marks an upload in progress, so that it can be resumed later.
+
+    Stored per GSS ID in the user's cache folder (not next to the uploaded
+    file, which may be read-only or part of an uploaded folder). Records the
+    path, size and modification time of the local file, so a resumed upload
+    only continues if the same, unchanged file is uploaded again.
+    """
+
+    def __init__(self, gss_ID, in_filename, location=None):
+        self.gss_ID = gss_ID
+        self.in_filename = os.path.abspath(in_filename)
+        location = location or _state_location()
+        digest = hashlib.sha1(gss_ID.encode('utf-8')).hexdigest()
+        self.filename = os.path.join(location, digest + '.json')
+
+    def _describe(self):
+        stat = os.stat(self.in_filename)
+        return {'gss_ID': self.gss_ID, 'in_filename': self.in_filename,
+                'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    def start(self):
+        try:
+            folder = os.path.dirname(self.filename)
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+            _write_json(self.filename, self._describe())
+        except (IOError, OSError):
+            pass
+
+    def matches(self):
+        """Checks for an unfinished upload of the unchanged local file."""
+        stored = _read_json(self.filename)
+        return stored is not None and stored == self._describe()
+
+    def remove(self):
+        _remove(self.filename)
+
+
+def remote_size(session, method, url, headers, timeout=DEFAULT_TIMEOUT):
+    """Returns the size of a remote file, None if it cannot be determined.
+
+    Uses a one byte Range request, which also works for URLs only signed for
+    GET requests.
+    """
+    return remote_stat(session, method, url, headers, timeout)[0]
+
+
+def remote_stat(session, method, url, headers, timeout=DEFAULT_TIMEOUT):
+    """Returns the (size, mtime) of a remote file, see remote_size().
+
+    The modification time is taken from the Last-Modified header, in seconds
+    since the epoch. Values which cannot be determined are None.
+    """
+    request_headers = dict(headers)
+    request_headers.update(_range_headers(0, 0))
+    response = session.request(method, url, headers=request_headers,
+                               stream=True, timeout=timeout)
+    try:
+        size = None
+        if response.status_code == 206:
+            content_range = parse_content_range(
+                response.headers.get('Content-Range'))
+            size = content_range[2] if content_range else None
+        elif response.status_code == 416:
+            size = 0
+        elif response.status_code == 200:
+            size = content_length(response)
+        return size, _parse_http_date(response.headers.get('Last-Modified'))
+    finally:
+        response.close()
+
+
+def _parse_http_date(value):
+    parsed = parsedate_tz(value) if value else None
+    return mktime_tz(parsed) if parsed else None
+
+
+def is_outdated(source_size, source_mtime, target_size, target_mtime):
+    """Decides whether a synchronised target file needs to be transferred.
+
+    True if the sizes differ or the source is newer (at one second
+    resolution, as HTTP dates); unknown modification times only compare the
+    sizes.
+    """
+    if source_size != target_size:
+        return True
+    if source_mtime is None or target_mtime is None:
+        return False
+    return int(source_mtime) > int(target_mtime)
+
+
+def file_digest(filename, block_size=DEFAULT_BLOCK_SIZE):
+    """Returns the SHA-1 hex digest of a local file."""
+    sha1 = hashlib.sha1()
+    with open(filename, 'rb') as in_file:
+        for block in iter(lambda: in_file.read(block_size), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+class SyncManifest(object):
+    """Local hash manifest of a synchronised pair of folders.
+
+    Stored per (local folder, GSS folder) in the user's cache folder (see
+    UploadState). Records for every file the size, modification time and
+    SHA-1 digest of the local copy and the size and modification time of
+    the remote copy after the last sync, so that files whose timestamps
+    changed but whose contents did not are recognised as unchanged.
+    """
+
+    def __init__(self, local_root, gss_root, location=None):
+        key = u'{}\n{}'.format(os.path.abspath(local_root), gss_root)
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        self.filename = os.path.join(location or _state_location(),
+                                     'sync-{}.json'.format(digest))
+        self.entries = _read_json(self.filename) or {}
+        self._lock = threading.Lock()
+
+    def digest(self, rel_path, filename, size, mtime):
+        """Returns the digest of a local file, reusing the recorded one if
+        its size and modification time did not change."""
+        with self._lock:
+            entry = self.entries.get(rel_path)
+        if entry is not None and entry['size'] == size and \
+                entry['mtime'] == mtime:
+            return entry['sha1']
+        return file_digest(filename)
+
+    def unchanged(self, rel_path, filename, size, mtime, remote):
+        """Checks whether neither copy changed since the last sync.
+
+        `remote` is the current (size, mtime) of the remote copy.
+        """
+        with self._lock:
+            entry = self.entries.get(rel_path)
+        if entry is None or entry['remote'] != list(remote):
+            return False
+        return self.digest(rel_path, filename, size, mtime) == entry['sha1']
+
+    def record(self, rel_path, filename, remote=None):
+        """Records the current local file and the given remote (size,
+        mtime), if known."""
+        stat = os.stat(filename)
+        sha1 = self.digest(rel_path, filename, stat.st_size, stat.st_mtime)
+        with self._lock:
+            self.entries[rel_path] = {
+                'size': stat.st_size, 'mtime': stat.st_mtime, 'sha1': sha1,
+                'remote': list(remote) if remote else None}
+
+    def discard(self, rel_path):
+        with self._lock:
+            self.entries.pop(rel_path, None)
+
+    def save(self):
+        try:
+            folder = os.path.dirname(self.filename)
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+            with self._lock:
+                _write_json(self.filename, self.entries)
+        except (IOError, OSError):
+            pass
+
+
+# Retries per file of a folder transfer, and the delay before the first one
+DEFAULT_RETRIES = 2
+RETRY_DELAY = 0.5
+
+
+def run_concurrently(func, items, max_workers=DEFAULT_MAX_WORKERS):
+    """Calls func(item) for all items in a bounded thread pool.
+
+    Items are consumed lazily, with at most 2 * max_workers of them pending
+    at any time, so `items` may be a generator that is still discovering
+    work. Yields (item, result, error) tuples in the order of completion;
+    `error` is the exception raised by func, or None.
+    """
+    pending = {}
+    items = iter(items)
+    exhausted = False
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or not exhausted:
+            while not exhausted and len(pending) < 2 * max_workers:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending[executor.submit(func, item)] = item
+            if not pending:
+                break
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                error = future.exception()
+                yield (item, None if error else future.result(), error)
+
+
+class TransferSummary(object):
+    """Thread-safe counters of a folder transfer"""
+
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.skipped = 0
+        self.deleted = 0
+        self.failed = []
+        self.start_time = time.time()
+        self.end_time = None
+        self._lock = threading.Lock()
+
+    def add(self, n_bytes):
+        with self._lock:
+            self.files += 1
+            self.bytes += n_bytes
+
+    def skip(self):
+        with self._lock:
+            self.skipped += 1
+
+    def remove(self):
+        with self._lock:
+            self.deleted += 1
+
+    def fail(self, name, error):
+        with self._lock:
+            self.failed.append((name, error))
+
+    def finish(self):
+        self.end_time = time.time()
+        return self
+
+    @property
+    def seconds(self):
+        return (self.end_time or time.time()) - self.start_time
+
+    @property
+    def throughput(self):
+        """Average throughput in bytes/s"""
+        return self.bytes / max(self.seconds, 1e-6)
+
+    def __str__(self):
+        text = "{} files, {:.1f} MB in {:.1f} s ({:.1f} MB/s)".format(
+            self.files, self.bytes / 1e6, self.seconds,
+            self.throughput / 1e6)
+        if self.skipped:
+            text += ", {} skipped".format(self.skipped)
+        if self.deleted:
+            text += ", {} deleted".format(self.deleted)
+        if self.failed:
+            text += ", {} failed".format(len(self.failed))
+        return text
+
+
+class ThroughputStats(object):
+    """Thread-safe transfer counters per storage root and transfer path
+
+    GssClient records every file transfer under the storage root of the GSS
+    ID (e.g. 'it4i_barbora://') and the path it took ('direct' or
+    'described'), so both paths can be compared per cluster.
+    """
+
+    def __init__(self):
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def record(self, root, path, n_bytes, seconds, failed=False):
+        with self._lock:
+            counters = self._counters.setdefault((root, path), {
+                'transfers': 0, 'failures': 0, 'bytes': 0, 'seconds': 0.0})
+            if failed:
+                counters['failures'] += 1
+            else:
+                counters['transfers'] += 1
+                counters['bytes'] += n_bytes
+                counters['seconds'] += seconds
+
+    def stats(self):
+        """Returns {root: {path: counters}}, including the throughput in
+        bytes/s of the successful transfers."""
+        result = {}
+        with self._lock:
+            for (root, path), counters in self._counters.items():
+                snapshot = dict(counters)
+                snapshot['throughput'] = \
+                    counters['bytes'] / max(counters['seconds'], 1e-6)
+                result.setdefault(root, {})[path] = snapshot
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+    def summary(self):
+        """Returns the statistics as a text table."""
+        lines = []
+        for root, paths in sorted(self.stats().items()):
+            for path, counters in sorted(paths.items()):
+                lines.append(
+                    "{} {:<9} {:5d} transfers {:10.1f} MB {:8.1f} MB/s "
+                    "{:4d} failed".format(
+                        root, path, counters['transfers'],
+                        counters['bytes'] / 1e6,
+                        counters['throughput'] / 1e6, counters['failures']))
+        return "\n".join(lines)
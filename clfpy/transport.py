@@ -0,0 +1,118 @@
+"""Pooled keep-alive HTTP transport for the SOAP clients"""
+import io
+
+import requests
+from requests.adapters import HTTPAdapter
+from suds.transport import Transport, TransportError, Reply
+from suds.transport.https import HttpAuthenticated
+
+from .instrumentation import note_sizes
+
+DEFAULT_POOL_SIZE = 10
+# Concurrent calls per batch, stays below the connection pool size
+DEFAULT_MAX_WORKERS = 8
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (10, 300)
+
+
+def make_session(pool_size=DEFAULT_POOL_SIZE, max_retries=0):
+    """Creates a requests.Session with a keep-alive connection pool.
+
+    Connections (and with them the TLS sessions) are kept open and reused
+    for subsequent requests to the same host. `pool_size` is the number of
+    connections kept per host and should be at least the number of threads
+    issuing requests concurrently.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                          max_retries=max_retries)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+_default_session = None
+
+
+def get_default_session():
+    """Returns the session shared by all SOAP clients unless told otherwise."""
+    global _default_session
+    if _default_session is None:
+        _default_session = make_session()
+    return _default_session
+
+
+def set_default_session(session):
+    """Sets the session shared by all SOAP clients created afterwards."""
+    global _default_session
+    _default_session = session
+
+
+class SessionTransport(Transport):
+    """suds transport sending all requests through a requests.Session.
+
+    Several transports may wrap the same session; they then share its
+    connection pool. Every suds client needs its own transport object though,
+    since suds links the transport options to the client options.
+
+    Create by passing a session and optional timeouts:
+        transport = SessionTransport(make_session(pool_size=20),
+                                     timeout=(5, 60))
+        client = suds.client.Client(<wsdl>, transport=transport)
+    """
+
+    def __init__(self, session=None, timeout=DEFAULT_TIMEOUT, documents=None):
+        Transport.__init__(self)
+        self.session = session if session is not None \
+            else get_default_session()
+        self.timeout = timeout
+        # Documents fetched beforehand, by URL
+        self.documents = documents if documents is not None else {}
+
+    def open(self, request):
+        """Fetches a WSDL or schema document."""
+        if request.url in self.documents:
+            return io.BytesIO(self.documents.pop(request.url))
+        response = self._request('GET', request)
+        if response.status_code != 200:
+            raise TransportError(response.reason, response.status_code,
+                                 io.BytesIO(response.content))
+        return io.BytesIO(response.content)
+
+    def send(self, request):
+        """Sends a SOAP message and returns the reply."""
+        response = self._request('POST', request, data=request.message)
+        note_sizes(len(request.message), len(response.content))
+        if response.status_code >= 300 or response.status_code in (202, 204):
+            # suds treats 202/204 as "no reply" and 500 as SOAP fault
+            raise TransportError(response.reason, response.status_code,
+                                 io.BytesIO(response.content))
+        return Reply(response.status_code, response.headers,
+                     response.content)
+
+    def _request(self, method, request, data=None):
+        # Connection errors propagate, just like with the urllib transport
+        return self.session.request(method, request.url, data=data,
+                                    headers=request.headers,
+                                    timeout=self.timeout)
+
+    def __deepcopy__(self, memo={}):
+        # suds deep-copies options when cloning clients; share the session
+        return SessionTransport(self.session, self.timeout, self.documents)
+
+
+class PrefetchedTransport(HttpAuthenticated):
+    """suds' own urllib transport, serving documents fetched beforehand.
+
+    Used by SOAP clients without a session, so a WSDL document downloaded
+    for the WSDL cache is not downloaded by suds again.
+    """
+
+    def __init__(self, documents, **kwargs):
+        HttpAuthenticated.__init__(self, **kwargs)
+        self.documents = documents
+
+    def open(self, request):
+        if request.url in self.documents:
+            return io.BytesIO(self.documents.pop(request.url))
+        return HttpAuthenticated.open(self, request)
@@ -9,8 +9,8 @@ class WfmClient(SoapClient):
         wfm = WfmClient(<wsdl>)
     """
 
-    def __init__(self, wsdl_url):
-        super(WfmClient, self).__init__(wsdl_url)
+    def __init__(self, wsdl_url, **kwargs):
+        super(WfmClient, self).__init__(wsdl_url, **kwargs)
 
     def serviceExecutionFinished(self, serviceID, sessionToken, xmlOutputs_base64):
         """Notifies the WFM that an application service has finished.
@@ -24,4 +24,11 @@ class WfmClient(SoapClient):
         </ServiceOutputs>
         """
         return self.method_call('serviceExecutionFinished',
-                                [serviceID, sessionToken, xmlOutputs_base64])
\ No newline at end of file
+                                [serviceID, sessionToken, xmlOutputs_base64])
+
+    def serviceExecutionFinished_async(self, serviceID, sessionToken,
+                                       xmlOutputs_base64):
+        """asyncio variant of serviceExecutionFinished()."""
+        return self.method_call_async(
+            'serviceExecutionFinished',
+            [serviceID, sessionToken, xmlOutputs_base64])
@@ -0,0 +1,182 @@
+"""Persistent on-disk cache for parsed WSDL definitions"""
+import os
+import json
+import time
+import shutil
+import hashlib
+
+import requests
+from suds.cache import ObjectCache
+
+from .transfer import _cache_location
+
+DEFAULT_TTL = 24 * 3600
+
+
+def _default_location():
+    """Returns the default cache folder, honouring CLFPY_WSDL_CACHE_DIR."""
+    return _cache_location('wsdl', 'CLFPY_WSDL_CACHE_DIR')
+
+
+class WsdlCache(object):
+    """Persistent cache for WSDL definitions shared by all SOAP clients.
+
+    Every WSDL URL gets its own sub-folder containing the pickled suds
+    definitions (including all imported schemas) and a small metadata file
+    with the time of the last validation and the HTTP validators (ETag,
+    Last-Modified, content digest) of the WSDL document.
+
+    Entries younger than `ttl` seconds are used without any network access.
+    Older entries are revalidated with a conditional GET and only discarded if
+    the WSDL document has actually changed. Set `revalidate=False` to discard
+    expired entries right away instead.
+
+    Create with an optional cache folder and TTL:
+        cache = WsdlCache('/tmp/wsdl_cache', ttl=3600)
+        gss = GssClient(<wsdl>, wsdl_cache=cache)
+    """
+
+    def __init__(self, location=None, ttl=DEFAULT_TTL, revalidate=True,
+                 timeout=10):
+        self.location = location or _default_location()
+        self.ttl = ttl
+        self.revalidate = revalidate
+        self.timeout = timeout
+
+    def suds_cache(self, wsdl_url, session=None):
+        """Returns the suds object cache to use for the given WSDL URL.
+
+        Stale entries are revalidated (or purged) before the cache is handed
+        out, so suds only ever sees entries that are safe to use. Requests
+        go through `session` if given.
+        """
+        folder = self._folder(wsdl_url)
+        meta = self._read_meta(folder)
+        if meta is not None and time.time() - meta['checked'] > self.ttl:
+            if not (self.revalidate and
+                    self._revalidate(wsdl_url, meta, session)):
+                self._remove_folder(folder)
+            else:
+                meta['checked'] = time.time()
+                self._write_meta(folder, meta)
+        # Expiry is handled above, suds entries themselves never expire
+        return ObjectCache(location=folder, days=0)
+
+    def is_recorded(self, wsdl_url):
+        """Returns True if validators are stored for the WSDL URL."""
+        return self._read_meta(self._folder(wsdl_url)) is not None
+
+    def fetch(self, wsdl_url, session=None, timeout=None):
+        """Downloads the WSDL document for a new entry.
+
+        SoapClient hands the document to suds as well, so it is downloaded
+        only once. Returns the response, or None if the request failed.
+        """
+        try:
+            return (session or requests).get(
+                wsdl_url, timeout=timeout or self.timeout)
+        except requests.RequestException:
+            return None
+
+    def record(self, wsdl_url, response=None):
+        """Stores validators for a freshly loaded WSDL URL.
+
+        Called by SoapClient after a successful load, with the response of
+        fetch(). Does nothing if the entry is already known.
+        """
+        folder = self._folder(wsdl_url)
+        if self._read_meta(folder) is not None:
+            return
+        meta = {'url': wsdl_url, 'checked': time.time()}
+        if response is not None and response.status_code == 200:
+            meta.update(self._validators(response))
+        self._write_meta(folder, meta)
+
+    def clear(self, wsdl_url=None):
+        """Removes the entry for one WSDL URL or, by default, all entries."""
+        if wsdl_url is None:
+            self._remove_folder(self.location)
+        else:
+            self._remove_folder(self._folder(wsdl_url))
+
+    def _revalidate(self, wsdl_url, meta, session=None):
+        """Returns True if the cached WSDL document is still up to date."""
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        try:
+            response = (session or requests).get(wsdl_url, headers=headers,
+                                                 timeout=self.timeout)
+        except requests.RequestException:
+            # Keep working offline with what we have
+            return True
+
+        if response.status_code == 304:
+            return True
+        if response.status_code != 200:
+            return False
+
+        validators = self._validators(response)
+        unchanged = validators['digest'] == meta.get('digest')
+        meta.update(validators)
+        return unchanged
+
+    def _validators(self, response):
+        return {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'digest': hashlib.sha1(response.content).hexdigest(),
+        }
+
+    def _folder(self, wsdl_url):
+        name = hashlib.sha1(wsdl_url.encode('utf-8')).hexdigest()
+        return os.path.join(self.location, name)
+
+    def _read_meta(self, folder):
+        try:
+            with open(os.path.join(folder, 'meta.json')) as meta_file:
+                return json.load(meta_file)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def _write_meta(self, folder, meta):
+        try:
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+            tmp_name = os.path.join(folder, 'meta.json.{}'.format(os.getpid()))
+            with open(tmp_name, 'w') as meta_file:
+                json.dump(meta, meta_file)
+            os.rename(tmp_name, os.path.join(folder, 'meta.json'))
+        except (IOError, OSError):
+            pass
+
+    def _remove_folder(self, folder):
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+_default_cache = False
+
+
+def get_default_wsdl_cache():
+    """Returns the WSDL cache used by SOAP clients unless told otherwise.
+
+    The cache can be disabled by setting the environment variable
+    CLFPY_WSDL_CACHE to 0 or by calling set_default_wsdl_cache(None).
+    """
+    global _default_cache
+    if _default_cache is False:
+        if os.environ.get('CLFPY_WSDL_CACHE', '1').lower() in ('0', 'off',
+                                                               'false', 'no'):
+            _default_cache = None
+        else:
+            ttl = float(os.environ.get('CLFPY_WSDL_CACHE_TTL', DEFAULT_TTL))
+            _default_cache = WsdlCache(ttl=ttl)
+    return _default_cache
+
+
+def set_default_wsdl_cache(cache):
+    """Sets the default WSDL cache. Pass None to disable caching."""
+    global _default_cache
+    _default_cache = cache
@@ -12,7 +12,11 @@ setuptools.setup(name='clfpy',
           'Programming Language :: Python :: 3',
       ],
       packages=setuptools.find_packages(),
-      install_requires=['requests', 'suds_jurko', 'future', 'future_fstrings'],
+      install_requires=['requests', 'suds_jurko', 'future', 'future_fstrings',
+                        'futures; python_version < "3"'],
+      extras_require={'fsspec': ['fsspec; python_version >= "3"']},
+      entry_points={'fsspec.specs': [
+          'it4i_barbora = clfpy.gss_fs:GssFileSystem']},
       python_requires='>=2.7, <4',
       scripts=['clfpy/cli/clfpy_cli']
 )